@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Query counts of the WaterButler ``get_auth`` hook for osfstorage, with and without a
+cached waterbutler bundle.
+"""
+import datetime
+
+import jwe
+import jwt
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from addons.osfstorage.models import waterbutler_bundle_cache
+from api_tests.utils import create_test_file
+from osf_tests.factories import AuthUserFactory, ProjectFactory
+from tests.base import OsfTestCase
+from website import settings
+from website.util import api_url_for
+
+
+class TestGetAuthQueries(OsfTestCase):
+
+    def setUp(self):
+        super(TestGetAuthQueries, self).setUp()
+        self.user = AuthUserFactory()
+        self.node = ProjectFactory(creator=self.user)
+        self.file = create_test_file(target=self.node, user=self.user)
+        jwe_key = jwe.kdf(settings.WATERBUTLER_JWE_SECRET.encode('utf-8'), settings.WATERBUTLER_JWE_SALT.encode('utf-8'))
+        self.url = api_url_for('get_auth', payload=jwe.encrypt(jwt.encode({
+            'data': {
+                'action': 'download',
+                'nid': self.node._id,
+                'provider': 'osfstorage',
+                'path': '/{}'.format(self.file._id),
+            },
+            'exp': timezone.now() + datetime.timedelta(seconds=settings.WATERBUTLER_JWT_EXPIRATION),
+        }, settings.WATERBUTLER_JWT_SECRET, algorithm=settings.WATERBUTLER_JWT_ALGORITHM), jwe_key))
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.app.get(self.url, auth=self.user.auth)
+        return len(ctx.captured_queries)
+
+    def test_cached_bundle_saves_queries(self):
+        self.app.get(self.url, auth=self.user.auth)
+        waterbutler_bundle_cache.clear()
+        cold_queries = self.count_queries()
+        warm_queries = self.count_queries()
+        assert warm_queries < cold_queries
+        # Later requests are all served from the cache
+        assert self.count_queries() == warm_queries
+
+    def test_cached_bundle_needs_no_queries(self):
+        node_settings = self.node.get_addon('osfstorage')
+        bundle = node_settings.get_waterbutler_bundle()
+        with CaptureQueriesContext(connection) as ctx:
+            assert node_settings.get_waterbutler_bundle() == bundle
+        assert len(ctx.captured_queries) == 0
@@ -148,25 +148,7 @@ permission_map = {
 }
 
 
-def check_access(node, auth, action, cas_resp):
-    """Verify that user can perform requested action on resource. Raise appropriate
-    error code if action cannot proceed.
-    """
-    permission = permission_map.get(action, None)
-    if permission is None:
-        raise HTTPError(httplib.BAD_REQUEST)
-
-    if cas_resp:
-        if permission == 'read':
-            if node.is_public:
-                return True
-            required_scope = oauth_scopes.CoreScopes.NODE_FILE_READ
-        else:
-            required_scope = oauth_scopes.CoreScopes.NODE_FILE_WRITE
-        if not cas_resp.authenticated \
-           or required_scope not in oauth_scopes.normalize_scopes(cas_resp.attributes['accessTokenScope']):
-            raise HTTPError(httplib.FORBIDDEN)
-
+def _can_access_node(node, auth, action, permission):
     if permission == 'read':
         if node.can_view(auth):
             return True
@@ -174,9 +156,10 @@ def check_access(node, auth, action, cas_resp):
         # case they should have read permissions
         if node.is_registration and node.registered_from.can_view(auth):
             return True
-    if permission == 'write' and node.can_edit(auth):
-        return True
+    return permission == 'write' and node.can_edit(auth)
+
 
+def _can_edit_parent(node, auth, action, permission):
     # Users attempting to register projects with components might not have
     # `write` permissions for all components. This will result in a 403 for
     # all `upload` actions as well as `copyfrom` actions if the component
@@ -194,23 +177,54 @@ def check_access(node, auth, action, cas_resp):
             if parent.can_edit(auth):
                 return True
             parent = parent.parent_node
+    return False
+
 
+def _is_prereg_admin_download(node, auth, action, permission):
     # Users with the prereg admin permission should be allowed to download files
     # from prereg challenge draft registrations.
+    if action != 'download' or auth.user is None or not auth.user.has_perm('osf.administer_prereg'):
+        return False
     try:
-        prereg_schema = RegistrationSchema.objects.get(name='Prereg Challenge', schema_version=2)
-        allowed_nodes = [node] + node.parents
-        prereg_draft_registration = DraftRegistration.objects.filter(
-            branched_from__in=allowed_nodes,
-            registration_schema=prereg_schema
-        )
-        if action == 'download' and \
-                    auth.user is not None and \
-                    prereg_draft_registration.count() > 0 and \
-                    auth.user.has_perm('osf.administer_prereg'):
-            return True
+        prereg_schema_id = RegistrationSchema.get_prereg_schema_id()
     except RegistrationSchema.DoesNotExist:
-        pass
+        return False
+    return DraftRegistration.objects.filter(
+        branched_from__in=[node] + node.parents,
+        registration_schema_id=prereg_schema_id
+    ).exists()
+
+
+# Checked in order by check_access until one of them grants access; keep cheap and common rules first
+access_rules = (
+    _can_access_node,
+    _can_edit_parent,
+    _is_prereg_admin_download,
+)
+
+
+def check_access(node, auth, action, cas_resp):
+    """Verify that user can perform requested action on resource. Raise appropriate
+    error code if action cannot proceed.
+    """
+    permission = permission_map.get(action, None)
+    if permission is None:
+        raise HTTPError(httplib.BAD_REQUEST)
+
+    if cas_resp:
+        if permission == 'read':
+            if node.is_public:
+                return True
+            required_scope = oauth_scopes.CoreScopes.NODE_FILE_READ
+        else:
+            required_scope = oauth_scopes.CoreScopes.NODE_FILE_WRITE
+        if not cas_resp.authenticated \
+           or required_scope not in oauth_scopes.normalize_scopes(cas_resp.attributes['accessTokenScope']):
+            raise HTTPError(httplib.FORBIDDEN)
+
+    for rule in access_rules:
+        if rule(node, auth, action, permission):
+            return True
 
     raise HTTPError(httplib.FORBIDDEN if auth.user else httplib.UNAUTHORIZED)
 
@@ -279,35 +293,22 @@ def get_auth(auth, **kwargs):
         version = data.get('version')
         credentials = None
         waterbutler_settings = None
-        fileversion = None
         if provider_name == 'osfstorage':
-            if path and version:
-                # check to see if this is a file or a folder
-                filenode = OsfStorageFileNode.load(path.strip('/'))
-                if filenode and filenode.is_file:
-                    try:
-                        fileversion = FileVersion.objects.filter(
-                            basefilenode___id=path.strip('/'),
-                            identifier=version
-                        ).select_related('region').get()
-                    except FileVersion.DoesNotExist:
-                        raise HTTPError(httplib.BAD_REQUEST)
-            # path and no version, use most recent version
-            elif path:
-                filenode = OsfStorageFileNode.load(path.strip('/'))
-                if filenode and filenode.is_file:
-                    fileversion = FileVersion.objects.filter(
-                        basefilenode=filenode
-                    ).select_related('region').order_by('-created').first()
-            if fileversion:
-                region = fileversion.region
-                credentials = region.waterbutler_credentials
-                waterbutler_settings = fileversion.serialize_waterbutler_settings(
-                    node_id=provider_settings.owner._id,
-                    root_id=provider_settings.root_node._id,
+            region_id = None
+            if path:
+                # Region of the requested version of a file, or its most recent version
+                versions = FileVersion.objects.filter(
+                    basefilenode___id=path.strip('/'),
+                    basefilenode__type='osf.osfstoragefile',
                 )
-        # If they haven't been set by version region, use the NodeSettings region
-        if not (credentials and waterbutler_settings):
+                if version:
+                    versions = versions.filter(identifier=version)
+                region_id = versions.order_by('-created').values_list('region_id', flat=True).first()
+                if region_id is None and version and OsfStorageFile.objects.filter(_id=path.strip('/')).exists():
+                    raise HTTPError(httplib.BAD_REQUEST)
+            # Use the NodeSettings region for folders, new files and versions without one
+            credentials, waterbutler_settings = provider_settings.get_waterbutler_bundle(region_id)
+        else:
             credentials = provider_settings.serialize_waterbutler_credentials()
             waterbutler_settings = provider_settings.serialize_waterbutler_settings()
     except exceptions.AddonError:
@@ -1,10 +1,36 @@
 """
 Listens for actions to be done to OSFstorage file nodes specifically.
 """
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
 from website.project.signals import contributor_removed
 
 @contributor_removed.connect
 def checkin_files_by_user(node, user):
     """ Listens to a contributor being removed to check in all of their files
     """
-    node.files.filter(checkout=user).update(checkout=None)
+    from django.contrib.contenttypes.models import ContentType
+    from addons.osfstorage.models import OsfStorageFile
+    from osf.models import BaseFileNode
+
+    for file_node in BaseFileNode.objects.filter(
+        target_object_id=node.id,
+        target_content_type=ContentType.objects.get_for_model(node),
+        checkout=user,
+    ):
+        # Save each node so that folder checkout counts are kept up to date
+        file_node.checkout = None
+        if isinstance(file_node, OsfStorageFile):
+            file_node.save(skip_search=True)
+        else:
+            file_node.save()
+
+
+@receiver(post_save, sender='addons_osfstorage.Region')
+@receiver(post_delete, sender='addons_osfstorage.Region')
+def clear_waterbutler_bundles(sender, instance, **kwargs):
+    """ Listens to a storage region changing to drop cached waterbutler credentials and settings
+    """
+    from addons.osfstorage.models import waterbutler_bundle_cache
+    waterbutler_bundle_cache.clear()
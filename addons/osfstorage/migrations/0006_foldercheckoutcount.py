@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.13 on 2018-10-10 13:48
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_checkout_counts(state, schema):
+    from addons.osfstorage.models import FolderCheckoutCount
+    FolderCheckoutCount.rebuild()
+
+
+def noop(state, schema):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0137_basefilenode_osfstorage_materialized_path_index'),
+        ('addons_osfstorage', '0005_region_mfr_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FolderCheckoutCount',
+            fields=[
+                ('folder', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='checkout_count', serialize=False, to='osf.OsfStorageFolder')),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_checkout_counts, noop),
+    ]
@@ -1,5 +1,6 @@
 from __future__ import unicode_literals
 
+import copy
 import logging
 
 from django.apps import apps
@@ -12,21 +13,31 @@ from osf.utils.fields import EncryptedJSONField
 from osf.utils.datetime_aware_jsonfield import DateTimeAwareJSONField
 from osf.exceptions import InvalidTagError, NodeStateError, TagNotFoundError
 from framework.auth.core import Auth
+from framework.celery_tasks.handlers import enqueue_task
 from osf.models.mixins import Loggable
 from osf.models import AbstractNode
 from osf.models.files import File, FileVersion, Folder, TrashedFileNode, BaseFileNode, BaseFileNodeManager
 from osf.utils import permissions
+from osf.utils.caching import LRUCache
 from website.files import exceptions
 from website.files import utils as files_utils
 from website.util import api_url_for
 from website import settings as website_settings
-from addons.osfstorage.settings import DEFAULT_REGION_ID
+from addons.osfstorage.settings import (
+    DEFAULT_REGION_ID,
+    FORK_ASYNC_COPY_THRESHOLD,
+    WATERBUTLER_BUNDLE_CACHE_MAX_ENTRIES,
+    WATERBUTLER_BUNDLE_CACHE_TIMEOUT,
+)
 from website.util import api_v2_url
 
 settings = apps.get_app_config('addons_osfstorage')
 
 logger = logging.getLogger(__name__)
 
+# (node settings id, root folder id, region id) -> (waterbutler credentials, waterbutler settings)
+waterbutler_bundle_cache = LRUCache(WATERBUTLER_BUNDLE_CACHE_MAX_ENTRIES, timeout=WATERBUTLER_BUNDLE_CACHE_TIMEOUT)
+
 
 class OsfStorageFolderManager(BaseFileNodeManager):
 
@@ -39,8 +50,27 @@ class OsfStorageFolderManager(BaseFileNodeManager):
 class OsfStorageFileNode(BaseFileNode):
     _provider = 'osfstorage'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(OsfStorageFileNode, cls).from_db(db, field_names, values)
+        instance._remember_saved_state()
+        return instance
+
+    def refresh_from_db(self, **kwargs):
+        super(OsfStorageFileNode, self).refresh_from_db(**kwargs)
+        self._remember_saved_state()
+
+    def _remember_saved_state(self):
+        # Remember what the stored materialized path was computed from and
+        # whether the row was checked out, see save
+        self._materialized_path_source = (self.__dict__.get('name'), self.__dict__.get('parent_id'))
+        self._checkout_source = self.__dict__.get('checkout_id')
+
     @property
     def materialized_path(self):
+        if self._materialized_path:
+            return self._materialized_path
+        # Rows that have not been backfilled yet, see the backfill_osfstorage_materialized_paths command
         sql = """
             WITH RECURSIVE materialized_path_cte(parent_id, GEN_PATH) AS (
               SELECT
@@ -77,6 +107,40 @@ class OsfStorageFileNode(BaseFileNode):
         # raise Exception('Cannot set materialized path on OSFStorage as it is computed.')
         logger.warn('Cannot set materialized path on OSFStorage because it\'s computed.')
 
+    def _compute_materialized_path(self):
+        prefix = self.parent.materialized_path if self.parent_id else ''
+        return prefix + self.name + ('' if self.is_file else '/')
+
+    def _update_descendant_materialized_paths(self, old_path):
+        """Rewrite the stored paths of every active descendant of this folder from
+        ``old_path`` to the current path in a single statement.
+        """
+        sql = """
+            WITH RECURSIVE descendants_cte(id) AS (
+              SELECT T.id
+              FROM %(table)s AS T
+              WHERE T.parent_id = %(pk)s
+              UNION ALL
+              SELECT T.id
+              FROM descendants_cte AS R
+                JOIN %(table)s AS T ON T.parent_id = R.id
+            )
+            UPDATE %(table)s
+            SET _materialized_path = %(new_path)s || substr(_materialized_path, %(old_length)s + 1)
+            WHERE id IN (SELECT id FROM descendants_cte)
+              AND type NOT IN %(trashed_types)s
+              AND left(_materialized_path, %(old_length)s) = %(old_path)s;
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {
+                'table': AsIs(self._meta.db_table),
+                'pk': self.pk,
+                'new_path': self._materialized_path,
+                'old_path': old_path,
+                'old_length': len(old_path),
+                'trashed_types': tuple(TrashedFileNode._typedmodels_subtypes),
+            })
+
     @classmethod
     def get(cls, _id, target):
         return cls.objects.get(_id=_id, target_object_id=target.id, target_content_type=ContentType.objects.get_for_model(target))
@@ -224,10 +288,51 @@ class OsfStorageFileNode(BaseFileNode):
             if save:
                 self.save()
 
-    def save(self):
+    def _update_checkout_counts(self, created):
+        """Keep FolderCheckoutCount in step with this node being checked in or out
+        or moved. Counts for existing rows are adjusted before the row is saved,
+        while the parent chain in the database is still the old one; the returned
+        callable finishes the update once the row has been saved.
+        """
+        old_parent_id = None if created else getattr(self, '_materialized_path_source', (None, self.parent_id))[1]
+        was_checked_out = not created and getattr(self, '_checkout_source', None) is not None
+        delta = int(self.checkout_id is not None) - int(was_checked_out)
+
+        if not created and delta:
+            FolderCheckoutCount.adjust(old_parent_id if self.is_file else self.pk, delta)
+
+        if created or old_parent_id == self.parent_id:
+            if created and delta:
+                return lambda: FolderCheckoutCount.adjust(self.parent_id if self.is_file else self.pk, delta)
+            return lambda: None
+
+        # Moves are refused for checked out nodes, so this is normally zero
+        if self.is_file:
+            weight = int(self.checkout_id is not None)
+        else:
+            weight = FolderCheckoutCount.objects.filter(folder_id=self.pk).values_list('count', flat=True).first() or 0
+        if not weight:
+            return lambda: None
+        FolderCheckoutCount.adjust(old_parent_id, -weight)
+        return lambda: FolderCheckoutCount.adjust(self.parent_id, weight)
+
+    def save(self, *args, **kwargs):
+        # Only files are indexed for search, see OsfStorageFile.save
+        kwargs.pop('skip_search', None)
         self._path = ''
-        self._materialized_path = ''
-        return super(OsfStorageFileNode, self).save()
+        created = self.pk is None
+        old_path = None if created else self._materialized_path
+        source = (self.name, self.parent_id)
+        if not old_path or getattr(self, '_materialized_path_source', None) != source:
+            self._materialized_path = self._compute_materialized_path()
+        finish_checkout_counts = self._update_checkout_counts(created)
+        ret = super(OsfStorageFileNode, self).save(*args, **kwargs)
+        finish_checkout_counts()
+        if old_path and old_path != self._materialized_path and not self.is_file:
+            self._update_descendant_materialized_paths(old_path)
+        self._materialized_path_source = source
+        self._checkout_source = self.checkout_id
+        return ret
 
 
 class OsfStorageFile(OsfStorageFileNode, File):
@@ -398,36 +503,9 @@ class OsfStorageFolder(OsfStorageFileNode, Folder):
 
     @property
     def is_checked_out(self):
-        sql = """
-            WITH RECURSIVE is_checked_out_cte(id, parent_id, checkout_id) AS (
-              SELECT
-                T.id,
-                T.parent_id,
-                T.checkout_id
-              FROM %s AS T
-              WHERE T.id = %s
-              UNION ALL
-              SELECT
-                T.id,
-                T.parent_id,
-                T.checkout_id
-              FROM is_checked_out_cte AS R
-                JOIN %s AS T ON T.parent_id = R.id
-            )
-            SELECT N.checkout_id
-            FROM is_checked_out_cte as N
-            WHERE N.checkout_id IS NOT NULL
-            LIMIT 1;
-        """
-
-        with connection.cursor() as cursor:
-            cursor.execute(sql, [AsIs(self._meta.db_table), self.pk, AsIs(self._meta.db_table)])
-            row = cursor.fetchone()
-
-            if row and row[0]:
-                return True
-
-        return False
+        if not self.pk:
+            return self.checkout_id is not None
+        return FolderCheckoutCount.objects.filter(folder_id=self.pk, count__gt=0).exists()
 
     @property
     def is_preprint_primary(self):
@@ -446,6 +524,79 @@ class OsfStorageFolder(OsfStorageFileNode, Folder):
         return ret
 
 
+class FolderCheckoutCount(models.Model):
+    """The number of checked out files and folders in an OsfStorageFolder's
+    subtree, including the folder itself. Maintained by OsfStorageFileNode.save
+    so that OsfStorageFolder.is_checked_out is a single-row read. Folders
+    without checkouts may have no row or a row with a count of zero.
+    """
+    folder = models.OneToOneField(OsfStorageFolder, primary_key=True, related_name='checkout_count', on_delete=models.CASCADE)
+    count = models.IntegerField(default=0)
+
+    @classmethod
+    def adjust(cls, folder_id, delta):
+        """Add ``delta`` to the count of ``folder_id`` and of every folder above it."""
+        if folder_id is None or not delta:
+            return
+        sql = """
+            WITH RECURSIVE ancestors_cte(id, parent_id) AS (
+              SELECT
+                T.id,
+                T.parent_id
+              FROM %(filenode)s AS T
+              WHERE T.id = %(folder_id)s
+              UNION ALL
+              SELECT
+                T.id,
+                T.parent_id
+              FROM ancestors_cte AS R
+                JOIN %(filenode)s AS T ON T.id = R.parent_id
+            )
+            INSERT INTO %(counts)s (folder_id, count)
+            SELECT id, %(delta)s FROM ancestors_cte
+            ON CONFLICT (folder_id) DO UPDATE SET count = %(counts)s.count + EXCLUDED.count;
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {
+                'filenode': AsIs(BaseFileNode._meta.db_table),
+                'counts': AsIs(cls._meta.db_table),
+                'folder_id': folder_id,
+                'delta': delta,
+            })
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute every count from the checkout column. Returns the number of folders with checkouts."""
+        sql = """
+            WITH RECURSIVE checkouts_cte(folder_id) AS (
+              SELECT
+                CASE WHEN T.type = %(folder_type)s THEN T.id ELSE T.parent_id END
+              FROM %(filenode)s AS T
+              WHERE T.checkout_id IS NOT NULL
+                AND T.type IN %(types)s
+              UNION ALL
+              SELECT
+                T.parent_id
+              FROM checkouts_cte AS R
+                JOIN %(filenode)s AS T ON T.id = R.folder_id
+              WHERE T.parent_id IS NOT NULL
+            )
+            INSERT INTO %(counts)s (folder_id, count)
+            SELECT folder_id, COUNT(*) FROM checkouts_cte
+            WHERE folder_id IS NOT NULL
+            GROUP BY folder_id;
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s;', [AsIs(cls._meta.db_table)])
+            cursor.execute(sql, {
+                'filenode': AsIs(BaseFileNode._meta.db_table),
+                'counts': AsIs(cls._meta.db_table),
+                'folder_type': OsfStorageFolder._typedmodels_type,
+                'types': (OsfStorageFile._typedmodels_type, OsfStorageFolder._typedmodels_type),
+            })
+            return cursor.rowcount
+
+
 class Region(models.Model):
     _id = models.CharField(max_length=255, db_index=True)
     name = models.CharField(max_length=200)
@@ -540,7 +691,18 @@ class NodeSettings(BaseNodeSettings, BaseStorageAddon):
         if not self.root_node:
             self.on_add()
 
-        clone.root_node = files_utils.copy_files(self.get_root(), clone.owner)
+        root = self.get_root()
+        file_count = OsfStorageFileNode.objects.filter(
+            target_object_id=node.id,
+            target_content_type=ContentType.objects.get_for_model(node),
+        ).count()
+        if file_count > FORK_ASYNC_COPY_THRESHOLD:
+            from website.files.tasks import copy_children_async
+            # Copy the root folder now and its contents once the fork is committed
+            clone.root_node = files_utils.copy_files(root, clone.owner, recursive=False)
+            enqueue_task(copy_children_async.s(root.id, fork._id, clone.root_node.id))
+        else:
+            clone.root_node = files_utils.copy_files(root, clone.owner)
         clone.save()
 
         return clone, None
@@ -555,19 +717,33 @@ class NodeSettings(BaseNodeSettings, BaseStorageAddon):
         return clone, None
 
     def serialize_waterbutler_settings(self):
-        return dict(Region.objects.get(id=self.region_id).waterbutler_settings, **{
-            'nid': self.owner._id,
-            'rootId': self.root_node._id,
-            'baseUrl': api_url_for(
-                'osfstorage_get_metadata',
-                guid=self.owner._id,
-                _absolute=True,
-                _internal=True
-            ),
-        })
+        return self.get_waterbutler_bundle()[1]
 
     def serialize_waterbutler_credentials(self):
-        return Region.objects.get(id=self.region_id).waterbutler_credentials
+        return self.get_waterbutler_bundle()[0]
+
+    def get_waterbutler_bundle(self, region_id=None):
+        """Returns the waterbutler credentials and settings for files of this node stored in ``region_id``,
+        by default the node's region. Bundles are cached per process; saving a Region clears the cache.
+        """
+        region_id = region_id or self.region_id
+        # Anything a bundle is built from is either part of the key or a Region
+        key = (self.id, self.root_node_id, region_id)
+        bundle = waterbutler_bundle_cache.get(key)
+        if bundle is None:
+            region = Region.objects.get(id=region_id)
+            bundle = (region.waterbutler_credentials, dict(region.waterbutler_settings, **{
+                'nid': self.owner._id,
+                'rootId': self.root_node._id,
+                'baseUrl': api_url_for(
+                    'osfstorage_get_metadata',
+                    guid=self.owner._id,
+                    _absolute=True,
+                    _internal=True
+                ),
+            }))
+            waterbutler_bundle_cache.set(key, bundle)
+        return copy.deepcopy(bundle)
 
     def create_waterbutler_log(self, auth, action, metadata):
         params = {
@@ -23,6 +23,15 @@ WATERBUTLER_SETTINGS = {
 
 WATERBUTLER_RESOURCE = 'folder'
 
+# Waterbutler credentials and settings of a node are cached for this many seconds in each process.
+# Saving a Region clears the cache of the saving process only.
+WATERBUTLER_BUNDLE_CACHE_TIMEOUT = 300
+WATERBUTLER_BUNDLE_CACHE_MAX_ENTRIES = 10000
+
+# Forks of nodes with more osfstorage files and folders than this copy them in a celery task,
+# after the fork has been created
+FORK_ASYNC_COPY_THRESHOLD = 10000
+
 DISK_SAVING_MODE = settings.DISK_SAVING_MODE
 
 
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of copying osfstorage file trees, as done when forking a project.
+
+Builds a deep tree (a chain of nested folders) and a wide tree (one folder with many
+files), copies each to another project and checks the number of queries the copy takes.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from addons.osfstorage.tests import factories
+from osf_tests.factories import ProjectFactory
+from tests.base import OsfTestCase
+from website.files import utils as files_utils
+
+DEPTH = 50
+WIDTH = 500
+
+
+class TestCopyFilesBenchmark(OsfTestCase):
+
+    def setUp(self):
+        super(TestCopyFilesBenchmark, self).setUp()
+        self.project = ProjectFactory()
+        self.root = self.project.get_addon('osfstorage').get_root()
+        self.destination = ProjectFactory().get_addon('osfstorage').get_root()
+        self.version = factories.FileVersionFactory()
+
+    def build_deep_tree(self):
+        top = folder = self.root.append_folder('deep')
+        for depth in range(DEPTH):
+            folder.append_file('file-{}'.format(depth)).versions.add(self.version)
+            folder = folder.append_folder('folder-{}'.format(depth))
+        return top
+
+    def build_wide_tree(self):
+        folder = self.root.append_folder('wide')
+        for index in range(WIDTH):
+            folder.append_file('file-{}'.format(index)).versions.add(self.version)
+        return folder
+
+    def copy(self, src):
+        with CaptureQueriesContext(connection) as ctx:
+            copied = files_utils.copy_files(src, self.destination.target, self.destination)
+        return copied, len(ctx.captured_queries)
+
+    def test_copy_deep_tree(self):
+        copied, queries = self.copy(self.build_deep_tree())
+
+        leaf = copied
+        for depth in range(DEPTH):
+            assert leaf.find_child_by_name('file-{}'.format(depth)).versions.get() == self.version
+            leaf = leaf.find_child_by_name('folder-{}'.format(depth), kind=0)
+        assert leaf.materialized_path == '/deep/' + ''.join('folder-{}/'.format(depth) for depth in range(DEPTH))
+        # An INSERT per level, not per file or folder
+        assert queries < 2 * DEPTH + 20
+
+    def test_copy_wide_tree(self):
+        copied, queries = self.copy(self.build_wide_tree())
+
+        assert copied.children.count() == WIDTH
+        assert self.version.basefilenode_set.count() == 2 * WIDTH
+        assert queries < 20
@@ -22,6 +22,7 @@ import datetime
 from osf import models
 from addons.osfstorage import utils
 from addons.osfstorage import settings
+from website.files import utils as files_utils
 from website.files.exceptions import FileNodeCheckedOutError
 
 
@@ -278,6 +279,38 @@ class TestOsfstorageFileNode(StorageTestCase):
         child = self.node_settings.get_root().append_folder('Cloud').append_file('Carp')
         assert_equals('/Cloud/Carp', child.materialized_path)
 
+    def test_materialized_path_is_stored(self):
+        child = self.node_settings.get_root().append_folder('Cloud').append_file('Carp')
+        assert_equals('/Cloud/Carp', OsfStorageFileNode.objects.values_list('_materialized_path', flat=True).get(id=child.id))
+
+    def test_materialized_path_updated_for_subtree_on_rename(self):
+        folder = self.node_settings.get_root().append_folder('Cloud')
+        nested = folder.append_folder('Nested')
+        child = nested.append_file('Carp')
+
+        folder.move_under(self.node_settings.get_root(), name='Sky')
+        nested.reload()
+        child.reload()
+
+        assert_equals('/Sky/', folder.materialized_path)
+        assert_equals('/Sky/Nested/', nested.materialized_path)
+        assert_equals('/Sky/Nested/Carp', child.materialized_path)
+
+    def test_materialized_path_falls_back_to_query(self):
+        child = self.node_settings.get_root().append_folder('Cloud').append_file('Carp')
+        OsfStorageFileNode.objects.filter(target_object_id=self.project.id).update(_materialized_path='')
+        child.reload()
+        assert_equals('/Cloud/Carp', child.materialized_path)
+
+    def test_backfill_materialized_paths(self):
+        from osf.management.commands.backfill_osfstorage_materialized_paths import backfill_materialized_paths
+
+        child = self.node_settings.get_root().append_folder('Cloud').append_file('Carp')
+        OsfStorageFileNode.objects.filter(target_object_id=self.project.id).update(_materialized_path='')
+        backfill_materialized_paths()
+        child.reload()
+        assert_equals('/Cloud/Carp', child._materialized_path)
+
     def test_copy(self):
         to_copy = self.node_settings.get_root().append_file('Carp')
         copy_to = self.node_settings.get_root().append_folder('Cloud')
@@ -288,6 +321,60 @@ class TestOsfstorageFileNode(StorageTestCase):
         assert_equal(copied.parent, copy_to)
         assert_equal(to_copy.parent, self.node_settings.get_root())
 
+    def test_copy_folder_tree(self):
+        other_node_settings = ProjectFactory().get_addon('osfstorage')
+        to_copy = self.node_settings.get_root().append_folder('Cloud')
+        child = to_copy.append_folder('Carp').append_file('Tuna')
+        version = factories.FileVersionFactory()
+        child.versions.add(version)
+        to_copy.append_file('Trashed').delete()
+        progress = mock.Mock()
+
+        copied = files_utils.copy_files(to_copy, other_node_settings.owner, other_node_settings.get_root(), progress=progress)
+
+        copied_child = copied.find_child_by_name('Carp').find_child_by_name('Tuna')
+        assert_equal(copied_child.copied_from, child)
+        assert_equal(copied_child.target, other_node_settings.owner)
+        assert_equal(copied_child.materialized_path, '/Cloud/Carp/Tuna')
+        assert_equal(list(copied_child.versions.all()), [version])
+        assert_not_equal(copied_child._id, child._id)
+        assert_false(copied.children.filter(name='Trashed').exists())
+        assert_equal(progress.call_args_list, [mock.call(1, 3), mock.call(2, 3), mock.call(3, 3)])
+
+    @mock.patch('website.search.search.update_file')
+    @mock.patch('website.search.search.update_files')
+    def test_copy_folder_tree_indexes_files_at_once(self, mock_update_files, mock_update_file):
+        other_node_settings = ProjectFactory(is_public=True).get_addon('osfstorage')
+        to_copy = self.node_settings.get_root().append_folder('Cloud')
+        for name in ('Carp', 'Tuna', 'Cod'):
+            to_copy.append_file(name)
+
+        copied = files_utils.copy_files(to_copy, other_node_settings.owner, other_node_settings.get_root())
+
+        assert_false(mock_update_file.called)
+        assert_equal(mock_update_files.call_count, 1)
+        assert_equal(set(mock_update_files.call_args[0][0]), set(copied.children.all()))
+
+    def test_copy_file_to_another_region(self):
+        region = RegionFactory()
+        other_project = ProjectFactory()
+        other_node_settings = other_project.get_addon('osfstorage')
+        other_node_settings.region = region
+        other_node_settings.save()
+        to_copy = self.node_settings.get_root().append_file('Carp')
+        old_version, latest_version = factories.FileVersionFactory(), factories.FileVersionFactory()
+        latest_version.region = self.node_settings.region
+        latest_version.save()
+        to_copy.versions.add(old_version, latest_version)
+
+        copied = to_copy.copy_under(other_node_settings.get_root())
+
+        versions = list(copied.versions.order_by('created'))
+        assert_equal(versions[0], old_version)
+        assert_not_equal(versions[1], latest_version)
+        assert_equal(versions[1].region, region)
+        assert_equal(versions[1].location, latest_version.location)
+
     def test_move_nested(self):
         new_project = ProjectFactory()
         other_node_settings = new_project.get_addon('osfstorage')
@@ -579,6 +666,20 @@ class TestNodeSettingsModel(StorageTestCase):
         assert_equal(list(cloned_record.versions.all()), list(record.versions.all()))
         assert_true(fork_node_settings.root_node)
 
+    @mock.patch('addons.osfstorage.models.FORK_ASYNC_COPY_THRESHOLD', 1)
+    @mock.patch('addons.osfstorage.models.enqueue_task')
+    def test_after_fork_copies_large_trees_in_task(self, mock_enqueue_task):
+        record = self.node_settings.get_root().append_folder('jazz').append_file('dreamers-ball.mp3')
+
+        fork = self.project.fork_node(self.auth_obj)
+        fork_root = fork.get_addon('osfstorage').get_root()
+        assert_false(fork_root.children.exists())
+
+        signature = mock_enqueue_task.call_args[0][0]
+        assert_equal(signature.args, (self.node_settings.get_root().id, fork._id, fork_root.id))
+        signature()
+        assert_equal(fork_root.find_child_by_name('jazz').find_child_by_name('dreamers-ball.mp3').copied_from, record)
+
     def test_fork_reverts_to_using_user_storage_default(self):
         user = UserFactory()
         user2 = UserFactory()
@@ -623,6 +724,23 @@ class TestNodeSettingsModel(StorageTestCase):
 
         assert node_settings.region_id == region.id
 
+    def test_waterbutler_bundle_cached_until_region_saved(self):
+        region = RegionFactory()
+        node_settings = self.project.get_addon('osfstorage')
+        credentials, waterbutler_settings = node_settings.get_waterbutler_bundle(region.id)
+        assert credentials == region.waterbutler_credentials
+        assert waterbutler_settings['nid'] == self.project._id
+        assert waterbutler_settings['rootId'] == node_settings.root_node._id
+
+        waterbutler_settings['nid'] = 'changed'
+        with mock.patch('addons.osfstorage.models.Region.objects.get') as mock_get:
+            assert node_settings.get_waterbutler_bundle(region.id)[1]['nid'] == self.project._id
+        assert not mock_get.called
+
+        region.waterbutler_credentials = {'storage': {'token': 'new'}}
+        region.save()
+        assert node_settings.get_waterbutler_bundle(region.id)[0] == {'storage': {'token': 'new'}}
+
     def test_encrypted_json_field(self):
         new_test_creds = {
             'storage': {
@@ -869,3 +987,64 @@ class TestOsfStorageCheckout(StorageTestCase):
         self.file.target.remove_contributors([self.user], save=True)
         self.file.reload()
         assert_equal(self.file.checkout, None)
+
+    def test_folder_checked_out_count(self):
+        folder = self.root_node.append_folder('folder')
+        nested = folder.append_folder('nested')
+        file = nested.append_file('deep')
+        assert_false(folder.is_checked_out)
+
+        file.check_in_or_out(self.user, self.user, save=True)
+        assert_true(nested.is_checked_out)
+        assert_true(folder.is_checked_out)
+        assert_true(self.root_node.is_checked_out)
+
+        file.check_in_or_out(self.user, None, save=True)
+        assert_false(nested.is_checked_out)
+        assert_false(folder.is_checked_out)
+        assert_false(self.root_node.is_checked_out)
+
+    def test_folder_checked_out_count_includes_folder(self):
+        folder = self.root_node.append_folder('folder')
+        folder.check_in_or_out(self.user, self.user, save=True)
+        assert_true(folder.is_checked_out)
+        assert_true(self.root_node.is_checked_out)
+        assert_false(self.root_node.append_folder('other').is_checked_out)
+
+    def test_repair_checkout_counts(self):
+        from addons.osfstorage.models import FolderCheckoutCount
+
+        folder = self.root_node.append_folder('folder')
+        file = folder.append_file('file')
+        file.check_in_or_out(self.user, self.user, save=True)
+        expected = set(FolderCheckoutCount.objects.filter(count__gt=0).values_list('folder_id', 'count'))
+
+        FolderCheckoutCount.objects.all().delete()
+        assert_false(folder.is_checked_out)
+        FolderCheckoutCount.rebuild()
+        assert_equal(set(FolderCheckoutCount.objects.filter(count__gt=0).values_list('folder_id', 'count')), expected)
+        assert_true(folder.is_checked_out)
+
+    def test_remove_contributor_checks_in_folder(self):
+        folder = self.root_node.append_folder('folder')
+        file = folder.append_file('file')
+        user = factories.AuthUserFactory()
+        self.node.add_contributor(user, permissions=['read', 'write', 'admin'], save=True)
+        file.check_in_or_out(user, user, save=True)
+        assert_true(folder.is_checked_out)
+        self.node.remove_contributors([user], save=True)
+        assert_false(folder.is_checked_out)
+
+    def test_remove_contributor_checks_in_checked_out_folder(self):
+        folder = self.root_node.append_folder('folder')
+        user = factories.AuthUserFactory()
+        self.node.add_contributor(user, permissions=['read', 'write', 'admin'], save=True)
+        folder.check_in_or_out(user, user, save=True)
+        trashed = self.root_node.append_file('trashed')
+        trashed.delete()
+        # Checked out nodes cannot be deleted, but older trashed nodes may still be checked out
+        models.BaseFileNode.objects.filter(id=trashed.id).update(checkout=user)
+        self.node.remove_contributors([user], save=True)
+        folder.reload()
+        assert_is_none(folder.checkout)
+        assert_false(models.BaseFileNode.objects.filter(checkout=user).exists())
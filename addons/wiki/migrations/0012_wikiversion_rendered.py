@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.13 on 2018-10-22 14:02
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('addons_wiki', '0011_auto_20180415_1649'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wikiversion',
+            name='rendered_html',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='wikiversion',
+            name='rendered_key',
+            field=models.CharField(blank=True, max_length=40, null=True),
+        ),
+        migrations.AddField(
+            model_name='wikiversion',
+            name='rendered_text',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
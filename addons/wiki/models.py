@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import datetime
 import functools
+import hashlib
+import json
 import logging
 
 import markdown
@@ -51,6 +53,9 @@ SHAREJS_DB_URL = 'mongodb://{}:{}/{}'.format(settings.DB_HOST, settings.DB_PORT,
 # TODO: Change to release date for wiki change
 WIKI_CHANGE_DATE = datetime.datetime.utcfromtimestamp(1423760098).replace(tzinfo=pytz.utc)
 
+# Bump when build_html_output or the cleaner changes so stored renders are rebuilt
+WIKI_RENDER_VERSION = 1
+
 def validate_page_name(value):
     value = (value or '').strip()
 
@@ -94,6 +99,16 @@ def build_wiki_url(node, label, base, end):
     return '/{pid}/wiki/{wname}/'.format(pid=node._id, wname=label)
 
 
+def get_render_key(node):
+    """Identifies everything besides the content that the rendered HTML depends on:
+    the node (for wikilinks), the render version and the whitelist.
+    """
+    return hashlib.sha1(json.dumps(
+        [WIKI_RENDER_VERSION, node._id, settings.WIKI_WHITELIST],
+        sort_keys=True,
+    )).hexdigest()
+
+
 class WikiVersionNodeManager(models.Manager):
 
     def get_for_node(self, node, name=None, version=None, id=None):
@@ -123,6 +138,9 @@ class WikiVersion(ObjectIDMixin, BaseModel):
     wiki_page = models.ForeignKey('WikiPage', null=True, blank=True, on_delete=models.CASCADE, related_name='versions')
     content = models.TextField(default='', blank=True)
     identifier = models.IntegerField(default=1)
+    rendered_html = models.TextField(null=True, blank=True)
+    rendered_text = models.TextField(null=True, blank=True)
+    rendered_key = models.CharField(max_length=40, null=True, blank=True)
 
     @property
     def is_current(self):
@@ -130,6 +148,20 @@ class WikiVersion(ObjectIDMixin, BaseModel):
 
     def html(self, node):
         """The cleaned HTML of the page"""
+        return self.render(node)[0]
+
+    def raw_text(self, node):
+        """ The raw text of the page, suitable for using in a test search"""
+        return self.render(node)[1]
+
+    def render(self, node):
+        """Return the cleaned HTML and text of the page. Versions never change once saved,
+        so both are stored on the first render and reused until get_render_key changes.
+        """
+        key = get_render_key(node)
+        if self.rendered_key == key:
+            return self.rendered_html, self.rendered_text
+
         html_output = build_html_output(self.content, node=node)
         try:
             cleaner = Cleaner(
@@ -138,15 +170,24 @@ class WikiVersion(ObjectIDMixin, BaseModel):
                 styles=settings.WIKI_WHITELIST['styles'],
                 filters=[partial(LinkifyFilter, callbacks=[nofollow, ])]
             )
-            return cleaner.clean(html_output)
+            html = cleaner.clean(html_output)
         except TypeError:
             logger.warning('Returning unlinkified content.')
-            return render_content(self.content, node=node)
-
-    def raw_text(self, node):
-        """ The raw text of the page, suitable for using in a test search"""
-
-        return sanitize(self.html(node), tags=[], strip=True)
+            html = render_content(self.content, node=node)
+            # Don't store the fallback so the page is linkified once that works again
+            return html, sanitize(html, tags=[], strip=True)
+
+        self.rendered_html = html
+        self.rendered_text = sanitize(html, tags=[], strip=True)
+        self.rendered_key = key
+        if self.pk:
+            # Avoid save(), which would reindex the node and check for spam again
+            WikiVersion.objects.filter(pk=self.pk).update(
+                rendered_html=self.rendered_html,
+                rendered_text=self.rendered_text,
+                rendered_key=self.rendered_key,
+            )
+        return self.rendered_html, self.rendered_text
 
     @property
     def rendered_before_update(self):
@@ -174,6 +215,8 @@ class WikiVersion(ObjectIDMixin, BaseModel):
         return self.content
 
     def save(self, *args, **kwargs):
+        # Rendered again on first use, normally by update_search or check_spam below
+        self.rendered_key = None
         rv = super(WikiVersion, self).save(*args, **kwargs)
         if self.wiki_page.node:
             self.wiki_page.node.update_search()
@@ -1,12 +1,14 @@
 import pytest
 import pytz
 import datetime
+import mock
 from addons.wiki.exceptions import NameMaximumLengthError
 
-from addons.wiki.models import WikiPage, WikiVersion
+from addons.wiki.models import WikiPage, WikiVersion, get_render_key
 from addons.wiki.tests.factories import WikiFactory, WikiVersionFactory
 from osf_tests.factories import NodeFactory, UserFactory, ProjectFactory
 from tests.base import OsfTestCase, fake
+from website import settings
 
 pytestmark = pytest.mark.django_db
 
@@ -103,3 +105,37 @@ class TestWikiPage(OsfTestCase):
         latest_version = wiki.versions.order_by('-created')[0]
         assert latest_version.is_current
         assert wiki.get_version(5) == latest_version
+
+
+class TestWikiVersionRendering:
+
+    @pytest.fixture()
+    def version(self):
+        return WikiVersionFactory(content='See [[OtherPage]] and http://example.com')
+
+    def test_render_is_stored(self, version):
+        node = version.wiki_page.node
+        html = version.html(node)
+        assert '/{}/wiki/OtherPage/'.format(node._id) in html
+        assert 'rel="nofollow"' in html
+
+        version.reload()
+        assert version.rendered_key == get_render_key(node)
+        with mock.patch('addons.wiki.models.build_html_output') as build_html_output:
+            assert version.html(node) == html
+            assert version.raw_text(node) == version.rendered_text
+        assert not build_html_output.called
+        assert 'OtherPage' in version.rendered_text
+        assert '<' not in version.rendered_text
+
+    def test_rerendered_for_another_node(self, version):
+        other = ProjectFactory()
+        version.html(version.wiki_page.node)
+        assert '/{}/wiki/OtherPage/'.format(other._id) in version.html(other)
+
+    def test_rerendered_when_whitelist_changes(self, version):
+        node = version.wiki_page.node
+        version.html(node)
+        whitelist = dict(settings.WIKI_WHITELIST, tags=[tag for tag in settings.WIKI_WHITELIST['tags'] if tag != 'a'])
+        with mock.patch.object(settings, 'WIKI_WHITELIST', whitelist):
+            assert '<a' not in version.html(node)
@@ -0,0 +1,167 @@
+"""
+An optional cache of embedded documents that is shared between requests.
+
+JSONAPIBaseView._get_embed_partial always caches embeds on the current request.
+When ``EMBED_CACHE_BACKEND`` is set, the rendered embeds are also stored in a
+shared backend so that hot resources (e.g. ``?embed=contributors`` on popular
+public projects) do not re-run their embedded sub-views on every request.
+
+An entry is keyed by the embedded view and serializer, the object the embed was
+resolved for (the embedded object itself for detail embeds, the parent item for
+list embeds) with its ``modified`` timestamp and invalidation generation, the
+requesting user and the host, version and query string of the request.
+Saving or deleting a model drops the generation of the instance itself, of the
+objects its ``DEPENDENT_FIELDS`` point to and of the objects that list it through
+``REVERSE_DEPENDENT_FIELDS``, which orphans their entries. Any other change to
+what an embed renders, e.g. a queryset ``update`` or a save of a related model
+not listed here, shows up only once the entry expires after ``EMBED_CACHE_TIMEOUT``.
+
+With the ``'local'`` backend, invalidation only drops the generation in the
+process that made the change; other processes keep serving their entries until
+``EMBED_CACHE_TIMEOUT``. Use the ``'django'`` backend with a shared cache for
+invalidation that reaches every process.
+"""
+import copy
+import hashlib
+import uuid
+
+from django.apps import apps
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.base import settings as api_settings
+from osf.utils.caching import LRUCache
+
+# Saving an instance of one of these models invalidates embeds resolved for the objects
+# referenced by the listed foreign keys, in addition to embeds of the instance itself
+DEPENDENT_FIELDS = {
+    'osf.contributor': ('node', ),
+    'osf.noderelation': ('parent', 'child'),
+    'osf.nodelog': ('node', ),
+    'osf.privatelink': ('creator', ),
+}
+
+# Saving an instance of one of these models also invalidates embeds resolved for the objects that
+# list it, as (model, foreign key to the instance, foreign key to the object); e.g. a user's name is
+# rendered in the contributor embeds of every node they contribute to
+REVERSE_DEPENDENT_FIELDS = {
+    'osf.osfuser': (('osf.contributor', 'user', 'node'), ),
+}
+
+
+class LocalBackend(object):
+    """Per-process LRU backend, bounded by ``EMBED_CACHE_MAX_ENTRIES``."""
+
+    def __init__(self, max_size, timeout):
+        self._cache = LRUCache(max_size, timeout=timeout)
+
+    def get(self, key):
+        # Serialized data is mutable; never hand out the cached copy
+        return copy.deepcopy(self._cache.get(key))
+
+    def set(self, key, value):
+        self._cache.set(key, copy.deepcopy(value))
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+
+class DjangoBackend(object):
+    """Backend storing entries in the Django cache named ``EMBED_CACHE_ALIAS``."""
+
+    def __init__(self, alias, timeout):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def _cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value, self.timeout)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+
+_backends = {}
+
+
+def get_backend():
+    """Return the configured backend, or None if the shared embed cache is disabled."""
+    name = api_settings.EMBED_CACHE_BACKEND
+    if not name:
+        return None
+    if name not in _backends:
+        if name == 'local':
+            _backends[name] = LocalBackend(api_settings.EMBED_CACHE_MAX_ENTRIES, api_settings.EMBED_CACHE_TIMEOUT)
+        elif name == 'django':
+            _backends[name] = DjangoBackend(api_settings.EMBED_CACHE_ALIAS, api_settings.EMBED_CACHE_TIMEOUT)
+        else:
+            raise ValueError('Unknown EMBED_CACHE_BACKEND {!r}'.format(name))
+    return _backends[name]
+
+
+def _generation_key(label, pk):
+    return 'embed-generation:{}:{}'.format(label, pk)
+
+
+def get_generation(backend, label, pk):
+    key = _generation_key(label, pk)
+    generation = backend.get(key)
+    if generation is None:
+        # A fresh random generation can never match entries written under an evicted one
+        generation = uuid.uuid4().hex
+        backend.set(key, generation)
+    return generation
+
+
+def invalidate(label, pk):
+    backend = get_backend()
+    if backend is not None and pk is not None:
+        backend.delete(_generation_key(label, pk))
+
+
+def get_user_fingerprint(request):
+    user = request.user
+    if not user or user.is_anonymous:
+        return 'anonymous'
+    return user._id
+
+
+def make_key(backend, view_class, field_name, serializer_class, obj, request):
+    label = obj._meta.concrete_model._meta.label_lower
+    modified = getattr(obj, 'modified', None)
+    parts = (
+        view_class.__module__, view_class.__name__, field_name,
+        serializer_class.__module__, serializer_class.__name__,
+        label, obj.pk, modified.isoformat() if modified else None,
+        get_generation(backend, label, obj.pk),
+        get_user_fingerprint(request),
+        request.get_host(),
+        getattr(request, 'version', None),
+        sorted(request.query_params.lists()),
+    )
+    return 'embed:{}'.format(hashlib.sha1(repr(parts)).hexdigest())
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_embeds(sender, instance, **kwargs):
+    if not api_settings.EMBED_CACHE_BACKEND or not hasattr(instance, '_meta'):
+        return
+    label = instance._meta.concrete_model._meta.label_lower
+    invalidate(label, instance.pk)
+    for field_name in DEPENDENT_FIELDS.get(label, ()):
+        field = instance._meta.get_field(field_name)
+        invalidate(field.related_model._meta.concrete_model._meta.label_lower, getattr(instance, field.attname))
+    for model_label, lookup, field_name in REVERSE_DEPENDENT_FIELDS.get(label, ()):
+        model = apps.get_model(model_label)
+        field = model._meta.get_field(field_name)
+        related_label = field.related_model._meta.concrete_model._meta.label_lower
+        for pk in model.objects.filter(**{lookup: instance.pk}).values_list(field.attname, flat=True):
+            invalidate(related_label, pk)
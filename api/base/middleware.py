@@ -18,6 +18,7 @@ from framework.celery_tasks.handlers import (
     celery_after_request,
     celery_teardown_request,
 )
+from osf.utils.permission_cache import CACHE_ATTR as PERMISSION_CACHE_ATTR
 from .api_globals import api_globals
 from api.base import settings as api_settings
 
@@ -55,6 +56,10 @@ class DjangoGlobalMiddleware(MiddlewareMixin):
 
     def process_response(self, request, response):
         api_globals.request = None
+        permission_cache = getattr(request, PERMISSION_CACHE_ATTR, None)
+        if api_settings.DEBUG and permission_cache is not None:
+            response['X-OSF-Permission-Cache-Hits'] = str(permission_cache.hits)
+            response['X-OSF-Permission-Cache-Queries'] = str(permission_cache.queries)
         if api_settings.DEBUG and len(gc.get_referents(request)) > 2:
             raise Exception('You wrote a memory leak. Stop it')
         return response
@@ -1,8 +1,11 @@
+import base64
+import json
+
 from django.utils import six
 from collections import OrderedDict
 from django.core.urlresolvers import reverse
 from django.core.paginator import InvalidPage, Paginator as DjangoPaginator
-from django.db.models import QuerySet
+from django.db.models import F, Q, QuerySet
 
 from rest_framework import pagination
 from rest_framework.exceptions import NotFound
@@ -10,11 +13,13 @@ from rest_framework.response import Response
 from rest_framework.utils.urls import (
     replace_query_param, remove_query_param,
 )
+from api.base.exceptions import InvalidQueryStringError
 from api.base.serializers import is_anonymized
 from api.base.settings import MAX_PAGE_SIZE
-from api.base.utils import absolute_reverse
+from api.base.utils import absolute_reverse, is_truthy
 
-from osf.models import AbstractNode, Comment, Guid
+from osf.models import AbstractNode, BaseFileNode, Comment, Guid
+from osf.models.base import GuidMixin
 from website.search.elastic_search import DOC_TYPE_TO_MODEL
 
 
@@ -29,6 +34,13 @@ class JSONAPIPagination(pagination.PageNumberPagination):
     page_size_query_param = 'page[size]'
     max_page_size = MAX_PAGE_SIZE
 
+    # Views that set ``cursor_ordering`` to a tuple of non-null, indexed fields whose last field is unique,
+    # e.g. ('-modified', '-id'), also accept page[cursor] for keyset pagination, see paginate_queryset_by_cursor
+    cursor_query_param = 'page[cursor]'
+    # Cursor pages only include meta.total when page[total]=true
+    total_query_param = 'page[total]'
+    cursor = None
+
     def page_number_query(self, url, page_number):
         """
         Builds uri and adds page param.
@@ -107,6 +119,27 @@ class JSONAPIPagination(pagination.PageNumberPagination):
             ),
         ])
 
+    def get_cursor_response_dict(self, data):
+        """Response for a page of keyset pagination. There is no last link, and the total count
+        is only included if requested with page[total].
+        """
+        meta = OrderedDict()
+        if self.cursor['total'] is not None:
+            meta['total'] = self.cursor['total']
+        meta['per_page'] = self.cursor['page_size']
+        links = OrderedDict([
+            ('first', self.cursor_query('') if self.cursor['has_previous'] else None),
+            ('prev', self.cursor_query(self.cursor['previous']) if self.cursor['has_previous'] else None),
+            ('next', self.cursor_query(self.cursor['next']) if self.cursor['has_next'] else None),
+        ])
+        if self.request.version < '2.1':
+            links['meta'] = meta
+            return OrderedDict([('data', data), ('links', links)])
+        links = OrderedDict(
+            [('self', self.cursor_query(self.request.query_params[self.cursor_query_param]))] + links.items(),
+        )
+        return OrderedDict([('data', data), ('meta', meta), ('links', links)])
+
     def get_paginated_response(self, data):
         """
         Formats paginated response in accordance with JSON API, as of version 2.1.
@@ -123,7 +156,9 @@ class JSONAPIPagination(pagination.PageNumberPagination):
         if embedded:
             reversed_url = reverse(view_name, kwargs=kwargs)
 
-        if self.request.version < '2.1':
+        if self.cursor is not None:
+            response_dict = self.get_cursor_response_dict(data)
+        elif self.request.version < '2.1':
             response_dict = self.get_response_dict_deprecated(data, reversed_url)
         else:
             response_dict = self.get_response_dict(data, reversed_url)
@@ -164,9 +199,86 @@ class JSONAPIPagination(pagination.PageNumberPagination):
             self.request = request
             return list(self.page)
 
+        elif self.cursor_query_param in request.query_params and getattr(view, 'cursor_ordering', None):
+            return self.paginate_queryset_by_cursor(queryset, request, view)
         else:
             return super(JSONAPIPagination, self).paginate_queryset(queryset, request, view=None)
 
+    def encode_cursor(self, obj, reverse):
+        if obj is None:
+            return ''
+        position = []
+        for field in self.cursor['ordering']:
+            value = getattr(obj, field.lstrip('-'))
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return base64.urlsafe_b64encode(json.dumps({'position': position, 'reverse': reverse}))
+
+    def decode_cursor(self, cursor, ordering):
+        """Returns the (position, reverse) encoded in a page[cursor] value. An empty cursor is the first page."""
+        if not cursor:
+            return None, False
+        try:
+            decoded = json.loads(base64.urlsafe_b64decode(str(cursor)))
+            position, reverse = decoded['position'], bool(decoded['reverse'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise InvalidQueryStringError(detail='Invalid cursor.', parameter=self.cursor_query_param)
+        if not isinstance(position, list) or len(position) != len(ordering):
+            raise InvalidQueryStringError(detail='Invalid cursor.', parameter=self.cursor_query_param)
+        return position, reverse
+
+    def cursor_query(self, cursor):
+        url = remove_query_param(self.request.build_absolute_uri(), '_')
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def paginate_queryset_by_cursor(self, queryset, request, view):
+        """
+        Keyset pagination: instead of an OFFSET, each page starts after the ordering values of the
+        last row of the previous page, which the page[cursor] links carry. The count query is skipped
+        unless page[total]=true.
+        """
+        if not isinstance(queryset, QuerySet):
+            raise InvalidQueryStringError(
+                detail='Cursor pagination is not supported for this endpoint.', parameter=self.cursor_query_param,
+            )
+        if request.query_params.get('sort'):
+            raise InvalidQueryStringError(detail='Cursor pagination cannot be combined with sort.', parameter='sort')
+
+        ordering = view.cursor_ordering
+        position, reverse = self.decode_cursor(request.query_params[self.cursor_query_param], ordering)
+        if reverse:
+            # Walk backwards from the start of the current page, then restore the page's order
+            ordering = [field[1:] if field.startswith('-') else '-' + field for field in ordering]
+        page_size = self.get_page_size(request)
+
+        page_queryset = queryset.order_by(*ordering)
+        if position is not None:
+            after_position = Q()
+            for i, field in enumerate(ordering):
+                clause = Q(**{'{}__{}'.format(field.lstrip('-'), 'lt' if field.startswith('-') else 'gt'): position[i]})
+                for equal_field, value in zip(ordering[:i], position[:i]):
+                    clause &= Q(**{equal_field.lstrip('-'): value})
+                after_position |= clause
+            page_queryset = page_queryset.filter(after_position)
+
+        results = list(page_queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.request = request
+        self.cursor = {
+            'ordering': view.cursor_ordering,
+            'page_size': page_size,
+            'total': queryset.count() if is_truthy(request.query_params.get(self.total_query_param, False)) else None,
+            'has_next': has_more if not reverse else True,
+            'has_previous': position is not None if not reverse else has_more,
+        }
+        self.cursor['next'] = self.encode_cursor(results[-1] if results else None, False)
+        self.cursor['previous'] = self.encode_cursor(results[0] if results else None, True)
+        return results
+
 
 class MaxSizePagination(JSONAPIPagination):
     page_size = 1000
@@ -216,9 +328,14 @@ class NodeContributorPagination(JSONAPIPagination):
         response = super(NodeContributorPagination, self).get_paginated_response(data)
         response_dict = response.data
         kwargs = self.request.parser_context['kwargs'].copy()
-        node_id = kwargs.get('node_id', None)
-        node = AbstractNode.load(node_id)
-        total_bibliographic = node.visible_contributors.count()
+        object_list = self.page.paginator.object_list
+        if kwargs.get('is_embedded') and isinstance(object_list, list):
+            # Embedded contributors are unfiltered and already loaded, e.g. by a batched embed
+            total_bibliographic = len([contrib for contrib in object_list if contrib.visible])
+        else:
+            node_id = kwargs.get('node_id', None)
+            node = AbstractNode.load(node_id)
+            total_bibliographic = node.visible_contributors.count()
         if self.request.version < '2.1':
             response_dict['links']['meta']['total_bibliographic'] = total_bibliographic
         else:
@@ -228,6 +345,17 @@ class NodeContributorPagination(JSONAPIPagination):
 
 class SearchPaginator(DjangoPaginator):
 
+    # Related objects the search serializers read, fetched with each page of results
+    SEARCH_INCLUDES = {
+        AbstractNode: {
+            'select_related': ('node_license', ),
+            'include': ('contributor__user__guids', 'root__guids'),
+        },
+        BaseFileNode: {
+            'prefetch_related': ('versions', 'tags'),
+        },
+    }
+
     def __init__(self, object_list, per_page):
         super(SearchPaginator, self).__init__(object_list, per_page)
 
@@ -235,6 +363,48 @@ class SearchPaginator(DjangoPaginator):
         model = DOC_TYPE_TO_MODEL[obj_type]
         return model.load(obj_id)
 
+    def bulk_load(self, model, obj_ids):
+        """Load every object of ``model`` named in ``obj_ids`` with a single query.
+        Returns a dict mapping each found id to its object.
+        """
+        if issubclass(model, GuidMixin):
+            queryset = model.objects.filter(guids___id__in=obj_ids).annotate(search_id=F('guids___id'))
+            key = 'search_id'
+        elif any(field.name == '_id' for field in model._meta.concrete_fields):
+            queryset = model.objects.filter(_id__in=obj_ids)
+            key = '_id'
+        else:
+            # No single indexed identifier to filter on, e.g. CollectionSubmission
+            loaded = ((obj_id, model.load(obj_id)) for obj_id in obj_ids)
+            return {obj_id: obj for obj_id, obj in loaded if obj is not None}
+
+        includes = next((value for cls, value in self.SEARCH_INCLUDES.items() if issubclass(model, cls)), {})
+        if includes.get('select_related'):
+            queryset = queryset.select_related(*includes['select_related'])
+        if includes.get('prefetch_related'):
+            queryset = queryset.prefetch_related(*includes['prefetch_related'])
+        if includes.get('include'):
+            queryset = queryset.include(*includes['include'], limit_includes=10)
+        return {getattr(obj, key): obj for obj in queryset}
+
+    def load_results(self, results, model=None):
+        """Hydrate Elasticsearch hits with one query per model, preserving the search ranking.
+        Hits whose objects no longer exist are returned as None, as Model.load would.
+        """
+        ids_by_model = OrderedDict()
+        for result in results:
+            result_model = model or DOC_TYPE_TO_MODEL[result.get('_type')]
+            ids_by_model.setdefault(result_model, []).append(result.get('_id'))
+
+        loaded = {
+            result_model: self.bulk_load(result_model, obj_ids)
+            for result_model, obj_ids in ids_by_model.items()
+        }
+        return [
+            loaded[model or DOC_TYPE_TO_MODEL[result.get('_type')]].get(result.get('_id'))
+            for result in results
+        ]
+
     def _get_count(self):
         self._count = self.object_list['aggs']['total']
         return self._count
@@ -242,11 +412,7 @@ class SearchPaginator(DjangoPaginator):
 
     def page(self, number):
         number = self.validate_number(number)
-        results = self.object_list['results']
-        items = [
-            self.search_type_to_model(result.get('_id'), result.get('_type'))
-            for result in results
-        ]
+        items = self.load_results(self.object_list['results'])
         return self._get_page(items, number, self)
 
 
@@ -258,11 +424,7 @@ class SearchModelPaginator(SearchPaginator):
 
     def page(self, number):
         number = self.validate_number(number)
-        results = self.object_list['results']
-        items = [
-            self.model.load(result.get('_id'))
-            for result in results
-        ]
+        items = self.load_results(self.object_list['results'], model=self.model)
         return self._get_page(items, number, self)
 
 
@@ -3,8 +3,10 @@ import re
 from urlparse import urlparse
 
 import furl
+from django.apps import apps
 from django.core.urlresolvers import resolve, reverse, NoReverseMatch
 from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count
 from distutils.version import StrictVersion
 
 from rest_framework import exceptions, permissions
@@ -460,6 +462,36 @@ class AnonymizedRegexField(AuthorizedCharField):
 
         return value
 
+class RelatedCount(object):
+    """
+    A relationship count that can be computed for many objects with a single GROUP BY query.
+
+    Serializers map relationship field names to RelatedCounts in ``related_count_annotations``.
+    The rows of ``model`` whose ``group_by`` foreign key points at an object, narrowed by the
+    given filters, must be exactly what the field's ``related_meta`` count method counts. ::
+
+        related_count_annotations = {
+            'logs': RelatedCount('osf.NodeLog', 'node'),
+        }
+    """
+
+    def __init__(self, model, group_by, *args, **kwargs):
+        self.model = model
+        self.group_by = group_by
+        self.filter_args = args
+        self.filter_kwargs = kwargs
+
+    def get_counts(self, obj_ids):
+        """Return a dict mapping each of ``obj_ids`` to its count."""
+        queryset = apps.get_model(self.model).objects.filter(
+            *self.filter_args, **self.filter_kwargs
+        ).filter(**{'{}__in'.format(self.group_by): obj_ids})
+        counts = dict(
+            queryset.order_by().values_list(self.group_by).annotate(count=Count('pk')),
+        )
+        return {obj_id: counts.get(obj_id, 0) for obj_id in obj_ids}
+
+
 class RelationshipField(ser.HyperlinkedIdentityField):
     """
     RelationshipField that permits the return of both self and related links, along with optional
@@ -625,14 +657,16 @@ class RelationshipField(ser.HyperlinkedIdentityField):
                         show_related_counts = False
                 field_counts_requested = self.process_related_counts_parameters(show_related_counts, value)
 
-                if utils.is_truthy(show_related_counts):
-                    meta[key] = functional.rapply(meta_data[key], _url_val, obj=value, serializer=self.parent, request=self.context['request'])
-                elif utils.is_falsy(show_related_counts):
+                if utils.is_falsy(show_related_counts):
                     continue
-                elif self.field_name in field_counts_requested:
-                    meta[key] = functional.rapply(meta_data[key], _url_val, obj=value, serializer=self.parent, request=self.context['request'])
-                else:
+                if not utils.is_truthy(show_related_counts) and self.field_name not in field_counts_requested:
                     continue
+                related_counts = getattr(value, '_related_counts', {})
+                if key == 'count' and self.field_name in related_counts:
+                    # Computed for the whole page by JSONAPISerializer.annotate_related_counts
+                    meta[key] = related_counts[self.field_name]
+                else:
+                    meta[key] = functional.rapply(meta_data[key], _url_val, obj=value, serializer=self.parent, request=self.context['request'])
             elif key == 'projects_in_common':
                 if not utils.get_user_auth(self.context['request']).user:
                     continue
@@ -1131,6 +1165,13 @@ class JSONAPIListSerializer(ser.ListSerializer):
                 self.child.to_esi_representation(item, envelope=None) for item in data
             ]
         else:
+            data = list(data)
+            if hasattr(self.child, 'annotate_related_counts'):
+                self.child.annotate_related_counts(data)
+            for embed in self.context.get('embed', {}).values():
+                prefetch = getattr(embed, 'prefetch', None)
+                if prefetch:
+                    prefetch(data)
             ret = [
                 self.child.to_representation(item, envelope=envelope) for item in data
             ]
@@ -1241,6 +1282,10 @@ class JSONAPISerializer(BaseAPISerializer):
     """
     writeable_method_fields = frozenset([])
 
+    # Maps relationship field names to RelatedCounts, which list views use to compute
+    # ?related_counts= for a whole page at once instead of once per object
+    related_count_annotations = {}
+
     # Don't serialize relationships that use these views
     # when viewing thru an anonymous VOL
     views_to_hide_if_anonymous = {
@@ -1264,6 +1309,32 @@ class JSONAPISerializer(BaseAPISerializer):
         )
         return invalid_embeds
 
+    def annotate_related_counts(self, objs):
+        """Compute the requested counts declared in ``related_count_annotations`` for ``objs``
+        and store them on each object for RelationshipField.get_meta_information.
+        """
+        request = self.context['request']
+        if not self.related_count_annotations or request.parser_context.get('kwargs', {}).get('is_embedded'):
+            return
+        show_related_counts = request.query_params.get('related_counts', False)
+        if utils.is_truthy(show_related_counts):
+            field_names = self.related_count_annotations.keys()
+        elif utils.is_falsy(show_related_counts):
+            return
+        else:
+            field_names = show_related_counts.split(',')
+
+        objs = [obj for obj in objs if getattr(obj, 'pk', None) is not None]
+        for field_name in field_names:
+            related_count = self.related_count_annotations.get(field_name)
+            if related_count is None or field_name not in self.fields or not objs:
+                continue
+            counts = related_count.get_counts([obj.pk for obj in objs])
+            for obj in objs:
+                if not hasattr(obj, '_related_counts'):
+                    obj._related_counts = {}
+                obj._related_counts[field_name] = counts[obj.pk]
+
     def to_esi_representation(self, data, envelope='data'):
         href = None
         query_params_blacklist = ['page[size]']
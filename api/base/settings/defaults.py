@@ -131,6 +131,16 @@ BULK_SETTINGS = {
 
 MAX_PAGE_SIZE = 100
 
+# Shared cache for embedded documents, see api.base.embed_cache.
+# None disables it, 'local' uses a per-process LRU and 'django' uses the Django cache named EMBED_CACHE_ALIAS.
+# With 'local', a change only invalidates entries in the process that made it; other processes serve
+# their entries until EMBED_CACHE_TIMEOUT
+EMBED_CACHE_BACKEND = None
+EMBED_CACHE_MAX_ENTRIES = 1000
+# Seconds
+EMBED_CACHE_TIMEOUT = 60
+EMBED_CACHE_ALIAS = 'default'
+
 REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
     'DEFAULT_RENDERER_CLASSES': (
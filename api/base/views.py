@@ -15,10 +15,11 @@ from rest_framework.exceptions import ValidationError, NotFound
 from rest_framework.mixins import ListModelMixin
 from rest_framework.response import Response
 
+from api.base import embed_cache
 from api.base import permissions as base_permissions
 from api.base import utils
 from api.base.exceptions import RelationshipPostMakesNoChanges
-from api.base.filters import ListFilterMixin
+from api.base.filters import ListFilterMixin, OSFOrderingFilter
 from api.base.parsers import JSONAPIRelationshipParser
 from api.base.parsers import JSONAPIRelationshipParserForRegularJSON
 from api.base.requests import EmbeddedRequest
@@ -53,16 +54,17 @@ class JSONAPIBaseView(generics.GenericAPIView):
 
         :param str field_name: Name of field of the view's serializer_class to load
         results for
-        :return function object -> dict:
+        :return function object -> dict: The function's ``prefetch`` attribute takes a page
+        of objects and batches list embeds for all of them, see JSONAPIListSerializer
         """
         if getattr(field, 'field', None):
             field = field.field
 
-        def partial(item):
+        def setup_view(item):
             # resolve must be implemented on the field
             v, view_args, view_kwargs = field.resolve(item, field_name, self.request)
             if not v:
-                return None
+                return None, None, None
 
             if isinstance(self.request, EmbeddedRequest):
                 request = EmbeddedRequest(self.request._request)
@@ -88,6 +90,43 @@ class JSONAPIBaseView(generics.GenericAPIView):
             view.request = request
             view.request.parser_context['kwargs'] = view_kwargs
             view.format_kwarg = view.get_format_suffix(**view_kwargs)
+            return v, view, cache
+
+        def prefetch(items):
+            """Load a list embed for a whole page of items with one query if the embedded view
+            implements ``get_bulk_embed_queryset``. Results are filtered and ordered by the view,
+            partitioned per item and used by ``partial`` in place of each item's own queryset.
+            Items that fail ``check_bulk_embed_parent`` are left to ``partial``, which reports the error.
+            """
+            items = [item for item in items if getattr(item, 'pk', None) is not None]
+            if not items:
+                return
+            v, view, cache = setup_view(items[0])
+            if not v or not isinstance(view, ListModelMixin) or not hasattr(view, 'get_bulk_embed_queryset'):
+                return
+            query_params = view.request.query_params
+            if any(key == OSFOrderingFilter.ordering_param or ListFilterMixin.QUERY_PATTERN.match(key) for key in query_params):
+                # Sorts and filters apply to each item's queryset, not across the page
+                return
+
+            results = defaultdict(list)
+            for obj in view.filter_queryset(view.get_bulk_embed_queryset(items)):
+                results[view.get_bulk_embed_parent_id(obj)].append(obj)
+
+            bulk = cache.setdefault((v.cls, field_name, 'bulk'), {})
+            for item in items:
+                item_view = setup_view(item)[1]
+                try:
+                    item_view.check_bulk_embed_parent(item)
+                except Exception:
+                    continue
+                bulk[(type(item), item.pk)] = results[item.pk]
+
+        def partial(item):
+            v, view, cache = setup_view(item)
+            if not v:
+                return None
+            request = view.request
 
             if not isinstance(view, ListModelMixin):
                 try:
@@ -102,6 +141,14 @@ class JSONAPIBaseView(generics.GenericAPIView):
                 # We already have the result for this embed, return it
                 return cache[_cache_key]
 
+            shared_cache = embed_cache.get_backend()
+            if shared_cache is not None:
+                shared_key = embed_cache.make_key(shared_cache, v.cls, field_name, view.get_serializer_class(), item, self.request)
+                ret = shared_cache.get(shared_key)
+                if ret is not None:
+                    cache[_cache_key] = ret
+                    return ret
+
             # Cache serializers. to_representation of a serializer should NOT augment it's fields so resetting the context
             # should be sufficient for reuse
             if not view.get_serializer_class() in cache:
@@ -114,7 +161,12 @@ class JSONAPIBaseView(generics.GenericAPIView):
                 if not isinstance(view, ListModelMixin):
                     ret = ser.to_representation(item)
                 else:
-                    queryset = view.filter_queryset(view.get_queryset())
+                    bulk = cache.get((v.cls, field_name, 'bulk'), {})
+                    if (type(item), item.pk) in bulk:
+                        # Loaded for the whole page and checked by prefetch
+                        queryset = bulk[(type(item), item.pk)]
+                    else:
+                        queryset = view.filter_queryset(view.get_queryset())
                     page = view.paginate_queryset(getattr(queryset, '_results_cache', None) or queryset)
 
                     ret = ser.to_representation(page or queryset)
@@ -127,6 +179,10 @@ class JSONAPIBaseView(generics.GenericAPIView):
             except Exception as e:
                 with transaction.atomic():
                     ret = view.handle_exception(e).data
+            else:
+                # Errors are only cached for the current request
+                if shared_cache is not None:
+                    shared_cache.set(shared_key, ret)
 
             # Allow request to be gc'd
             ser._context = None
@@ -136,6 +192,7 @@ class JSONAPIBaseView(generics.GenericAPIView):
 
             return ret
 
+        partial.prefetch = prefetch
         return partial
 
     def get_serializer_context(self):
@@ -474,6 +531,17 @@ class BaseContributorList(JSONAPIBaseView, generics.ListAPIView, ListFilterMixin
 
         return node.contributor_set.all().include('user__guids')
 
+    def get_bulk_embed_queryset(self, nodes):
+        # Same rows and per-node order as get_default_queryset, for every node on a page
+        return Contributor.objects.filter(node__in=nodes).include('user__guids').order_by('node_id', '_order')
+
+    def get_bulk_embed_parent_id(self, contributor):
+        return contributor.node_id
+
+    def check_bulk_embed_parent(self, node):
+        # The checks get_default_queryset makes, for a node already loaded by the embedding list
+        self.get_node()
+
     def get_queryset(self):
         queryset = self.get_queryset_from_request()
         # If bulk request, queryset only contains contributors in request
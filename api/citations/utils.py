@@ -1,6 +1,8 @@
+import hashlib
 import os
 import re
 import httplib as http
+from collections import defaultdict
 
 from citeproc import CitationStylesStyle, CitationStylesBibliography
 from citeproc import Citation, CitationItem
@@ -9,9 +11,22 @@ from citeproc.source.json import CiteProcJSON
 
 from framework.exceptions import HTTPError
 from framework.auth import utils
-from osf.models import PreprintService, CitationStyle
+from osf.models import AbstractNode, Contributor, PreprintService, CitationStyle
+from osf.utils.caching import LRUCache
 from website.citations.utils import datetime_to_csl
-from website.settings import CITATION_STYLES_PATH, BASE_PATH, CUSTOM_CITATIONS
+from website.settings import (
+    BASE_PATH,
+    CITATION_CACHE_MAX_ENTRIES,
+    CITATION_CACHE_TIMEOUT,
+    CITATION_STYLE_CACHE_MAX_ENTRIES,
+    CITATION_STYLES_PATH,
+    CUSTOM_CITATIONS,
+)
+
+# style id -> (mtime of the style file, parsed style)
+style_cache = LRUCache(CITATION_STYLE_CACHE_MAX_ENTRIES)
+# See get_citation_cache_keys
+citation_cache = LRUCache(CITATION_CACHE_MAX_ENTRIES, timeout=CITATION_CACHE_TIMEOUT)
 
 
 def clean_up_common_errors(cit):
@@ -73,20 +88,29 @@ def process_name(node, user):
     }
 
 
-def render_citation(node, style='apa'):
-    """Given a node, return a citation"""
-    reformat_styles = ['apa', 'chicago-author-date', 'modern-language-association']
-    csl = None
-    if isinstance(node, PreprintService):
-        csl = preprint_csl(node, node.node)
-        data = [csl, ]
-    else:
-        data = [node.csl, ]
+def get_style_path(style):
+    custom = CUSTOM_CITATIONS.get(style, False)
+    return os.path.join(BASE_PATH, 'static', custom) if custom else os.path.join(CITATION_STYLES_PATH, style)
 
-    bib_source = CiteProcJSON(data)
 
-    custom = CUSTOM_CITATIONS.get(style, False)
-    path = os.path.join(BASE_PATH, 'static', custom) if custom else os.path.join(CITATION_STYLES_PATH, style)
+def _get_mtime(path):
+    for candidate in (path, '{}.csl'.format(path)):
+        try:
+            return os.path.getmtime(candidate)
+        except OSError:
+            pass
+    return None
+
+
+def get_style(style):
+    """Return the parsed CSL style for ``style``, resolving dependent styles to their parent.
+    Parsed styles are cached until their file changes.
+    """
+    path = get_style_path(style)
+    mtime = _get_mtime(path)
+    cached = style_cache.get(style)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
 
     try:
         bib_style = CitationStylesStyle(path, validate=False)
@@ -99,16 +123,78 @@ def render_citation(node, style='apa'):
         else:
             raise ValueError('Unable to find a dependent or independent parent style related to {}.csl'.format(style))
 
-    bibliography = CitationStylesBibliography(bib_style, bib_source, formatter.plain)
-
-    citation = Citation([CitationItem(node._id)])
-
-    bibliography.register(citation)
+    style_cache.set(style, (mtime, bib_style))
+    return bib_style
+
+
+def get_citation_cache_keys(nodes, style):
+    """Return a key per node that changes with anything its citation is built from:
+    the node or preprint, the node's latest log and its visible contributors.
+    Objects that are not nodes or preprints get ``None`` and are not cached.
+    """
+    cit_nodes = [node.node if isinstance(node, PreprintService) else node for node in nodes]
+    contributors = defaultdict(list)
+    node_ids = [cit_node.id for cit_node in cit_nodes if isinstance(cit_node, AbstractNode)]
+    if node_ids:
+        visible = Contributor.objects.filter(
+            node_id__in=node_ids, visible=True
+        ).order_by('_order').values_list('node_id', 'user_id', 'user__modified')
+        for node_id, user_id, modified in visible:
+            contributors[node_id].append((user_id, modified))
+
+    keys = []
+    for node, cit_node in zip(nodes, cit_nodes):
+        if not isinstance(cit_node, AbstractNode):
+            keys.append(None)
+            continue
+        parts = (
+            style, type(node).__name__, node.pk, node.modified,
+            cit_node.pk, cit_node.modified, cit_node.last_logged,
+            contributors[cit_node.id],
+        )
+        keys.append(hashlib.sha1(repr(parts)).hexdigest())
+    return keys
 
-    bib = bibliography.bibliography()
-    cit = unicode(bib[0] if len(bib) else '')
 
-    title = csl['title'] if csl else node.csl['title']
+def render_citation(node, style='apa'):
+    """Given a node, return a citation"""
+    return render_citations([node], style=style)[0]
+
+
+def render_citations(nodes, style='apa'):
+    """Given nodes or preprints, return their citations in ``style``, in the same order.
+    The style is parsed once and all the CSL data goes into one source; rendered
+    citations are cached, see get_citation_cache_keys.
+    """
+    nodes = list(nodes)
+    keys = get_citation_cache_keys(nodes, style)
+    citations = [citation_cache.get(key) if key else None for key in keys]
+    missing = [i for i, citation in enumerate(citations) if citation is None]
+    if not missing:
+        return citations
+
+    bib_style = get_style(style)
+    csls = [
+        preprint_csl(nodes[i], nodes[i].node) if isinstance(nodes[i], PreprintService) else nodes[i].csl
+        for i in missing
+    ]
+    bib_source = CiteProcJSON(csls)
+
+    for i, csl in zip(missing, csls):
+        node = nodes[i]
+        # A bibliography per citation keeps citation numbers the same as when rendered alone
+        bibliography = CitationStylesBibliography(bib_style, bib_source, formatter.plain)
+        bibliography.register(Citation([CitationItem(csl['id'])]))
+        bib = bibliography.bibliography()
+        citations[i] = format_citation(node, csl, unicode(bib[0] if len(bib) else ''), style)
+        if keys[i]:
+            citation_cache.set(keys[i], citations[i])
+    return citations
+
+
+def format_citation(node, csl, cit, style):
+    reformat_styles = ['apa', 'chicago-author-date', 'modern-language-association']
+    title = csl['title']
     title = title.rstrip('.')
     if cit.count(title) == 1:
         i = cit.index(title)
@@ -1,4 +1,5 @@
 from django.db import connection
+from django.db.models import Q
 
 from api.base.exceptions import (
     Conflict, EndpointNotImplementedError,
@@ -9,7 +10,7 @@ from api.base.serializers import (
     VersionedDateTimeField, HideIfRegistration, IDField,
     JSONAPIRelationshipSerializer,
     JSONAPISerializer, LinksField,
-    NodeFileHyperLinkField, RelationshipField,
+    NodeFileHyperLinkField, RelatedCount, RelationshipField,
     ShowIfVersion, TargetTypeField, TypeField,
     WaterbutlerLink, relationship_diff, BaseAPISerializer,
     HideIfWikiDisabled, ShowIfAdminScopeOrAnonymous,
@@ -249,6 +250,19 @@ class NodeSerializer(TaxonomizableSerializerMixin, JSONAPISerializer):
         'subjects',
     ]
 
+    related_count_annotations = {
+        'contributors': RelatedCount('osf.Contributor', 'node'),
+        'forks': RelatedCount('osf.AbstractNode', 'forked_from', ~Q(type='osf.registration'), is_deleted=False),
+        'node_links': RelatedCount('osf.NodeRelation', 'parent', is_node_link=True),
+        'linked_by_nodes': RelatedCount(
+            'osf.NodeRelation', 'child', is_node_link=True, parent__is_deleted=False, parent__type='osf.node',
+        ),
+        'linked_by_registrations': RelatedCount(
+            'osf.NodeRelation', 'child', is_node_link=True, parent__type='osf.registration', parent__retraction__isnull=True,
+        ),
+        'logs': RelatedCount('osf.NodeLog', 'node'),
+    }
+
     id = IDField(source='_id', read_only=True)
     type = TypeField()
 
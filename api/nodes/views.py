@@ -210,6 +210,7 @@ class NodeList(JSONAPIBaseView, bulk_views.BulkUpdateJSONAPIView, bulk_views.Bul
     view_name = 'node-list'
 
     ordering = ('-modified', )  # default ordering
+    cursor_ordering = ('-modified', '-id')  # ordering for page[cursor] pagination
 
     # overrides NodesFilterMixin
     def get_default_queryset(self):
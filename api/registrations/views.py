@@ -201,6 +201,11 @@ class RegistrationContributorsList(BaseContributorList, RegistrationMixin, UserM
         node = self.get_node(check_object_permissions=False)
         return node.contributor_set.all().include('user__guids')
 
+    def check_bulk_embed_parent(self, node):
+        # As get_node(check_object_permissions=False), without loading the node again
+        if node.is_collection or not node.is_registration:
+            raise NotFound
+
 
 class RegistrationContributorDetail(BaseContributorDetail, RegistrationMixin, UserMixin):
     """The documentation for this endpoint can be found [here](https://developer.osf.io/#operation/registrations_contributors_read).
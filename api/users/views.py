@@ -149,6 +149,7 @@ class UserList(JSONAPIBaseView, generics.ListAPIView, ListFilterMixin):
     serializer_class = UserSerializer
 
     ordering = ('-date_registered')
+    cursor_ordering = ('-date_registered', '-id')  # ordering for page[cursor] pagination
     view_category = 'users'
     view_name = 'user-list'
 
@@ -0,0 +1,96 @@
+import mock
+import pytest
+
+from api.base import embed_cache
+from api.base.settings.defaults import API_BASE
+from osf_tests.factories import (
+    AuthUserFactory,
+    ProjectFactory,
+)
+
+
+@pytest.fixture()
+def local_embed_cache():
+    embed_cache._backends.clear()
+    with mock.patch('api.base.embed_cache.api_settings.EMBED_CACHE_BACKEND', 'local'):
+        yield embed_cache.get_backend()
+    embed_cache._backends.clear()
+
+
+class TestLocalBackend:
+
+    def test_values_are_copied(self):
+        backend = embed_cache.LocalBackend(max_size=10, timeout=None)
+        value = {'data': {'id': 'abcde'}}
+        backend.set('key', value)
+        value['data']['id'] = 'changed'
+        cached = backend.get('key')
+        assert cached == {'data': {'id': 'abcde'}}
+        cached['data']['id'] = 'changed'
+        assert backend.get('key') == {'data': {'id': 'abcde'}}
+
+    def test_bounded(self):
+        backend = embed_cache.LocalBackend(max_size=2, timeout=None)
+        for i in range(3):
+            backend.set(i, i)
+        assert backend.get(0) is None
+        assert backend.get(2) == 2
+
+
+@pytest.mark.django_db
+class TestEmbedCache:
+
+    @pytest.fixture()
+    def user(self):
+        return AuthUserFactory()
+
+    @pytest.fixture()
+    def project(self, user):
+        return ProjectFactory(creator=user, is_public=True)
+
+    @pytest.fixture()
+    def url(self, project):
+        return '/{}nodes/{}/?embed=contributors'.format(API_BASE, project._id)
+
+    def test_disabled_by_default(self):
+        assert embed_cache.get_backend() is None
+
+    def test_repeated_requests_hit_cache(self, app, local_embed_cache, url, user):
+        res = app.get(url, auth=user.auth)
+        expected = res.json['data']['embeds']['contributors']
+
+        with mock.patch.object(local_embed_cache, 'set', wraps=local_embed_cache.set) as cache_set:
+            res = app.get(url, auth=user.auth)
+        assert not cache_set.called
+        assert res.json['data']['embeds']['contributors'] == expected
+
+    def test_keyed_on_user(self, app, local_embed_cache, url, user):
+        app.get(url, auth=user.auth)
+        with mock.patch.object(local_embed_cache, 'set', wraps=local_embed_cache.set) as cache_set:
+            app.get(url)
+        assert cache_set.called
+
+    def test_contributor_change_invalidates(self, app, local_embed_cache, url, user, project):
+        app.get(url, auth=user.auth)
+        new_contributor = AuthUserFactory()
+        project.add_contributor(new_contributor, save=True)
+
+        res = app.get(url, auth=user.auth)
+        contributor_ids = [
+            each['embeds']['users']['data']['id']
+            for each in res.json['data']['embeds']['contributors']['data']
+        ]
+        assert new_contributor._id in contributor_ids
+
+    def test_user_change_invalidates_contributor_embeds(self, app, local_embed_cache, url, user, project):
+        app.get(url, auth=user.auth)
+        user.given_name = 'Renamed'
+        user.fullname = 'Renamed User'
+        user.save()
+
+        res = app.get(url, auth=user.auth)
+        names = [
+            each['embeds']['users']['data']['attributes']['full_name']
+            for each in res.json['data']['embeds']['contributors']['data']
+        ]
+        assert 'Renamed User' in names
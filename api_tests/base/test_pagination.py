@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from nose.tools import *  # flake8: noqa
 
 from osf_tests import factories
 from tests.base import ApiTestCase
 
 from api.base import settings
-from api.base.pagination import MaxSizePagination
+from api.base.pagination import MaxSizePagination, SearchModelPaginator, SearchPaginator
+from osf.models import AbstractNode
 
 
 class TestMaxPagination(ApiTestCase):
@@ -54,3 +57,100 @@ class TestJSONAPIPagination(ApiTestCase):
         assert_not_in('meta', links)
         assert_in('total', meta)
         assert_in('per_page', meta)
+
+
+class TestCursorPagination(ApiTestCase):
+
+    def setUp(self):
+        super(TestCursorPagination, self).setUp()
+        self.user = factories.AuthUserFactory()
+        for i in range(0, 11):
+            factories.ProjectFactory(creator=self.user)
+        self.url = '/{}nodes/?version=2.1&page[size]=5&filter[contributors]={}'.format(settings.API_BASE, self.user._id)
+        self.cursor_url = self.url + '&page[cursor]='
+
+    def walk(self, url, link):
+        ids = []
+        while url:
+            res = self.app.get(url, auth=self.user.auth)
+            ids.extend(node['id'] for node in res.json['data'])
+            url = res.json['links'][link]
+        return ids, res
+
+    def test_cursor_pages_match_page_number_order(self):
+        expected, _ = self.walk(self.url, 'next')
+        ids, last_page = self.walk(self.cursor_url, 'next')
+        assert_equal(ids, expected)
+        assert_equal(len(ids), 11)
+
+        # Walking back from the last page returns the earlier pages in the same order
+        previous_ids, _ = self.walk(last_page.json['links']['prev'], 'prev')
+        assert_equal(previous_ids, expected[5:10] + expected[0:5])
+
+    def test_total_only_when_requested(self):
+        res = self.app.get(self.cursor_url, auth=self.user.auth)
+        assert_not_in('total', res.json['meta'])
+        assert_not_in('last', res.json['links'])
+        assert_is_none(res.json['links']['prev'])
+
+        res = self.app.get(self.cursor_url + '&page[total]=true', auth=self.user.auth)
+        assert_equal(res.json['meta']['total'], 11)
+
+    def test_invalid_cursor(self):
+        res = self.app.get(self.url + '&page[cursor]=notacursor', auth=self.user.auth, expect_errors=True)
+        assert_equal(res.status_code, 400)
+
+    def test_cursor_with_sort(self):
+        res = self.app.get(self.cursor_url + '&sort=title', auth=self.user.auth, expect_errors=True)
+        assert_equal(res.status_code, 400)
+
+
+class TestSearchPaginator(ApiTestCase):
+
+    def setUp(self):
+        super(TestSearchPaginator, self).setUp()
+        self.user = factories.AuthUserFactory()
+        self.projects = [factories.ProjectFactory(creator=self.user, is_public=True) for i in range(0, 20)]
+        self.users = [factories.UserFactory() for i in range(0, 5)]
+
+    def search_results(self, objs, doc_type):
+        return {
+            'results': [{'_id': obj._id, '_type': doc_type} for obj in objs],
+            'aggs': {'total': len(objs)},
+        }
+
+    def count_page_queries(self, paginator):
+        with CaptureQueriesContext(connection) as ctx:
+            page = paginator.page(1)
+        return len(ctx.captured_queries), list(page)
+
+    def test_results_keep_search_ranking(self):
+        ranked = list(reversed(self.projects[:10]))
+        results = self.search_results(ranked, 'project')
+        results['results'].insert(3, {'_id': 'notreal', '_type': 'project'})
+        page = SearchPaginator(results, 11).page(1)
+        assert_equal(list(page), ranked[:3] + [None] + ranked[3:])
+
+    def test_mixed_types(self):
+        results = self.search_results(self.projects[:2], 'project')
+        results['results'].insert(1, {'_id': self.users[0]._id, '_type': 'user'})
+        page = SearchPaginator(results, 3).page(1)
+        assert_equal(list(page), [self.projects[0], self.users[0], self.projects[1]])
+
+    def test_query_count_is_constant_with_page_size(self):
+        small_count, small_page = self.count_page_queries(
+            SearchModelPaginator(self.search_results(self.projects[:2], 'project'), 2, AbstractNode)
+        )
+        large_count, large_page = self.count_page_queries(
+            SearchModelPaginator(self.search_results(self.projects, 'project'), 20, AbstractNode)
+        )
+        assert_equal(len(small_page), 2)
+        assert_equal(len(large_page), 20)
+        assert_equal(small_count, large_count)
+
+        mixed = self.search_results(self.projects[:2], 'project')
+        mixed['results'].extend(self.search_results(self.users, 'user')['results'])
+        mixed_count, mixed_page = self.count_page_queries(SearchPaginator(mixed, 7))
+        assert_equal(len(mixed_page), 7)
+        # One query per model type on the page
+        assert_equal(mixed_count, 2 * small_count)
@@ -359,6 +359,30 @@ class TestApiBaseSerializers(ApiTestCase):
             "Acceptable values for the related_counts query param are 'true', 'false', or any of the relationship fields; got 'title'"
         )
 
+    def test_list_related_counts_match_detail(self):
+        self.node.fork_node(auth=factories.Auth(self.node.creator))
+        list_url = '/{}nodes/?filter[id]={},{}'.format(API_BASE, self.node._id, self.linked_node._id)
+        res = self.app.get(list_url, params={'related_counts': True}, auth=self.user.auth)
+        listed = {node['id']: node['relationships'] for node in res.json['data']}
+        assert_equal(set(listed), {self.node._id, self.linked_node._id})
+
+        for node_id, relationships in listed.items():
+            detail = self.app.get(
+                '/{}nodes/{}/'.format(API_BASE, node_id),
+                params={'related_counts': True}, auth=self.user.auth,
+            ).json['data']['relationships']
+            for field_name in NodeSerializer.related_count_annotations:
+                if field_name in detail:
+                    assert_equal(relationships[field_name], detail[field_name])
+        assert_equal(listed[self.node._id]['forks']['links']['related']['meta']['count'], 1)
+        assert_equal(listed[self.linked_node._id]['linked_by_nodes']['links']['related']['meta']['count'], 1)
+
+    def test_related_count_counts_each_object(self):
+        related_count = base_serializers.RelatedCount('osf.NodeRelation', 'parent', is_node_link=True)
+        other = factories.ProjectFactory()
+        counts = related_count.get_counts([self.node.pk, other.pk])
+        assert_equal(counts, {self.node.pk: 1, other.pk: 0})
+
 
 @pytest.mark.django_db
 class TestRelationshipField:
@@ -1,7 +1,10 @@
 import functools
+import mock
 import pytest
 
 from api.base.settings.defaults import API_BASE
+from api.base.views import BaseContributorList
+from api.nodes.views import NodeContributorsList
 from framework.auth.core import Auth
 from osf_tests.factories import (
     ProjectFactory,
@@ -155,3 +158,41 @@ class TestNodeEmbeds:
         res = app.get(url, auth=write_contrib_one.auth)
         assert res.status_code == 200
         assert res.json['data']['embeds']['contributors']['meta']['total_bibliographic'] == 3
+
+    def test_list_embeds_are_batched(
+            self, app, user, root_node, child_one, child_two):
+        url = '/{}nodes/?embed=contributors&version=2.1'.format(API_BASE)
+        bulk_queryset = BaseContributorList.get_bulk_embed_queryset
+        with mock.patch.object(BaseContributorList, 'get_bulk_embed_queryset', autospec=True, side_effect=bulk_queryset) as mock_bulk:
+            res = app.get(url, auth=user.auth)
+        assert mock_bulk.call_count == 1
+
+        listed = {node['id']: node['embeds']['contributors'] for node in res.json['data']}
+        assert set(listed) >= {root_node._id, child_one._id, child_two._id}
+        for node in (root_node, child_one, child_two):
+            detail_url = '/{}nodes/{}/?embed=contributors&version=2.1'.format(API_BASE, node._id)
+            detail = app.get(detail_url, auth=user.auth).json['data']['embeds']['contributors']
+            assert listed[node._id] == detail
+
+    def test_batched_list_embeds_skip_per_node_queryset(
+            self, app, user, root_node, child_one, child_two):
+        url = '/{}nodes/?embed=contributors&version=2.1'.format(API_BASE)
+        get_queryset = NodeContributorsList.get_queryset
+        with mock.patch.object(NodeContributorsList, 'get_queryset', autospec=True, side_effect=get_queryset) as mock_get_queryset:
+            res = app.get(url, auth=user.auth)
+        assert res.status_code == 200
+        assert mock_get_queryset.call_count == 0
+
+    def test_sorted_list_embeds_are_not_batched(
+            self, app, user, root_node, child_one, child_two):
+        url = '/{}nodes/?embed=contributors&sort=-modified&version=2.1'.format(API_BASE)
+        bulk_queryset = BaseContributorList.get_bulk_embed_queryset
+        with mock.patch.object(BaseContributorList, 'get_bulk_embed_queryset', autospec=True, side_effect=bulk_queryset) as mock_bulk:
+            res = app.get(url, auth=user.auth)
+        assert mock_bulk.call_count == 0
+
+        listed = {node['id']: node['embeds']['contributors'] for node in res.json['data']}
+        for node in (root_node, child_one, child_two):
+            detail_url = '/{}nodes/{}/?embed=contributors&sort=-modified&version=2.1'.format(API_BASE, node._id)
+            detail = app.get(detail_url, auth=user.auth).json['data']['embeds']['contributors']
+            assert listed[node._id] == detail
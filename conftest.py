@@ -46,6 +46,20 @@ def override_settings():
     website_settings.BCRYPT_LOG_ROUNDS = 1
     # Make sure we don't accidentally send any emails
     website_settings.SENDGRID_API_KEY = None
+    # Reset process-wide caches so that tests do not share cached state
+    from framework.auth import cas
+    from addons.osfstorage.models import waterbutler_bundle_cache
+    from api.citations import utils as citation_utils
+    from website.archiver import utils as archiver_utils
+    from website.mails import mails
+    from osf.models import RegistrationSchema
+    cas.profile_cache.clear()
+    waterbutler_bundle_cache.clear()
+    citation_utils.style_cache.clear()
+    citation_utils.citation_cache.clear()
+    archiver_utils.file_map_cache.clear()
+    mails.subject_template_cache.clear()
+    RegistrationSchema._prereg_schema_id = None
 
 
 @pytest.fixture()
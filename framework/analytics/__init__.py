@@ -5,7 +5,8 @@ import logging
 from flask import request
 
 from framework.celery_tasks import app
-from framework.postcommit_tasks.handlers import run_postcommit
+from framework.postcommit_tasks.handlers import enqueue_postcommit_task, get_task_from_postcommit_queue
+from website import settings
 
 logger = logging.getLogger(__name__)
 
@@ -18,11 +19,31 @@ collection = None
 # else:
 #     raise RuntimeError('Cannot connect to database')
 
-@run_postcommit(once_per_request=False, celery=True)
 @app.task(max_retries=5, default_retry_delay=60)
-def increment_user_activity_counters(user_id, action, date_string):
+def bulk_increment_user_activity_counters(increments):
     from osf.models import UserActivityCounter
-    return UserActivityCounter.increment(user_id, action, date_string)
+    return UserActivityCounter.bulk_increment(increments)
+
+
+def increment_user_activity_counters(user_id, action, date_string):
+    """Count an action towards a user's activity points after the request's transaction has been committed.
+    All the actions of a request are counted by a single task.
+    """
+    if settings.DEBUG_MODE:
+        return bulk_increment_user_activity_counters([[user_id, action, date_string]])
+    task = get_task_from_postcommit_queue(
+        'framework.analytics.bulk_increment_user_activity_counters',
+        predicate=lambda task: True
+    )
+    if task:
+        task.kwargs['increments'].append([user_id, action, date_string])
+    else:
+        enqueue_postcommit_task(
+            bulk_increment_user_activity_counters,
+            (),
+            {'increments': [[user_id, action, date_string]]},
+            celery=True
+        )
 
 
 def get_total_activity_count(user_id):
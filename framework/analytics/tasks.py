@@ -0,0 +1,14 @@
+import logging
+
+from framework.celery_tasks import app
+
+logger = logging.getLogger(__name__)
+
+
+@app.task(ignore_results=True)
+def flush_page_counters(batch_size=10000):
+    """Fold buffered page views and downloads into their PageCounters"""
+    from osf.models import PageCounter
+    flushed = PageCounter.flush_increments(batch_size=batch_size)
+    logger.info('Flushed {} page counter increments'.format(flushed))
+    return flushed
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
+import copy
 import furl
+import hashlib
 import httplib as http
 import json
 import urllib
@@ -12,8 +14,12 @@ from framework.auth import authenticate, external_first_login_authenticate
 from framework.auth.core import get_user, generate_verification_key
 from framework.flask import redirect
 from framework.exceptions import HTTPError
+from osf.utils.caching import LRUCache
 from website import settings
 
+# Profiles of authenticated access tokens, keyed by a hash of the token
+profile_cache = LRUCache(settings.CAS_PROFILE_CACHE_MAX_ENTRIES)
+
 
 class CasError(HTTPError):
     """General CAS-related error."""
@@ -123,11 +129,18 @@ class CasClient(object):
     def profile(self, access_token):
         """
         Send request to get profile information, given an access token.
+        Authenticated profiles are cached for ``CAS_PROFILE_CACHE_TIMEOUT`` seconds.
 
         :param str access_token: CAS access_token.
         :rtype: CasResponse
         :raises: CasError if an unexpected response is returned.
         """
+        use_cache = bool(settings.CAS_PROFILE_CACHE_TIMEOUT)
+        cache_key = get_token_cache_key(access_token)
+        if use_cache:
+            cached = profile_cache.get(cache_key)
+            if cached is not None:
+                return copy.deepcopy(cached)
 
         url = self.get_profile_url()
         headers = {
@@ -135,7 +148,10 @@ class CasClient(object):
         }
         resp = requests.get(url, headers=headers)
         if resp.status_code == 200:
-            return self._parse_profile(resp.content, access_token)
+            cas_resp = self._parse_profile(resp.content, access_token)
+            if use_cache and cas_resp.authenticated:
+                profile_cache.set(cache_key, copy.deepcopy(cas_resp), timeout=settings.CAS_PROFILE_CACHE_TIMEOUT)
+            return cas_resp
         else:
             self._handle_error(resp)
 
@@ -180,6 +196,11 @@ class CasClient(object):
 
     def revoke_tokens(self, payload):
         """Revoke a tokens based on payload"""
+        if 'token' in payload:
+            profile_cache.delete(get_token_cache_key(payload['token']))
+        else:
+            # Cached profiles do not record their application
+            profile_cache.clear()
         url = self.get_auth_token_revocation_url()
 
         resp = requests.post(url, data=payload)
@@ -212,6 +233,21 @@ def get_client():
     return CasClient(settings.CAS_SERVER_URL)
 
 
+def get_token_cache_key(access_token):
+    return hashlib.sha256(access_token.encode('utf-8')).hexdigest()
+
+
+def get_profile_cache_stats():
+    """Hit rate of the access token profile cache of this process, for monitoring"""
+    lookups = profile_cache.hits + profile_cache.misses
+    return {
+        'hits': profile_cache.hits,
+        'misses': profile_cache.misses,
+        'hit_rate': float(profile_cache.hits) / lookups if lookups else None,
+        'size': len(profile_cache),
+    }
+
+
 def get_login_url(*args, **kwargs):
     """
     Convenience function for getting a login URL for a service.
@@ -1,5 +1,8 @@
 import smtplib
 import logging
+import threading
+import time
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 
 from framework.celery_tasks import app
@@ -58,6 +61,115 @@ def send_email(from_addr, to_addr, subject, message, mimetype='html', ttls=True,
         )
 
 
+@app.task
+def send_emails(messages):
+    """Send a batch of emails. Uses the same transport as ``send_email``, but sends every
+    message over the same pooled SMTP connection or SendGrid client. A message that fails
+    is logged and does not stop the rest of the batch.
+
+    :param list messages: dicts of the keyword arguments of ``send_email``
+    :return: the number of messages sent
+    """
+    if not settings.USE_EMAIL:
+        return
+    client = sendgrid.SendGridClient(settings.SENDGRID_API_KEY) if settings.SENDGRID_API_KEY else None
+    sent = 0
+    for kwargs in messages:
+        try:
+            if client:
+                kwargs = {key: value for key, value in kwargs.items() if key not in ('ttls', 'login', 'username', 'password')}
+                ret = _send_with_sendgrid(client=client, **kwargs)
+            else:
+                kwargs = {key: value for key, value in kwargs.items() if key not in ('categories', 'attachment_name', 'attachment_content')}
+                ret = _send_with_smtp(**kwargs)
+        except Exception:
+            logger.exception('Failed to send email to {}'.format(kwargs.get('to_addr')))
+            sentry.log_exception()
+            continue
+        if ret:
+            sent += 1
+    return sent
+
+
+class SMTPConnectionPool(object):
+    """Keeps SMTP connections open, after EHLO, STARTTLS and login, so that they can be
+    reused for later messages to the same server with the same credentials.
+
+    At most ``max_size`` idle connections are kept per server and user. Connections are
+    closed once they are ``max_age`` seconds old, and whenever sending on them fails.
+    """
+
+    def __init__(self, max_size, max_age):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.opened = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self, ttls=True, login=True, username=None, password=None):
+        key = (settings.MAIL_SERVER, ttls, login, username)
+        opened_at, conn = self._checkout(key)
+        if conn is None:
+            opened_at, conn = time.time(), self._connect(ttls, login, username, password)
+        try:
+            yield conn
+        except Exception:
+            self._close(conn)
+            raise
+        self._checkin(key, opened_at, conn)
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for _, conn in connections:
+                self._close(conn)
+
+    def _connect(self, ttls, login, username, password):
+        conn = smtplib.SMTP(settings.MAIL_SERVER)
+        conn.ehlo()
+        if ttls:
+            conn.starttls()
+            conn.ehlo()
+        if login:
+            conn.login(username, password)
+        self.opened += 1
+        return conn
+
+    def _checkout(self, key):
+        expired = []
+        found = (None, None)
+        with self._lock:
+            connections = self._idle.get(key, [])
+            while connections:
+                opened_at, conn = connections.pop()
+                if time.time() - opened_at < self.max_age:
+                    found = (opened_at, conn)
+                    break
+                expired.append(conn)
+        for conn in expired:
+            self._close(conn)
+        return found
+
+    def _checkin(self, key, opened_at, conn):
+        with self._lock:
+            connections = self._idle.setdefault(key, [])
+            if len(connections) < self.max_size and time.time() - opened_at < self.max_age:
+                connections.append((opened_at, conn))
+                return
+        self._close(conn)
+
+    def _close(self, conn):
+        try:
+            conn.quit()
+        except (smtplib.SMTPException, IOError):
+            conn.close()
+
+
+smtp_pool = SMTPConnectionPool(settings.MAIL_SMTP_POOL_SIZE, settings.MAIL_SMTP_CONNECTION_MAX_AGE)
+
+
 def _send_with_smtp(from_addr, to_addr, subject, message, mimetype='html', ttls=True, login=True, username=None, password=None):
     username = username or settings.MAIL_USERNAME
     password = password or settings.MAIL_PASSWORD
@@ -71,20 +183,21 @@ def _send_with_smtp(from_addr, to_addr, subject, message, mimetype='html', ttls=
     msg['From'] = from_addr
     msg['To'] = to_addr
 
-    s = smtplib.SMTP(settings.MAIL_SERVER)
-    s.ehlo()
-    if ttls:
-        s.starttls()
-        s.ehlo()
-    if login:
-        s.login(username, password)
-    s.sendmail(
-        from_addr=from_addr,
-        to_addrs=[to_addr],
-        msg=msg.as_string()
-    )
-    s.quit()
-    return True
+    # A pooled connection may have been dropped by the server since it was last used;
+    # the message was not accepted then, so retry it once on a new connection.
+    for attempt in range(2):
+        try:
+            with smtp_pool.connection(ttls=ttls, login=login, username=username, password=password) as s:
+                s.sendmail(
+                    from_addr=from_addr,
+                    to_addrs=[to_addr],
+                    msg=msg.as_string()
+                )
+        except smtplib.SMTPServerDisconnected:
+            if attempt:
+                raise
+        else:
+            return True
 
 
 def _send_with_sendgrid(from_addr, to_addr, subject, message, mimetype='html', categories=None, attachment_name=None, attachment_content=None, client=None):
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# Stores OsfStorageFileNode._materialized_path for file trees created before it
+# was maintained on save. Until a row is backfilled its path is computed with a
+# recursive query on every read.
+
+from __future__ import unicode_literals
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from addons.osfstorage.models import OsfStorageFile, OsfStorageFolder
+from osf.models import TrashedFileNode
+from scripts import utils as script_utils
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_SQL = """
+    WITH RECURSIVE paths_cte(id, path) AS (
+      SELECT
+        T.id,
+        T.name || CASE WHEN T.type = %(file_type)s THEN '' ELSE '/' END
+      FROM osf_basefilenode AS T
+      WHERE T.id IN %(root_ids)s
+      UNION ALL
+      SELECT
+        T.id,
+        R.path || T.name || CASE WHEN T.type = %(file_type)s THEN '' ELSE '/' END
+      FROM paths_cte AS R
+        JOIN osf_basefilenode AS T ON T.parent_id = R.id
+      WHERE T.type NOT IN %(trashed_types)s
+    )
+    UPDATE osf_basefilenode
+    SET _materialized_path = paths_cte.path
+    FROM paths_cte
+    WHERE osf_basefilenode.id = paths_cte.id
+      AND osf_basefilenode._materialized_path IS DISTINCT FROM paths_cte.path;
+"""
+
+
+def backfill_materialized_paths(page_size=1000, dry_run=False):
+    root_ids = list(
+        OsfStorageFolder.objects.filter(parent__isnull=True).order_by('id').values_list('id', flat=True)
+    )
+    logger.info('Backfilling materialized paths under {} osfstorage roots.'.format(len(root_ids)))
+    updated = 0
+    for start in range(0, len(root_ids), page_size):
+        page = tuple(root_ids[start:start + page_size])
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(BACKFILL_SQL, {
+                    'root_ids': page,
+                    'file_type': OsfStorageFile._typedmodels_type,
+                    'trashed_types': tuple(TrashedFileNode._typedmodels_subtypes),
+                })
+                updated += cursor.rowcount
+            if dry_run:
+                transaction.set_rollback(True)
+        logger.info('Processed {} of {} roots, {} file nodes updated'.format(start + len(page), len(root_ids), updated))
+    return updated
+
+
+class Command(BaseCommand):
+    """
+    Backfill BaseFileNode._materialized_path for osfstorage files and folders.
+    """
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--dry',
+            action='store_true',
+            dest='dry_run',
+            help='Run the backfill and roll back changes to db',
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=1000,
+            dest='page_size',
+            help='Number of root folders to process per transaction',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        if not dry_run:
+            script_utils.add_file_logger(logger, __file__)
+        backfill_materialized_paths(page_size=options['page_size'], dry_run=dry_run)
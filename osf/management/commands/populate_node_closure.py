@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Rebuilds osf_nodeclosure from osf_noderelation. The table is kept in sync by
+# NodeRelation signals; this command backfills it and repairs any drift.
+
+from __future__ import unicode_literals
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from osf.models.node_relation import NodeClosure
+from scripts import utils as script_utils
+
+logger = logging.getLogger(__name__)
+
+
+def populate_node_closure(dry_run=False):
+    with transaction.atomic():
+        count = NodeClosure.rebuild()
+        logger.info('Wrote {} node closure rows.'.format(count))
+        if dry_run:
+            raise RuntimeError('Dry run, transaction rolled back.')
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the ancestor/descendant closure table for the component tree.
+    """
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--dry',
+            action='store_true',
+            dest='dry_run',
+            help='Run the rebuild and roll back changes to db',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        if not dry_run:
+            script_utils.add_file_logger(logger, __file__)
+        populate_node_closure(dry_run=dry_run)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Recomputes the per-folder checked out counts behind OsfStorageFolder.is_checked_out.
+# Counts are maintained on save; this command repairs them after bulk updates
+# that bypass OsfStorageFileNode.save.
+
+from __future__ import unicode_literals
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from addons.osfstorage.models import FolderCheckoutCount
+from scripts import utils as script_utils
+
+logger = logging.getLogger(__name__)
+
+
+def repair_checkout_counts(dry_run=False):
+    with transaction.atomic():
+        count = FolderCheckoutCount.rebuild()
+        logger.info('{} osfstorage folders contain checked out files.'.format(count))
+        if dry_run:
+            raise RuntimeError('Dry run, transaction rolled back.')
+
+
+class Command(BaseCommand):
+    """
+    Rebuild FolderCheckoutCount from the checkout column of osfstorage files and folders.
+    """
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--dry',
+            action='store_true',
+            dest='dry_run',
+            help='Run the repair and roll back changes to db',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        if not dry_run:
+            script_utils.add_file_logger(logger, __file__)
+        repair_checkout_counts(dry_run=dry_run)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.13 on 2018-10-08 14:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_node_closure(state, schema):
+    # Same query as NodeClosure.rebuild, against the historical models
+    NodeClosure = state.get_model('osf', 'NodeClosure')
+    NodeRelation = state.get_model('osf', 'NodeRelation')
+    with schema.connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO "{closure}" (ancestor_id, descendant_id, depth)
+            WITH RECURSIVE tree AS (
+                SELECT parent_id AS ancestor_id, child_id AS descendant_id, 1 AS depth
+                FROM "{noderelation}"
+                WHERE is_node_link IS FALSE
+            UNION ALL
+                SELECT T.ancestor_id, R.child_id, T.depth + 1
+                FROM tree AS T
+                    JOIN "{noderelation}" AS R ON R.parent_id = T.descendant_id
+                WHERE R.is_node_link IS FALSE
+            ) SELECT ancestor_id, descendant_id, MIN(depth)
+              FROM tree
+              GROUP BY ancestor_id, descendant_id;
+        """.format(closure=NodeClosure._meta.db_table, noderelation=NodeRelation._meta.db_table))
+
+
+def noop(state, schema):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0135_user_settings_waffles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NodeClosure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='osf.AbstractNode')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='osf.AbstractNode')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='nodeclosure',
+            unique_together=set([('ancestor', 'descendant')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='nodeclosure',
+            index_together=set([('descendant', 'depth')]),
+        ),
+        migrations.RunPython(populate_node_closure, noop),
+    ]
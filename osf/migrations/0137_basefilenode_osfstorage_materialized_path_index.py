@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.13 on 2018-10-09 15:03
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0136_nodeclosure'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                """
+                CREATE INDEX osf_basefilenode_osfstorage_materialized_path_index
+                ON public.osf_basefilenode (target_content_type_id, target_object_id, _materialized_path text_pattern_ops)
+                WHERE provider = 'osfstorage';
+                """
+            ], [
+                """
+                DROP INDEX IF EXISTS osf_basefilenode_osfstorage_materialized_path_index RESTRICT;
+                """
+            ]
+        )
+    ]
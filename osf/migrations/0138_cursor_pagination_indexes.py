@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.13 on 2018-10-12 10:21
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0137_basefilenode_osfstorage_materialized_path_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                """
+                CREATE INDEX osf_abstractnode_modified_id_index
+                ON public.osf_abstractnode (modified, id);
+                """,
+                """
+                CREATE INDEX osf_osfuser_date_registered_id_index
+                ON public.osf_osfuser (date_registered, id);
+                """
+            ], [
+                """
+                DROP INDEX IF EXISTS osf_abstractnode_modified_id_index RESTRICT;
+                """,
+                """
+                DROP INDEX IF EXISTS osf_osfuser_date_registered_id_index RESTRICT;
+                """
+            ]
+        )
+    ]
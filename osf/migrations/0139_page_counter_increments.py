@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.13 on 2018-10-15 14:02
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0138_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPageCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('unique', models.PositiveIntegerField(default=0)),
+                ('visitors', models.BinaryField(blank=True, null=True)),
+                ('page_counter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_counts', to='osf.PageCounter')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PageCounterIncrement',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page', models.CharField(db_index=True, max_length=300)),
+                ('date', models.DateField()),
+                ('counted', models.BooleanField(default=True)),
+                ('visitor', models.CharField(blank=True, max_length=40, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='pagecounter',
+            name='visitors',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailypagecount',
+            unique_together=set([('page_counter', 'date')]),
+        ),
+        # Copy the per-day counts out of PageCounter.date; the JSON column is left in place
+        migrations.RunSQL(
+            """
+            INSERT INTO osf_dailypagecount (page_counter_id, date, total, "unique")
+            SELECT pc.id, to_date(d.key, 'YYYY/MM/DD'),
+              COALESCE((d.value->>'total')::int, 0), COALESCE((d.value->>'unique')::int, 0)
+            FROM osf_pagecounter pc, jsonb_each(pc.date) d
+            WHERE d.key ~ '^\\d{4}/\\d{2}/\\d{2}$';
+            """,
+            migrations.RunSQL.noop
+        ),
+    ]
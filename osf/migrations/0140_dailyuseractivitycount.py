@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.13 on 2018-10-16 15:31
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0139_page_counter_increments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUserActivityCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(max_length=255)),
+                ('date', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('counter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_counts', to='osf.UserActivityCounter')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyuseractivitycount',
+            unique_together=set([('counter', 'action', 'date')]),
+        ),
+        # Copy the per-action, per-day counts out of UserActivityCounter.action; the JSON columns are left in place
+        migrations.RunSQL(
+            """
+            INSERT INTO osf_dailyuseractivitycount (counter_id, action, date, count)
+            SELECT uac.id, a.key, to_date(d.key, 'YYYY/MM/DD'), (d.value #>> '{}')::int
+            FROM osf_useractivitycounter uac, jsonb_each(uac.action) a, jsonb_each(a.value->'date') d
+            WHERE d.key ~ '^\\d{4}/\\d{2}/\\d{2}$';
+            """,
+            migrations.RunSQL.noop
+        ),
+    ]
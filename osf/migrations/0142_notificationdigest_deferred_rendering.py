@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.13 on 2018-10-26 14:37
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import osf.utils.datetime_aware_jsonfield
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0141_searchindexqueue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationdigest',
+            name='context',
+            field=osf.utils.datetime_aware_jsonfield.DateTimeAwareJSONField(blank=True, encoder=osf.utils.datetime_aware_jsonfield.DateTimeAwareJSONEncoder, null=True),
+        ),
+        migrations.AddField(
+            model_name='notificationdigest',
+            name='template',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+    ]
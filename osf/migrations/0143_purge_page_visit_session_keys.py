@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.13 on 2018-10-29 10:12
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0142_notificationdigest_deferred_rendering'),
+    ]
+
+    operations = [
+        # PageCounter no longer tracks unique visitors in the session
+        migrations.RunSQL(
+            """
+            UPDATE osf_session SET data = data - 'visited' - 'visited_by_date'
+            WHERE data ? 'visited' OR data ? 'visited_by_date';
+            """,
+            migrations.RunSQL.noop
+        ),
+    ]
@@ -1,23 +1,31 @@
+import hashlib
 import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
 
 from dateutil import parser
-from django.db import models, transaction
-from django.db.models import Sum
-from django.db.models.expressions import RawSQL
+from django.db import connection, models, transaction
+from django.db.models import Count, Sum
 from django.utils import timezone
+from flask import has_request_context, request
+from psycopg2 import Binary
+from psycopg2.extras import execute_values
 
 from framework.sessions import session
 from osf.models.base import BaseModel
 from osf.utils.datetime_aware_jsonfield import DateTimeAwareJSONField
+from osf.utils.hyperloglog import HyperLogLog
 
 logger = logging.getLogger(__name__)
 
 
 class UserActivityCounter(BaseModel):
+    """A user's activity points. Per-day counts of each action are kept in DailyUserActivityCount."""
     primary_identifier_name = '_id'
 
     _id = models.CharField(max_length=5, null=False, blank=False, db_index=True,
                            unique=True)  # 5 in prod
+    # Per-action and per-day counts from before DailyUserActivityCount, no longer updated
     action = DateTimeAwareJSONField(default=dict)
     date = DateTimeAwareJSONField(default=dict)
     total = models.PositiveIntegerField(default=0)
@@ -31,58 +39,107 @@ class UserActivityCounter(BaseModel):
 
     @classmethod
     def increment(cls, user_id, action, date_string):
-        date = parser.parse(date_string).strftime('%Y/%m/%d')
-        with transaction.atomic():
-            # select_for_update locks the row but only inside a transaction
-            uac, created = cls.objects.select_for_update().get_or_create(_id=user_id)
-            if uac.total > 0:
-                uac.total += 1
-            else:
-                uac.total = 1
-            if action in uac.action:
-                uac.action[action]['total'] += 1
-                if date in uac.action[action]['date']:
-                    uac.action[action]['date'][date] += 1
-                else:
-                    uac.action[action]['date'][date] = 1
-            else:
-                uac.action[action] = dict(total=1, date={date: 1})
-            if date in uac.date:
-                uac.date[date]['total'] += 1
-            else:
-                uac.date[date] = dict(total=1)
-            uac.save()
+        return cls.bulk_increment([(user_id, action, date_string)])
+
+    @classmethod
+    def bulk_increment(cls, increments):
+        """Count a batch of actions with one upsert per table.
+        :param list increments: (user_id, action, date_string) tuples
+        """
+        if not increments:
+            return False
+        totals = Counter()
+        daily = Counter()
+        for user_id, action, date_string in increments:
+            totals[user_id] += 1
+            daily[user_id, action, parser.parse(date_string).date()] += 1
+        # Sorted so that concurrent batches lock rows in the same order
+        totals = sorted(totals.items())
+        daily = sorted(daily.items())
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                """
+                WITH counters AS (
+                  INSERT INTO osf_useractivitycounter (_id, action, date, total, created, modified)
+                  VALUES {}
+                  ON CONFLICT (_id) DO UPDATE SET
+                    total = osf_useractivitycounter.total + EXCLUDED.total,
+                    modified = EXCLUDED.modified
+                  RETURNING id, _id
+                )
+                INSERT INTO osf_dailyuseractivitycount (counter_id, action, date, count)
+                SELECT counters.id, increments.action, increments.date, increments.count
+                FROM (VALUES {}) AS increments (user_id, action, date, count)
+                JOIN counters ON counters._id = increments.user_id
+                ON CONFLICT (counter_id, action, date) DO UPDATE SET
+                  count = osf_dailyuseractivitycount.count + EXCLUDED.count;
+                """.format(
+                    ', '.join(["(%s, '{}', '{}', %s, now(), now())"] * len(totals)),
+                    ', '.join(['(%s, %s, %s::date, %s)'] * len(daily)),
+                ),
+                [param for user_id, total in totals for param in (user_id, total)] +
+                [param for (user_id, action, date), count in daily for param in (user_id, action, date, count)]
+            )
         return True
 
 
+class DailyUserActivityCount(models.Model):
+    counter = models.ForeignKey(UserActivityCounter, related_name='daily_counts', on_delete=models.CASCADE)
+    action = models.CharField(max_length=255)
+    date = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('counter', 'action', 'date')
+
+
 class PageCounter(BaseModel):
+    """Download and view counts of a page.
+
+    ``update_counter`` does not touch this row; it appends a PageCounterIncrement, so concurrent
+    downloads of one file never wait on each other. ``flush_increments``, run periodically by
+    ``framework.analytics.tasks.flush_page_counters``, folds the increments into ``total``/``unique``
+    and into per-day DailyPageCounts. Reads add any unflushed increments.
+
+    Unique visitors are counted with HyperLogLog sketches of hashed visitor ids, so nothing is
+    stored in the visitor's session and a sketch stays 1KB however many visitors a page has.
+    Counters from before the sketches start with an empty one: ``unique`` keeps its old value,
+    and a visitor counted before then is counted once more on their next visit.
+    """
     primary_identifier_name = '_id'
 
     _id = models.CharField(max_length=300, null=False, blank=False, db_index=True,
                            unique=True)  # 272 in prod
+    # Per-day counts from before DailyPageCount, no longer updated
     date = DateTimeAwareJSONField(default=dict)
 
     total = models.PositiveIntegerField(default=0)
     unique = models.PositiveIntegerField(default=0)
+    # HyperLogLog sketch of the visitors counted in unique since the sketch was added
+    visitors = models.BinaryField(null=True, blank=True)
 
     DOWNLOAD_ALL_VERSIONS_ID_PATTERN = r'^download:[^:]*:{1}[^:]*$'
+    # Sketches of days before this many days ago are dropped by flush_increments
+    DAILY_VISITORS_RETENTION = 2
 
     @classmethod
     def get_all_downloads_on_date(cls, date):
         """
         Queries the total number of downloads on a date
-        :param str date: must be formatted the same as a page counter key so 'yyyy/mm/dd'
+        :param datetime date: the day to sum downloads for
         :return: long sum:
         """
-        formatted_date = date.strftime('%Y/%m/%d')
-        # Get all PageCounters with data for the date made for all versions downloads,
+        if hasattr(date, 'date'):
+            date = date.date()
+        # Only count PageCounters made for all versions downloads,
         # regex insures one colon so all versions are queried.
-        page_counters = cls.objects.filter(date__has_key=formatted_date, _id__regex=cls.DOWNLOAD_ALL_VERSIONS_ID_PATTERN)
-
-        # Get the total download numbers from the nested dict on the PageCounter by annotating it as daily_total then
-        # aggregating the sum.
-        daily_total = page_counters.annotate(daily_total=RawSQL("((date->%s->>'total')::int)", (formatted_date,))).aggregate(sum=Sum('daily_total'))['sum']
-
+        daily_total = DailyPageCount.objects.filter(
+            date=date, page_counter___id__regex=cls.DOWNLOAD_ALL_VERSIONS_ID_PATTERN,
+        ).aggregate(sum=Sum('total'))['sum']
+        pending = PageCounterIncrement.objects.filter(date=date, page__regex=cls.DOWNLOAD_ALL_VERSIONS_ID_PATTERN).count()
+        if pending:
+            return (daily_total or 0) + pending
         return daily_total
 
     @staticmethod
@@ -93,74 +150,210 @@ class PageCounter(BaseModel):
             '$', '_'
         )
 
+    @staticmethod
+    def get_visitor():
+        """A hash identifying the current visitor: their user, their session or failing that their address"""
+        user_id = session.data.get('auth_user_id')
+        if user_id:
+            visitor = 'user:{}'.format(user_id)
+        elif session._id:
+            visitor = 'session:{}'.format(session._id)
+        elif has_request_context():
+            visitor = 'remote:{}:{}'.format(request.remote_addr, request.headers.get('User-Agent', ''))
+        else:
+            return None
+        return hashlib.sha1(visitor.encode('utf-8')).hexdigest()
+
     @classmethod
     def update_counter(cls, page, node_info):
-        cleaned_page = cls.clean_page(page)
-        date = timezone.now()
-        date_string = date.strftime('%Y/%m/%d')
-        visited_by_date = session.data.get('visited_by_date', {'date': date_string, 'pages': []})
-
-        with transaction.atomic():
-            model_instance, created = cls.objects.select_for_update().get_or_create(_id=cleaned_page)
-
-            # if they visited something today
-            if date_string == visited_by_date['date']:
-                # if they haven't visited this page today
-                if cleaned_page not in visited_by_date['pages']:
-                    # if the model_instance has today in it
-                    if date_string in model_instance.date.keys():
-                        # increment the number of unique visitors for today
-                        model_instance.date[date_string]['unique'] += 1
-                    else:
-                        # set the number of unique visitors for today to 1
-                        model_instance.date[date_string] = dict(unique=1)
-            # if they haven't visited something today
-            else:
-                # set their visited by date to blank
-                visited_by_date['date'] = date_string
-                visited_by_date['pages'] = []
-                # if the model_instance has today in it
-                if date_string in model_instance.date.keys():
-                    # increment the number of unique visitors for today
-                    model_instance.date[date_string]['unique'] += 1
-                else:
-                    # set the number of unique visitors to 1
-                    model_instance.date[date_string] = dict(unique=1)
-
-            # update their sessions
-            visited_by_date['pages'].append(cleaned_page)
-            session.data['visited_by_date'] = visited_by_date
-
-            if date_string in model_instance.date.keys():
-                if 'total' not in model_instance.date[date_string].keys():
-                    model_instance.date[date_string].update(total=0)
-                model_instance.date[date_string]['total'] += 1
-            else:
-                model_instance.date[date_string] = dict(total=1)
-
-            # if a download counter is being updated, only perform the update
-            # if the user who is downloading isn't a contributor to the project
-            page_type = cleaned_page.split(':')[0]
-            if page_type in ('download', 'view') and node_info:
-                if node_info['contributors'].filter(guids___id__isnull=False, guids___id=session.data.get('auth_user_id')).exists():
-                    model_instance.save()
-                    return
-
-            visited = session.data.get('visited', [])
-            if page not in visited:
-                model_instance.unique += 1
-                visited.append(page)
-                session.data['visited'] = visited
-
-            session.save()
-            model_instance.total += 1
-
-            model_instance.save()
+        increment = PageCounterIncrement(page=cls.clean_page(page), date=timezone.now().date(), visitor=cls.get_visitor())
+
+        # if a download counter is being updated, only count it towards the page's totals
+        # if the user who is downloading isn't a contributor to the project
+        page_type = increment.page.split(':')[0]
+        if page_type in ('download', 'view') and node_info:
+            if node_info['contributors'].filter(guids___id__isnull=False, guids___id=session.data.get('auth_user_id')).exists():
+                increment.counted = False
+
+        increment.save()
+
+    @staticmethod
+    def _add_visitors(sketch, visitors):
+        """Adds ``visitors`` to a saved sketch; returns the new sketch and the number of new unique visitors"""
+        hll = HyperLogLog.from_bytes(sketch)
+        before = hll.cardinality()
+        for visitor in visitors:
+            if visitor:
+                hll.add(visitor)
+        return hll.to_bytes(), hll.cardinality() - before
+
+    @classmethod
+    def flush_increments(cls, batch_size=10000):
+        """Fold pending PageCounterIncrements into PageCounters and DailyPageCounts.
+        Each batch takes the same number of statements however many pages it touches, see
+        _fold_increments. Rows locked by a concurrent flush are skipped. Returns the number
+        of increments flushed.
+        """
+        flushed = 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    DELETE FROM osf_pagecounterincrement
+                    WHERE id IN (
+                      SELECT id FROM osf_pagecounterincrement ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING page, date, counted, visitor;
+                    """, [batch_size]
+                )
+                increments = cursor.fetchall()
+                if increments:
+                    cls._fold_increments(cursor, increments)
+
+            flushed += len(increments)
+            if len(increments) < batch_size:
+                break
+
+        DailyPageCount.objects.filter(
+            date__lt=timezone.now().date() - timedelta(days=cls.DAILY_VISITORS_RETENTION),
+            visitors__isnull=False,
+        ).update(visitors=None)
+        return flushed
+
+    @classmethod
+    def _fold_increments(cls, cursor, increments):
+        """Add a batch of (page, date, counted, visitor) increments to the counters. The counters and
+        daily counts are created if missing and locked with one statement each, their sketches are
+        merged here, and each table is then written with one upsert.
+        """
+        by_page = defaultdict(list)
+        by_date = defaultdict(list)
+        for page, date, counted, visitor in increments:
+            by_date[page, date].append(visitor)
+            if counted:
+                by_page[page].append(visitor)
+
+        # Lock in a consistent order so that concurrent flushes cannot deadlock
+        pages = sorted(set(page for page, _ in by_date))
+        execute_values(
+            cursor,
+            """
+            INSERT INTO osf_pagecounter (_id, date, total, "unique", created, modified) VALUES %s
+            ON CONFLICT (_id) DO NOTHING;
+            """,
+            [(page, ) for page in pages],
+            template="(%s, '{}'::jsonb, 0, 0, now(), now())",
+            page_size=len(increments),
+        )
+        cursor.execute(
+            'SELECT _id, id, visitors FROM osf_pagecounter WHERE _id = ANY(%s) ORDER BY _id FOR UPDATE;', [pages]
+        )
+        counters = {page: (counter_id, sketch) for page, counter_id, sketch in cursor.fetchall()}
+
+        counter_rows = []
+        for page, visitors in sorted(by_page.items()):
+            sketch, new_visitors = cls._add_visitors(counters[page][1], visitors)
+            counter_rows.append((page, len(visitors), new_visitors, Binary(sketch)))
+        if counter_rows:
+            execute_values(
+                cursor,
+                """
+                INSERT INTO osf_pagecounter (_id, date, total, "unique", visitors, created, modified) VALUES %s
+                ON CONFLICT (_id) DO UPDATE SET
+                  total = osf_pagecounter.total + EXCLUDED.total,
+                  "unique" = osf_pagecounter."unique" + EXCLUDED."unique",
+                  visitors = EXCLUDED.visitors,
+                  modified = EXCLUDED.modified;
+                """,
+                counter_rows,
+                template="(%s, '{}'::jsonb, %s, %s, %s, now(), now())",
+                page_size=len(increments),
+            )
+
+        days = sorted((counters[page][0], date, visitors) for (page, date), visitors in by_date.items())
+        execute_values(
+            cursor,
+            """
+            INSERT INTO osf_dailypagecount (page_counter_id, date, total, "unique") VALUES %s
+            ON CONFLICT (page_counter_id, date) DO NOTHING;
+            """,
+            [(counter_id, date) for counter_id, date, _ in days],
+            template='(%s, %s, 0, 0)',
+            page_size=len(increments),
+        )
+        cursor.execute(
+            """
+            SELECT page_counter_id, date, visitors FROM osf_dailypagecount
+            WHERE (page_counter_id, date) IN (SELECT * FROM unnest(%s::integer[], %s::date[]))
+            ORDER BY page_counter_id, date FOR UPDATE;
+            """,
+            [[counter_id for counter_id, _, _ in days], [date for _, date, _ in days]]
+        )
+        day_sketches = {(counter_id, date): sketch for counter_id, date, sketch in cursor.fetchall()}
+
+        daily_rows = []
+        for counter_id, date, visitors in days:
+            sketch, new_visitors = cls._add_visitors(day_sketches[counter_id, date], visitors)
+            daily_rows.append((counter_id, date, len(visitors), new_visitors, Binary(sketch)))
+        execute_values(
+            cursor,
+            """
+            INSERT INTO osf_dailypagecount (page_counter_id, date, total, "unique", visitors) VALUES %s
+            ON CONFLICT (page_counter_id, date) DO UPDATE SET
+              total = osf_dailypagecount.total + EXCLUDED.total,
+              "unique" = osf_dailypagecount."unique" + EXCLUDED."unique",
+              visitors = EXCLUDED.visitors;
+            """,
+            daily_rows,
+            template='(%s, %s, %s, %s, %s)',
+            page_size=len(increments),
+        )
+
+    @classmethod
+    def get_totals(cls, prefix):
+        """Returns {page: total} for every page starting with ``prefix``, including unflushed increments"""
+        totals = dict(cls.objects.filter(_id__startswith=prefix).values_list('_id', 'total'))
+        pending = (
+            PageCounterIncrement.objects.filter(page__startswith=prefix, counted=True)
+            .values_list('page').annotate(total=Count('pk')).order_by()
+        )
+        for page, total in pending:
+            totals[page] = totals.get(page, 0) + total
+        return totals
 
     @classmethod
     def get_basic_counters(cls, page):
+        cleaned_page = cls.clean_page(page)
+        visitors = list(PageCounterIncrement.objects.filter(page=cleaned_page, counted=True).values_list('visitor', flat=True))
         try:
-            counter = cls.objects.get(_id=cls.clean_page(page))
-            return (counter.unique, counter.total)
+            counter = cls.objects.get(_id=cleaned_page)
         except cls.DoesNotExist:
-            return (None, None)
+            if not visitors:
+                return (None, None)
+            counter = cls(_id=cleaned_page)
+        if visitors:
+            _, new_visitors = cls._add_visitors(counter.visitors, visitors)
+            return (counter.unique + new_visitors, counter.total + len(visitors))
+        return (counter.unique, counter.total)
+
+
+class PageCounterIncrement(models.Model):
+    """A download or view that has not been added to its PageCounter yet"""
+    page = models.CharField(max_length=300, db_index=True)
+    date = models.DateField()
+    # Whether this counts towards PageCounter.total; downloads by contributors only count per day
+    counted = models.BooleanField(default=True)
+    # See PageCounter.get_visitor
+    visitor = models.CharField(max_length=40, null=True, blank=True)
+
+
+class DailyPageCount(models.Model):
+    page_counter = models.ForeignKey(PageCounter, related_name='daily_counts', on_delete=models.CASCADE)
+    date = models.DateField(db_index=True)
+    total = models.PositiveIntegerField(default=0)
+    unique = models.PositiveIntegerField(default=0)
+    # HyperLogLog sketch of the day's visitors, kept while increments for the day may still arrive
+    visitors = models.BinaryField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('page_counter', 'date')
@@ -29,6 +29,9 @@ class AbstractSchema(ObjectIDMixin, BaseModel):
 
 
 class RegistrationSchema(AbstractSchema):
+    # See get_prereg_schema_id
+    _prereg_schema_id = None
+
     @property
     def _config(self):
         return self.schema.get('config', {})
@@ -65,6 +68,13 @@ class RegistrationSchema(AbstractSchema):
             schema_version=2
         )
 
+    @classmethod
+    def get_prereg_schema_id(cls):
+        """Primary key of the Prereg Challenge schema, looked up once per process"""
+        if cls._prereg_schema_id is None:
+            cls._prereg_schema_id = cls.objects.filter(name='Prereg Challenge', schema_version=2).values_list('id', flat=True).get()
+        return cls._prereg_schema_id
+
     def validate_metadata(self, metadata, reviewer=False, required_fields=False):
         """
         Validates registration_metadata field.
@@ -21,7 +21,6 @@ from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.functional import cached_property
 from keen import scoped_keys
-from psycopg2._psycopg import AsIs
 from typedmodels.models import TypedModel, TypedModelManager
 from include import IncludeManager
 
@@ -37,7 +36,7 @@ from osf.models.identifiers import Identifier, IdentifierMixin
 from osf.models.licenses import NodeLicenseRecord
 from osf.models.mixins import (AddonModelMixin, CommentableMixin, Loggable,
                                NodeLinkMixin, Taggable, TaxonomizableMixin)
-from osf.models.node_relation import NodeRelation
+from osf.models.node_relation import NodeClosure, NodeRelation
 from osf.models.nodelog import NodeLog
 from osf.models.sanctions import RegistrationApproval
 from osf.models.private_link import PrivateLink
@@ -47,6 +46,7 @@ from osf.models.user import OSFUser
 from osf.models.validators import validate_doi, validate_title
 from framework.auth.core import Auth, get_user
 from osf.utils.datetime_aware_jsonfield import DateTimeAwareJSONField
+from osf.utils.permission_cache import get_permission_cache, invalidate_permission_cache
 from osf.utils.fields import NonNaiveDateTimeField
 from osf.utils.requests import DummyRequest, get_request_and_user_id
 from osf.utils import sanitize
@@ -81,51 +81,16 @@ class AbstractNodeQuerySet(GuidMixinQuerySet):
 
     def get_children(self, root, active=False):
         # If `root` is a root node, we can use the 'descendants' related name
-        # rather than doing a recursive query
+        # rather than querying the closure table
         if root.id == root.root_id:
             query = root.descendants.exclude(id=root.id)
-            if active:
-                query = query.filter(is_deleted=False)
-            return query
         else:
-            sql = """
-                WITH RECURSIVE descendants AS (
-                SELECT
-                    parent_id,
-                    child_id,
-                    1 AS LEVEL,
-                    ARRAY[parent_id] as pids
-                FROM %s
-                %s
-                WHERE is_node_link IS FALSE AND parent_id = %s %s
-                UNION ALL
-                SELECT
-                    d.parent_id,
-                    s.child_id,
-                    d.level + 1,
-                    d.pids || s.parent_id
-                FROM descendants AS d
-                    JOIN %s AS s
-                    ON d.child_id = s.parent_id
-                WHERE s.is_node_link IS FALSE AND %s = ANY(pids)
-                ) SELECT array_agg(DISTINCT child_id)
-                FROM descendants
-                WHERE parent_id = %s;
-            """
-            with connection.cursor() as cursor:
-                node_relation_table = AsIs(NodeRelation._meta.db_table)
-                cursor.execute(sql, [
-                    node_relation_table,
-                    AsIs('LEFT JOIN osf_abstractnode ON {}.child_id = osf_abstractnode.id'.format(node_relation_table) if active else ''),
-                    root.pk,
-                    AsIs('AND osf_abstractnode.is_deleted IS FALSE' if active else ''),
-                    node_relation_table,
-                    root.pk,
-                    root.pk])
-                row = cursor.fetchone()[0]
-                if not row:
-                    return AbstractNode.objects.none()
-                return AbstractNode.objects.filter(id__in=row)
+            query = AbstractNode.objects.filter(
+                id__in=NodeClosure.objects.filter(ancestor_id=root.pk).values('descendant_id')
+            )
+        if active:
+            query = query.filter(is_deleted=False)
+        return query
 
     def can_view(self, user=None, private_link=None):
         qs = self.filter(is_public=True)
@@ -146,21 +111,11 @@ class AbstractNodeQuerySet(GuidMixinQuerySet):
 
             sqs = Contributor.objects.filter(node=models.OuterRef('pk'), user__id=user, read=True)
             qs |= self.annotate(can_view=models.Exists(sqs)).filter(can_view=True)
-            qs |= self.extra(where=["""
-                "osf_abstractnode".id in (
-                    WITH RECURSIVE implicit_read AS (
-                        SELECT "osf_contributor"."node_id"
-                        FROM "osf_contributor"
-                        WHERE "osf_contributor"."user_id" = %s
-                        AND "osf_contributor"."admin" is TRUE
-                    UNION ALL
-                        SELECT "osf_noderelation"."child_id"
-                        FROM "implicit_read"
-                        LEFT JOIN "osf_noderelation" ON "osf_noderelation"."parent_id" = "implicit_read"."node_id"
-                        WHERE "osf_noderelation"."is_node_link" IS FALSE
-                    ) SELECT * FROM implicit_read
-                )
-            """], params=(user, ))
+            admin_node_ids = Contributor.objects.filter(user__id=user, admin=True).values('node_id')
+            qs |= self.filter(
+                Q(id__in=admin_node_ids) |
+                Q(id__in=NodeClosure.objects.filter(ancestor_id__in=admin_node_ids).values('descendant_id'))
+            )
 
         return qs
 
@@ -231,6 +186,14 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         'preprint_file',
     }
 
+    # Node fields that trigger an update to the search documents of the node's files on save
+    FILE_SEARCH_UPDATE_FIELDS = {
+        'title',
+        'is_public',
+        'is_deleted',
+        'retraction',
+    }
+
     # Node fields that trigger an identifier update on save
     IDENTIFIER_UPDATE_FIELDS = {
         'title',
@@ -737,11 +700,11 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
             logger.exception(e)
             log_exception()
 
-    def update_search(self):
+    def update_search(self, saved_fields=None):
         from website import search
 
         try:
-            search.search.update_node(self, bulk=False, async=True)
+            search.search.update_node(self, bulk=False, async=True, saved_fields=saved_fields)
         except search.exceptions.SearchUnavailableError as e:
             logger.exception(e)
             log_exception()
@@ -864,6 +827,9 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
             for contrib in self.contributor_set.all():
                 if contrib.user_id == user.id:
                     return get_contributor_permissions(contrib)
+        cache = get_permission_cache()
+        if cache is not None:
+            return cache.get_permissions(user, self)
         try:
             contrib = user.contributor_set.get(node=self)
         except Contributor.DoesNotExist:
@@ -886,8 +852,12 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         """
         if not user:
             return False
-        query = {'node': self, permission: True}
-        has_permission = user.contributor_set.filter(**query).exists()
+        cache = get_permission_cache()
+        if cache is not None:
+            has_permission = cache.has_permission(user, self, permission)
+        else:
+            query = {'node': self, permission: True}
+            has_permission = user.contributor_set.filter(**query).exists()
         if not has_permission and permission == 'read' and check_parent:
             return self.is_admin_parent(user)
         return has_permission
@@ -904,12 +874,15 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         return False
 
     def is_admin_parent(self, user):
-        if self.has_permission(user, 'admin', check_parent=False):
-            return True
-        parent = self.parent_node
-        if parent:
-            return parent.is_admin_parent(user)
-        return False
+        if not user:
+            return False
+        cache = get_permission_cache()
+        if cache is not None:
+            return cache.is_admin_parent(user, self)
+        return user.contributor_set.filter(
+            Q(node=self) | Q(node__in=self.ancestor_links.values('ancestor_id')),
+            admin=True
+        ).exists()
 
     def find_readable_descendants(self, auth):
         """ Returns a generator of first descendant node(s) readable by <user>
@@ -928,9 +901,13 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
 
     @property
     def parents(self):
-        if self.parent_node:
-            return [self.parent_node] + self.parent_node.parents
-        return []
+        """Ancestors of this node, nearest first."""
+        if not self.pk:
+            return []
+        return [
+            link.ancestor for link in
+            self.ancestor_links.select_related('ancestor').order_by('depth')
+        ]
 
     @property
     def admin_contributor_ids(self):
@@ -1694,39 +1671,10 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         return self.private_links.filter(is_deleted=True).values_list('key', flat=True)
 
     def get_root(self):
-        sql = """
-            WITH RECURSIVE ascendants AS (
-              SELECT
-                parent_id,
-                child_id,
-                1 AS LEVEL,
-                ARRAY[child_id] as cids
-              FROM %s
-              WHERE is_node_link IS FALSE and child_id = %s
-              UNION ALL
-              SELECT
-                S.parent_id,
-                D.child_id,
-                D.level + 1,
-                D.cids || S.child_id
-              FROM ascendants AS D
-                JOIN %s AS S
-                  ON D.parent_id = S.child_id
-              WHERE S.is_node_link IS FALSE
-                AND %s = ANY(cids)
-            ) SELECT parent_id
-              FROM ascendants
-              WHERE child_id = %s
-              ORDER BY level DESC
-              LIMIT 1;
-        """
-        with connection.cursor() as cursor:
-            node_relation_table = AsIs(NodeRelation._meta.db_table)
-            cursor.execute(sql, [node_relation_table, self.pk, node_relation_table, self.pk, self.pk])
-            res = cursor.fetchone()
-            if res:
-                return AbstractNode.objects.get(pk=res[0])
-            return self
+        link = self.ancestor_links.select_related('ancestor').order_by('-depth').first() if self.pk else None
+        if link:
+            return link.ancestor
+        return self
 
     def find_readable_antecedent(self, auth):
         """ Returns first antecendant node readable by <user>.
@@ -1745,6 +1693,7 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
             contrib.node = self
             contribs.append(contrib)
         Contributor.objects.bulk_create(contribs)
+        invalidate_permission_cache()
 
     def register_node(self, schema, auth, data, parent=None):
         """Make a frozen copy of a node.
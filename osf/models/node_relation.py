@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import connection, models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 from .base import BaseModel, ObjectIDMixin
 
@@ -25,3 +27,92 @@ class NodeRelation(ObjectIDMixin, BaseModel):
         index_together = (
             ('is_node_link', 'child', 'parent'),
         )
+
+
+class NodeClosure(models.Model):
+    """Transitive closure of the component tree (node links are excluded).
+
+    One row exists for every (ancestor, descendant) pair, where ``depth`` is the
+    number of NodeRelation hops between them. A node is not stored as its own
+    ancestor. Rows are maintained by the NodeRelation signal handlers below and
+    can be rebuilt with the ``populate_node_closure`` management command.
+    """
+    ancestor = models.ForeignKey('AbstractNode', related_name='descendant_links', on_delete=models.CASCADE)
+    descendant = models.ForeignKey('AbstractNode', related_name='ancestor_links', on_delete=models.CASCADE)
+    depth = models.PositiveIntegerField()
+
+    def __unicode__(self):
+        return 'ancestor={}, descendant={}, depth={}'.format(self.ancestor_id, self.descendant_id, self.depth)
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        index_together = (
+            ('descendant', 'depth'),
+        )
+
+    @classmethod
+    def link(cls, parent_id, child_id):
+        """Attach the subtree rooted at ``child_id`` beneath ``parent_id`` and all of its ancestors."""
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO "{closure}" (ancestor_id, descendant_id, depth)
+                SELECT A.ancestor_id, D.descendant_id, A.depth + D.depth + 1
+                FROM (
+                    SELECT ancestor_id, depth FROM "{closure}" WHERE descendant_id = %(parent)s
+                    UNION ALL SELECT %(parent)s, 0
+                ) AS A
+                CROSS JOIN (
+                    SELECT descendant_id, depth FROM "{closure}" WHERE ancestor_id = %(child)s
+                    UNION ALL SELECT %(child)s, 0
+                ) AS D
+                ON CONFLICT (ancestor_id, descendant_id) DO NOTHING;
+            """.format(closure=cls._meta.db_table), {'parent': parent_id, 'child': child_id})
+
+    @classmethod
+    def unlink(cls, parent_id, child_id):
+        """Detach the subtree rooted at ``child_id`` from ``parent_id`` and all of its ancestors."""
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                DELETE FROM "{closure}"
+                WHERE descendant_id IN (
+                    SELECT descendant_id FROM "{closure}" WHERE ancestor_id = %(child)s
+                    UNION ALL SELECT %(child)s
+                ) AND ancestor_id IN (
+                    SELECT ancestor_id FROM "{closure}" WHERE descendant_id = %(parent)s
+                    UNION ALL SELECT %(parent)s
+                );
+            """.format(closure=cls._meta.db_table), {'parent': parent_id, 'child': child_id})
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute the whole table from osf_noderelation. Returns the number of rows written."""
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM "{closure}";'.format(closure=cls._meta.db_table))
+            cursor.execute("""
+                INSERT INTO "{closure}" (ancestor_id, descendant_id, depth)
+                WITH RECURSIVE tree AS (
+                    SELECT parent_id AS ancestor_id, child_id AS descendant_id, 1 AS depth
+                    FROM "{noderelation}"
+                    WHERE is_node_link IS FALSE
+                UNION ALL
+                    SELECT T.ancestor_id, R.child_id, T.depth + 1
+                    FROM tree AS T
+                        JOIN "{noderelation}" AS R ON R.parent_id = T.descendant_id
+                    WHERE R.is_node_link IS FALSE
+                ) SELECT ancestor_id, descendant_id, MIN(depth)
+                  FROM tree
+                  GROUP BY ancestor_id, descendant_id;
+            """.format(closure=cls._meta.db_table, noderelation=NodeRelation._meta.db_table))
+            return cursor.rowcount
+
+
+@receiver(post_save, sender=NodeRelation)
+def add_node_closure(sender, instance, created, **kwargs):
+    if not instance.is_node_link:
+        NodeClosure.link(instance.parent_id, instance.child_id)
+
+
+@receiver(post_delete, sender=NodeRelation)
+def remove_node_closure(sender, instance, **kwargs):
+    if not instance.is_node_link:
+        NodeClosure.unlink(instance.parent_id, instance.child_id)
@@ -4,6 +4,7 @@ from osf.models import Node
 from osf.models import OSFUser
 from osf.models.base import BaseModel, ObjectIDMixin
 from osf.models.validators import validate_subscription_type
+from osf.utils.datetime_aware_jsonfield import DateTimeAwareJSONField
 from osf.utils.fields import NonNaiveDateTimeField
 from website.notifications.constants import NOTIFICATION_TYPES
 from website.util import api_v2_url
@@ -100,3 +101,6 @@ class NotificationDigest(ObjectIDMixin, BaseModel):
     message = models.TextField()
     # TODO: Could this be a m2m with or without an order field?
     node_lineage = ArrayField(models.CharField(max_length=5))
+    # Set instead of message when rendering is deferred to digest time, see emails.store_emails
+    template = models.CharField(max_length=100, null=True, blank=True)
+    context = DateTimeAwareJSONField(null=True, blank=True)
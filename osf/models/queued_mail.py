@@ -4,7 +4,7 @@ from django.db import models
 from django.utils import timezone
 
 from osf.utils.fields import NonNaiveDateTimeField
-from website.mails import Mail, send_mail
+from website.mails import Mail, send_mail, send_mails
 from website.mails import presends
 from website import settings as osf_settings
 
@@ -47,6 +47,20 @@ class QueuedMail(ObjectIDMixin, BaseModel):
         through send_mail()
         :return: boolean based on whether email was sent.
         """
+        message = self.prepare_mail()
+        if message is None:
+            return False
+        send_mail(**message)
+        self.sent_at = timezone.now()
+        self.save()
+        return True
+
+    def prepare_mail(self):
+        """
+        Constructs the mail object and checks presend and the user's subscription to help mails.
+        :return: the arguments of send_mail for this email, or None if it is not to be sent,
+        in which case it is deleted.
+        """
         mail_struct = queue_mail_types[self.email_type]
         presend = mail_struct['presend'](self)
         mail = Mail(
@@ -56,13 +70,29 @@ class QueuedMail(ObjectIDMixin, BaseModel):
         )
         self.data['osf_url'] = osf_settings.DOMAIN
         if presend and self.user.is_active and self.user.osf_mailing_lists.get(osf_settings.OSF_HELP_LIST):
-            send_mail(self.to_addr or self.user.username, mail, mimetype='html', **(self.data or {}))
-            self.sent_at = timezone.now()
-            self.save()
-            return True
-        else:
-            self.__class__.delete(self)
-            return False
+            return dict(self.data or {}, to_addr=self.to_addr or self.user.username, mail=mail, mimetype='html')
+        self.__class__.delete(self)
+        return None
+
+    @classmethod
+    def send_batch(cls, queued_mails):
+        """
+        Like send_mail for each of queued_mails, but sends them together through send_mails()
+        and marks them sent with a single update.
+        :return: the emails that were sent
+        """
+        prepared = []
+        for queued_mail in queued_mails:
+            message = queued_mail.prepare_mail()
+            if message is not None:
+                prepared.append((queued_mail, message))
+        if prepared:
+            send_mails([message for _, message in prepared])
+            sent_at = timezone.now()
+            cls.objects.filter(id__in=[queued_mail.id for queued_mail, _ in prepared]).update(sent_at=sent_at)
+            for queued_mail, _ in prepared:
+                queued_mail.sent_at = sent_at
+        return [queued_mail for queued_mail, _ in prepared]
 
     def find_sent_of_same_type_and_user(self):
         """
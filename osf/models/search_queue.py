@@ -0,0 +1,62 @@
+from django.db import connection, models
+
+from osf.models.base import BaseModel
+
+
+class SearchIndexQueue(BaseModel):
+    """Documents waiting to be (re)indexed in elasticsearch, see website.search.elastic_search.drain_index_queue.
+    A document is queued at most once; queuing it again before it is indexed is a no-op.
+    """
+    DOC_TYPES = (
+        ('node', 'node'),
+        ('user', 'user'),
+        ('file', 'file'),
+    )
+
+    doc_type = models.CharField(max_length=8, choices=DOC_TYPES)
+    # The _id of the node, user or file
+    target_id = models.CharField(max_length=255)
+    # Whether the node's osfstorage files should be reindexed too
+    include_files = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('doc_type', 'target_id')
+
+    @classmethod
+    def enqueue(cls, doc_type, target_ids, include_files=False):
+        target_ids = sorted(set(target_ids))
+        if not target_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO osf_searchindexqueue (doc_type, target_id, include_files, created, modified)
+                VALUES {}
+                ON CONFLICT (doc_type, target_id) DO UPDATE SET
+                  include_files = osf_searchindexqueue.include_files OR EXCLUDED.include_files,
+                  modified = EXCLUDED.modified;
+                """.format(', '.join(['(%s, %s, %s, now(), now())'] * len(target_ids))),
+                [param for target_id in target_ids for param in (doc_type, target_id, include_files)]
+            )
+
+    @classmethod
+    def pop(cls, limit):
+        """Remove and return up to ``limit`` of the oldest entries as
+        (doc_type, target_id, include_files, created) tuples. Entries being indexed by another
+        worker are skipped. Call inside a transaction so that the entries are restored if it is rolled back.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                DELETE FROM osf_searchindexqueue
+                WHERE id IN (
+                  SELECT id FROM osf_searchindexqueue
+                  ORDER BY created
+                  LIMIT %s
+                  FOR UPDATE SKIP LOCKED
+                )
+                RETURNING doc_type, target_id, include_files, created;
+                """,
+                [limit]
+            )
+            return sorted(cursor.fetchall(), key=lambda entry: entry[3])
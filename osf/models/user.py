@@ -46,6 +46,7 @@ from osf.models.validators import validate_email, validate_social, validate_hist
 from osf.utils.datetime_aware_jsonfield import DateTimeAwareJSONField
 from osf.utils.fields import NonNaiveDateTimeField, LowercaseEmailField
 from osf.utils.names import impute_names
+from osf.utils.permission_cache import invalidate_permission_cache
 from osf.utils.requests import check_select_for_update
 from website import settings as website_settings
 from website import filters, mails
@@ -712,6 +713,7 @@ class OSFUser(DirtyFieldsMixin, GuidMixin, BaseModel, AbstractBaseUser, Permissi
                 node.contributor_set.filter(user=user).delete()
             else:
                 node.contributor_set.filter(user=user).update(user=self)
+                invalidate_permission_cache()
 
             node.save()
 
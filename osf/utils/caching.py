@@ -8,9 +8,15 @@ The property can also be safely set and deleted without interference.
 NOTE: Properties will *not* be cached if they return `None`. Use
 `django.utils.functional.cached_property` for properties that
 can return `None` and do not need a setter.
+
+Also provides LRUCache, a bounded in-process cache for values that may be
+shared between requests.
 """
 from __future__ import unicode_literals
 
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
 
 # from https://github.com/etianen/django-optimizations/blob/master/src/optimizations/propertycache.py
@@ -65,3 +71,61 @@ class _CachedProperty(property):
 
 # Public name for the cached property decorator. Using a class as a decorator just looks plain ugly. :P
 cached_property = _CachedProperty
+
+
+class LRUCache(object):
+    """A bounded, thread-safe least-recently-used cache for process-wide memoization.
+
+    Entries beyond ``max_size`` are evicted oldest-use first. If ``timeout`` is
+    given, entries older than that many seconds are treated as missing.
+    ``hits`` and ``misses`` count lookups for instrumentation.
+    """
+
+    def __init__(self, max_size, timeout=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires < time.time():
+                self.misses += 1
+                return default
+            self._data[key] = (expires, value)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = timeout if timeout is not None else self.timeout
+        expires = time.time() + timeout if timeout is not None else None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (expires, value)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def __contains__(self, key):
+        return self.get(key, default=_missing) is not _missing
+
+    def __len__(self):
+        return len(self._data)
+
+
+_missing = object()
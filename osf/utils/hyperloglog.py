@@ -0,0 +1,78 @@
+"""
+A HyperLogLog sketch for estimating the number of distinct values seen.
+
+A sketch is ``2 ** precision`` one-byte registers regardless of how many values are
+added to it; at the default precision that is 1KB with a standard error of about 3%.
+Small cardinalities use linear counting and are close to exact.
+"""
+from __future__ import division
+
+import hashlib
+import math
+
+DEFAULT_PRECISION = 10
+
+
+class HyperLogLog(object):
+
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is None:
+            self.registers = bytearray(self.size)
+        else:
+            self.registers = bytearray(registers)
+            if len(self.registers) != self.size:
+                raise ValueError('Expected {} registers, got {}'.format(self.size, len(self.registers)))
+
+    @classmethod
+    def from_bytes(cls, data, precision=DEFAULT_PRECISION):
+        """Load a sketch saved with ``to_bytes``; an empty value gives an empty sketch."""
+        if not data:
+            return cls(precision=precision)
+        return cls(precision=precision, registers=data)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        """Add a value to the sketch. Returns True if the sketch changed."""
+        if not isinstance(value, bytes):
+            value = value.encode('utf-8')
+        hashed = int(hashlib.sha1(value).hexdigest()[:16], 16)
+        index = hashed >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        remaining = hashed & ((1 << remaining_bits) - 1)
+        # Position of the leftmost 1 bit in the remaining bits
+        rank = remaining_bits - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def update(self, other):
+        """Merge another sketch of the same precision into this one."""
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge sketches of different precision')
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def cardinality(self):
+        m = self.size
+        if m == 16:
+            alpha = 0.673
+        elif m == 32:
+            alpha = 0.697
+        elif m == 64:
+            alpha = 0.709
+        else:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(b'\x00')
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.cardinality()
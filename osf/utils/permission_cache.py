@@ -0,0 +1,120 @@
+"""
+A request-scoped cache of contributor permissions.
+
+Serializers, permission classes and notification helpers ask the same
+``has_permission``/``is_admin_parent`` questions about the same (user, node)
+pairs many times while handling one request. The first question about a user
+loads all of that user's Contributor rows in one query; questions about implicit
+(admin-parent) read access load the set of nodes beneath the user's admin nodes
+in one more query. Everything else is answered from memory.
+
+The cache lives on the current Django or Flask request and is therefore
+discarded at the end of the request. Outside of a request (celery tasks,
+scripts, tests) no cache is used and every check hits the database.
+"""
+from __future__ import unicode_literals
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from osf.models.contributor import Contributor, get_contributor_permissions
+from osf.models.node_relation import NodeClosure
+from osf.utils.requests import dummy_request, get_current_request
+
+CACHE_ATTR = '_permission_cache'
+
+
+class PermissionCache(object):
+
+    def __init__(self):
+        # user id -> {node id: Contributor-like row}
+        self._contributors = {}
+        # user id -> set of node ids the user administers directly or through a parent
+        self._admin_descendants = {}
+        #: Number of permission checks answered without a query
+        self.hits = 0
+        #: Number of queries issued to fill the cache
+        self.queries = 0
+
+    def _get_contributors(self, user):
+        contributors = self._contributors.get(user.id)
+        if contributors is None:
+            self.queries += 1
+            contributors = {
+                contrib.node_id: contrib
+                for contrib in Contributor.objects.filter(user_id=user.id).only('node', 'read', 'write', 'admin')
+            }
+            self._contributors[user.id] = contributors
+        else:
+            self.hits += 1
+        return contributors
+
+    def _get_admin_descendants(self, user):
+        admin_descendants = self._admin_descendants.get(user.id)
+        if admin_descendants is None:
+            admin_node_ids = {
+                node_id for node_id, contrib in self._get_contributors(user).items() if contrib.admin
+            }
+            admin_descendants = set(admin_node_ids)
+            if admin_node_ids:
+                self.queries += 1
+                admin_descendants.update(
+                    NodeClosure.objects.filter(ancestor_id__in=admin_node_ids).values_list('descendant_id', flat=True)
+                )
+            self._admin_descendants[user.id] = admin_descendants
+        else:
+            self.hits += 1
+        return admin_descendants
+
+    def get_permissions(self, user, node):
+        contrib = self._get_contributors(user).get(node.id)
+        if contrib is None:
+            return []
+        return get_contributor_permissions(contrib)
+
+    def has_permission(self, user, node, permission):
+        contrib = self._get_contributors(user).get(node.id)
+        return bool(contrib and getattr(contrib, permission))
+
+    def is_admin_parent(self, user, node):
+        return node.id in self._get_admin_descendants(user)
+
+    def invalidate(self, user_id=None):
+        if user_id is None:
+            self._contributors.clear()
+            self._admin_descendants.clear()
+        else:
+            self._contributors.pop(user_id, None)
+            self._admin_descendants.pop(user_id, None)
+
+
+def get_permission_cache():
+    """Return the PermissionCache for the current request, or None if not in a request."""
+    req = get_current_request()
+    if req is dummy_request:
+        return None
+    cache = getattr(req, CACHE_ATTR, None)
+    if cache is None:
+        cache = PermissionCache()
+        setattr(req, CACHE_ATTR, cache)
+    return cache
+
+
+def invalidate_permission_cache(user_id=None):
+    """Drop cached permissions for ``user_id``, or for every user if not given."""
+    cache = getattr(get_current_request(), CACHE_ATTR, None)
+    if cache is not None:
+        cache.invalidate(user_id)
+
+
+@receiver(post_save, sender=Contributor)
+@receiver(post_delete, sender=Contributor)
+def invalidate_contributor_permissions(sender, instance, **kwargs):
+    invalidate_permission_cache(instance.user_id)
+
+
+@receiver(post_save, sender='osf.NodeRelation')
+@receiver(post_delete, sender='osf.NodeRelation')
+def invalidate_implicit_permissions(sender, instance, **kwargs):
+    if not instance.is_node_link:
+        invalidate_permission_cache()
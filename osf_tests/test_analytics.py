@@ -3,20 +3,24 @@
 Unit tests for analytics logic in framework/analytics/__init__.py
 """
 import re
+import threading
 import unittest
 
 import mock
 import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from nose.tools import *  # flake8: noqa  (PEP8 asserts)
 from flask import Flask
 
-from datetime import datetime
+from datetime import date, datetime
 
 from addons.osfstorage.models import OsfStorageFile
 from framework import analytics, sessions
 from framework.sessions import session
-from osf.models import PageCounter, Session
+from framework.postcommit_tasks.handlers import postcommit_celery_queue
+from osf.models import DailyPageCount, PageCounter, Session, UserActivityCounter
 
 from tests.base import OsfTestCase
 from osf_tests.factories import UserFactory, ProjectFactory
@@ -44,6 +48,42 @@ class TestAnalytics(OsfTestCase):
         analytics.increment_user_activity_counters(user._id, 'project_created', date.isoformat())
         assert_equal(user.get_activity_points(), 1)
 
+    def test_bulk_increment_user_activity_counters(self):
+        user = UserFactory()
+        other_user = UserFactory()
+        analytics.increment_user_activity_counters(user._id, 'project_created', '2018-02-04T10:00:00+00:00')
+
+        analytics.bulk_increment_user_activity_counters([
+            [user._id, 'project_created', '2018-02-04T11:00:00+00:00'],
+            [user._id, 'project_created', '2018-02-05T11:00:00+00:00'],
+            [user._id, 'tag_added', '2018-02-05T11:00:00+00:00'],
+            [other_user._id, 'tag_added', '2018-02-05T11:00:00+00:00'],
+        ])
+
+        assert_equal(user.get_activity_points(), 4)
+        assert_equal(other_user.get_activity_points(), 1)
+        counts = UserActivityCounter.objects.get(_id=user._id).daily_counts.values_list('action', 'date', 'count')
+        assert_equal(set(counts), {
+            ('project_created', date(2018, 2, 4), 2),
+            ('project_created', date(2018, 2, 5), 1),
+            ('tag_added', date(2018, 2, 5), 1),
+        })
+
+    @mock.patch('framework.analytics.settings.DEBUG_MODE', False)
+    def test_increments_of_a_request_are_batched(self):
+        user = UserFactory()
+        postcommit_celery_queue().clear()
+        for action in ('project_created', 'tag_added'):
+            analytics.increment_user_activity_counters(user._id, action, '2018-02-04T10:00:00+00:00')
+
+        tasks = postcommit_celery_queue().values()
+        assert_equal(len(tasks), 1)
+        assert_equal(tasks[0].kwargs['increments'], [
+            [user._id, 'project_created', '2018-02-04T10:00:00+00:00'],
+            [user._id, 'tag_added', '2018-02-04T10:00:00+00:00'],
+        ])
+        postcommit_celery_queue().clear()
+
 
 @pytest.fixture()
 def user():
@@ -74,19 +114,22 @@ def file_node3(project):
 @pytest.fixture()
 def page_counter(project, file_node):
     page_counter_id = 'download:{}:{}'.format(project._id, file_node.id)
-    page_counter, created = PageCounter.objects.get_or_create(_id=page_counter_id, date={u'2018/02/04': {u'total': 41, u'unique': 33}})
+    page_counter, created = PageCounter.objects.get_or_create(_id=page_counter_id)
+    DailyPageCount.objects.create(page_counter=page_counter, date=date(2018, 2, 4), total=41, unique=33)
     return page_counter
 
 @pytest.fixture()
 def page_counter2(project, file_node2):
     page_counter_id = 'download:{}:{}'.format(project._id, file_node2.id)
-    page_counter, created = PageCounter.objects.get_or_create(_id=page_counter_id, date={u'2018/02/04': {u'total': 4, u'unique': 26}})
+    page_counter, created = PageCounter.objects.get_or_create(_id=page_counter_id)
+    DailyPageCount.objects.create(page_counter=page_counter, date=date(2018, 2, 4), total=4, unique=26)
     return page_counter
 
 @pytest.fixture()
 def page_counter_for_individual_version(project, file_node3):
     page_counter_id = 'download:{}:{}:0'.format(project._id, file_node3.id)
-    page_counter, created = PageCounter.objects.get_or_create(_id=page_counter_id, date={u'2018/02/04': {u'total': 1, u'unique': 1}})
+    page_counter, created = PageCounter.objects.get_or_create(_id=page_counter_id)
+    DailyPageCount.objects.create(page_counter=page_counter, date=date(2018, 2, 4), total=1, unique=1)
     return page_counter
 
 
@@ -96,31 +139,41 @@ class TestPageCounter:
     @mock.patch('osf.models.analytics.session')
     def test_download_update_counter(self, mock_session, project, file_node):
         mock_session.data = {}
+        mock_session._id = 'session1'
         page_counter_id = 'download:{}:{}'.format(project._id, file_node.id)
 
         PageCounter.update_counter(page_counter_id, {})
+        assert not PageCounter.objects.filter(_id=page_counter_id).exists()
+        assert PageCounter.get_basic_counters(page_counter_id) == (1, 1)
 
+        PageCounter.flush_increments()
         page_counter = PageCounter.objects.get(_id=page_counter_id)
         assert page_counter.total == 1
         assert page_counter.unique == 1
 
         PageCounter.update_counter(page_counter_id, {})
+        assert PageCounter.get_basic_counters(page_counter_id) == (1, 2)
 
+        PageCounter.flush_increments()
         page_counter.refresh_from_db()
         assert page_counter.total == 2
         assert page_counter.unique == 1
+        assert page_counter.daily_counts.get().total == 2
 
     @mock.patch('osf.models.analytics.session')
     def test_download_update_counter_contributor(self, mock_session, user, project, file_node):
         mock_session.data = {'auth_user_id': user._id}
+        mock_session._id = 'session1'
         page_counter_id = 'download:{}:{}'.format(project._id, file_node.id)
 
         PageCounter.update_counter(page_counter_id, {'contributors': project.contributors})
+        PageCounter.flush_increments()
         page_counter = PageCounter.objects.get(_id=page_counter_id)
         assert page_counter.total == 0
         assert page_counter.unique == 0
 
         PageCounter.update_counter(page_counter_id, {'contributors': project.contributors})
+        PageCounter.flush_increments()
 
         page_counter.refresh_from_db()
         assert page_counter.total == 0
@@ -154,6 +207,93 @@ class TestPageCounter:
 
         assert total_downloads == 45
 
+    @mock.patch('osf.models.analytics.session')
+    def test_flush_increments_in_batches(self, mock_session, project, file_node, file_node2):
+        mock_session.data = {}
+        mock_session._id = 'session1'
+        pages = ['download:{}:{}'.format(project._id, each.id) for each in (file_node, file_node2)]
+        for page in pages * 3:
+            PageCounter.update_counter(page, {})
+
+        assert PageCounter.flush_increments(batch_size=4) == 6
+        assert PageCounter.flush_increments() == 0
+        assert dict(PageCounter.objects.values_list('_id', 'total')) == {page: 3 for page in pages}
+        assert PageCounter.get_all_downloads_on_date(timezone.now()) == 6
+
+    @mock.patch('osf.models.analytics.session')
+    def test_flush_increments_query_count_does_not_grow_with_pages(self, mock_session, project):
+        mock_session.data = {}
+
+        def flush_queries(pages):
+            for i, page in enumerate(pages):
+                mock_session._id = 'session{}'.format(i)
+                PageCounter.update_counter(page, {})
+            with CaptureQueriesContext(connection) as ctx:
+                assert PageCounter.flush_increments() == len(pages)
+            return len(ctx.captured_queries)
+
+        one_page = flush_queries(['download:{}:one'.format(project._id)])
+        many_pages = flush_queries(['download:{}:{}'.format(project._id, i) for i in range(20)])
+        assert many_pages == one_page
+        assert PageCounter.get_basic_counters('download:{}:19'.format(project._id)) == (1, 1)
+
+    @mock.patch('osf.models.analytics.session')
+    def test_unique_visitors(self, mock_session, user, project, file_node):
+        page_counter_id = 'download:{}:{}'.format(project._id, file_node.id)
+        for session_id in ('session1', 'session2', 'session1'):
+            mock_session.data = {}
+            mock_session._id = session_id
+            PageCounter.update_counter(page_counter_id, {})
+        # A logged in user is the same visitor in every session
+        for session_id in ('session3', 'session4'):
+            mock_session.data = {'auth_user_id': 'abcde'}
+            mock_session._id = session_id
+            PageCounter.update_counter(page_counter_id, {})
+
+        assert PageCounter.get_basic_counters(page_counter_id) == (3, 5)
+        assert not mock_session.save.called
+        PageCounter.flush_increments()
+        assert PageCounter.get_basic_counters(page_counter_id) == (3, 5)
+
+        # Returning visitors are not counted again after a flush
+        PageCounter.update_counter(page_counter_id, {})
+        mock_session.data = {}
+        mock_session._id = 'session5'
+        PageCounter.update_counter(page_counter_id, {})
+        PageCounter.flush_increments()
+        page_counter = PageCounter.objects.get(_id=page_counter_id)
+        assert (page_counter.unique, page_counter.total) == (4, 7)
+        daily_count = page_counter.daily_counts.get()
+        assert (daily_count.unique, daily_count.total) == (4, 7)
+
+
+@pytest.mark.django_db(transaction=True)
+@mock.patch('osf.models.analytics.session')
+def test_update_counter_does_not_wait_on_counter_row(mock_session, project, file_node):
+    mock_session.data = {}
+    page_counter_id = 'download:{}:{}'.format(project._id, file_node.id)
+    PageCounter.update_counter(page_counter_id, {})
+    PageCounter.flush_increments()
+
+    def download():
+        try:
+            PageCounter.update_counter(page_counter_id, {})
+        finally:
+            connection.close()
+
+    with transaction.atomic():
+        # Hold the lock a flush or a locking writer would take on the counter
+        PageCounter.objects.select_for_update().get(_id=page_counter_id)
+        threads = [threading.Thread(target=download) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        assert not any(thread.is_alive() for thread in threads)
+
+    PageCounter.flush_increments()
+    assert PageCounter.get_basic_counters(page_counter_id) == (1, 21)
+
 
 class TestPageCounterRegex:
 
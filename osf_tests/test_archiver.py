@@ -44,6 +44,7 @@ from addons.base.models import BaseStorageAddon
 from api.base.utils import waterbutler_api_url_for
 
 from osf_tests import factories
+from addons.osfstorage.tests.factories import FileVersionFactory
 from tests.base import OsfTestCase, fake
 from tests import utils as test_utils
 from tests.utils import unique as _unique
@@ -545,6 +546,7 @@ class TestArchiverTasks(ArchiverTestCase):
         assert(mock_group.called_with(archive_dropbox_signature))
 
     @mock.patch('website.archiver.tasks.make_copy_request.delay')
+    @mock.patch('website.settings.ARCHIVE_OSFSTORAGE_WITHOUT_COPY', False)
     def test_archive_addon(self, mock_make_copy_request):
         archive_addon('osfstorage', self.archive_job._id)
         assert_equal(self.archive_job.get_target('osfstorage').status, ARCHIVER_INITIATED)
@@ -569,6 +571,33 @@ class TestArchiverTasks(ArchiverTestCase):
             )
         ))
 
+    @mock.patch('website.project.signals.archive_callback.send')
+    @mock.patch('website.archiver.tasks.make_copy_request.delay')
+    def test_archive_addon_osfstorage_without_copy(self, mock_make_copy_request, mock_callback):
+        version = FileVersionFactory()
+        src_file = self.src.get_addon('osfstorage').get_root().append_folder('data').append_file('results.csv')
+        src_file.versions.add(version)
+
+        archive_addon('osfstorage', self.archive_job._id)
+
+        assert_false(mock_make_copy_request.called)
+        assert_equal(self.archive_job.get_target('osfstorage').status, ARCHIVER_SUCCESS)
+        mock_callback.assert_called_with(self.dst)
+        archive_folder = self.dst.get_addon('osfstorage').get_root().find_child_by_name('Archive of OSF Storage', kind=0)
+        archived_file = archive_folder.find_child_by_name('data', kind=0).find_child_by_name('results.csv')
+        assert_equal(archived_file.copied_from, src_file)
+        assert_equal(list(archived_file.versions.all()), [version])
+
+    @mock.patch('website.archiver.tasks.make_copy_request.delay')
+    def test_archive_addon_osfstorage_other_region_uses_waterbutler(self, mock_make_copy_request):
+        version = FileVersionFactory(region=factories.RegionFactory())
+        self.src.get_addon('osfstorage').get_root().append_file('results.csv').versions.add(version)
+
+        archive_addon('osfstorage', self.archive_job._id)
+
+        assert_true(mock_make_copy_request.called)
+        assert_equal(self.archive_job.get_target('osfstorage').status, ARCHIVER_INITIATED)
+
     def test_archive_success(self):
         node = factories.NodeFactory(creator=self.user)
         file_trees, selected_files, node_index = generate_file_tree([node])
@@ -582,6 +611,7 @@ class TestArchiverTasks(ArchiverTestCase):
             with mock.patch.object(BaseStorageAddon, '_get_file_tree', mock.Mock(return_value=file_trees[node._id])):
                 job = factories.ArchiveJobFactory(initiator=registration.creator)
                 archive_success(registration._id, job._id)
+                assert_equal(len(archiver_utils.file_map_cache), 0)
                 registration.reload()
                 for key, question in registration.registered_meta[schema._id].items():
                     target = None
@@ -598,6 +628,23 @@ class TestArchiverTasks(ArchiverTestCase):
                         assert_equal(data[key]['value'], question['value'])
                 assert_false(selected_files)
 
+    def test_archive_success_builds_file_index_once(self):
+        node = factories.NodeFactory(creator=self.user)
+        file_trees, selected_files, node_index = generate_file_tree([node])
+        data = generate_metadata(
+            file_trees,
+            selected_files,
+            node_index
+        )
+        schema = generate_schema_from_data(data)
+        with test_utils.mock_archive(node, schema=schema, data=data, autocomplete=True, autoapprove=True) as registration:
+            with mock.patch.object(BaseStorageAddon, '_get_file_tree', mock.Mock(return_value=file_trees[node._id])):
+                with mock.patch('website.archiver.utils.get_file_index', wraps=archiver_utils.get_file_index) as mock_get_file_index:
+                    job = factories.ArchiveJobFactory(initiator=registration.creator)
+                    archive_success(registration._id, job._id)
+        assert_greater(len(selected_files), 1)
+        assert_equal(mock_get_file_index.call_count, 1)
+
     def test_archive_success_escaped_file_names(self):
         file_tree = file_tree_factory(0, 0, 0)
         fake_file = file_factory(name='>and&and<')
@@ -975,6 +1022,35 @@ class TestArchiverUtils(ArchiverTestCase):
             archiver_utils.get_file_map(node)
             assert_equal(mock_get_file_tree.call_count, call_count)
 
+    def test_get_file_map_cache_is_bounded(self):
+        nodes = [factories.NodeFactory() for _ in range(3)]
+        with mock.patch.object(archiver_utils.file_map_cache, 'max_size', 2):
+            with mock.patch.object(BaseStorageAddon, '_get_file_tree', mock.Mock(return_value=file_tree_factory(1, 1, 1))):
+                for node in nodes:
+                    archiver_utils.get_file_map(node)
+        assert_equal(len(archiver_utils.file_map_cache), 2)
+        assert_not_in(nodes[0]._id, archiver_utils.file_map_cache)
+
+    def test_find_registration_file(self):
+        node = factories.NodeFactory(creator=self.user)
+        file_tree = file_tree_factory(3, 3, 3)
+        selected = select_files_from_tree(file_tree)
+        with test_utils.mock_archive(node, autocomplete=True, autoapprove=True) as registration:
+            with mock.patch.object(BaseStorageAddon, '_get_file_tree', mock.Mock(return_value=file_tree)):
+                file_index = archiver_utils.get_file_index(registration)
+                for sha256, selected_file in selected.items():
+                    value = {
+                        'sha256': sha256,
+                        'selectedFileName': selected_file['name'],
+                        'nodeId': node._id,
+                    }
+                    assert_equal(
+                        archiver_utils.find_registration_file(value, registration, file_index=file_index),
+                        (selected_file, registration._id)
+                    )
+                missing = {'sha256': 'notasha', 'selectedFileName': 'missing.txt', 'nodeId': node._id}
+                assert_equal(archiver_utils.find_registration_file(missing, registration, file_index=file_index), (None, None))
+
 
 class TestArchiverListeners(ArchiverTestCase):
 
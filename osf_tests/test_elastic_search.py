@@ -9,25 +9,29 @@ import functools
 from nose.tools import *  # flake8: noqa (PEP8 asserts)
 import pytest
 import mock
+from elasticsearch import TransportError
 
 from framework.auth.core import Auth
 
 from website import settings
 import website.search.search as search
 from website.search import elastic_search
+from website.search.exceptions import SearchUnavailableError
 from website.search.util import build_query
-from website.search_migration.migrate import migrate, migrate_collected_metadata
+from website.search_migration.migrate import Checkpoint, migrate, migrate_collected_metadata, sql_migrate
 from osf.models import (
     Retraction,
     NodeLicense,
     Tag,
     QuickFilesNode,
+    SearchIndexQueue,
 )
 from addons.wiki.models import WikiPage
 from addons.osfstorage.models import OsfStorageFile
 
 from scripts.populate_institutions import main as populate_institutions
 
+from api_tests.utils import create_test_file
 from osf_tests import factories
 from tests.base import OsfTestCase
 from tests.test_features import requires_search
@@ -1268,3 +1272,105 @@ class TestSearchFiles(OsfTestCase):
 
         find = query_file('GreenLight.mp3')['results']
         assert_equal(len(find), 0)
+
+
+@pytest.mark.django_db
+class TestSearchIndexQueue:
+
+    @pytest.fixture()
+    def user(self):
+        return factories.AuthUserFactory()
+
+    @pytest.fixture()
+    def node(self, user):
+        return factories.ProjectFactory(creator=user, is_public=True)
+
+    @pytest.fixture()
+    def test_file(self, node, user):
+        return create_test_file(target=node, user=user)
+
+    @pytest.fixture()
+    def queue_updates(self):
+        with mock.patch.object(settings, 'USE_CELERY', True), \
+                mock.patch('website.search.search.search_engine', elastic_search):
+            SearchIndexQueue.objects.all().delete()
+            yield
+
+    def test_updates_are_queued_once(self, node, queue_updates):
+        search.update_node(node, saved_fields={'description'})
+        assert not SearchIndexQueue.objects.get(doc_type='node', target_id=node._id).include_files
+        search.update_node(node, saved_fields={'title'})
+        search.update_node(node, saved_fields={'description'})
+        entry = SearchIndexQueue.objects.get(doc_type='node', target_id=node._id)
+        assert entry.include_files
+
+    def test_drain(self, node, user, test_file, queue_updates):
+        search.update_node(node, saved_fields={'title'})
+        search.update_user(user)
+        SearchIndexQueue.enqueue('file', ['missing'])
+
+        with mock.patch.object(elastic_search, 'bulk_index') as bulk_index:
+            metrics = elastic_search.drain_index_queue()
+        actions = {(action['_op_type'], action['_type'], action['_id']) for action in bulk_index.call_args[0][0]}
+        assert actions == {
+            ('index', 'project', node._id),
+            ('index', 'user', user._id),
+            ('index', 'file', test_file._id),
+            ('delete', 'file', 'missing'),
+        }
+        assert not SearchIndexQueue.objects.exists()
+        assert metrics['types']['node']['count'] == 1
+        assert metrics['types']['file']['count'] == 1
+
+    def test_drain_failure_keeps_queue(self, node, queue_updates):
+        search.update_node(node)
+        with mock.patch.object(elastic_search, 'bulk_index', side_effect=SearchUnavailableError):
+            with pytest.raises(SearchUnavailableError):
+                elastic_search.drain_index_queue()
+        assert SearchIndexQueue.objects.filter(target_id=node._id).exists()
+
+    def test_drain_skips_documents_that_fail(self, node, user, queue_updates):
+        search.update_node(node)
+        search.update_user(user)
+        get_user_actions = elastic_search.QUEUED_ACTION_GETTERS['user']
+
+        with mock.patch.dict(elastic_search.QUEUED_ACTION_GETTERS, {'node': mock.Mock(side_effect=ValueError)}), \
+                mock.patch.object(elastic_search, 'bulk_index') as bulk_index:
+            metrics = elastic_search.drain_index_queue()
+        assert [action['_id'] for action in bulk_index.call_args[0][0]] == [action['_id'] for action in get_user_actions(user._id, False)]
+        assert metrics['types']['user']['count'] == 1
+        assert 'node' not in metrics['types']
+        assert not SearchIndexQueue.objects.exists()
+
+    def test_files_only_reindexed_for_file_fields(self, node, test_file):
+        with mock.patch.object(elastic_search, 'client'), \
+                mock.patch.object(elastic_search, 'update_file') as update_file:
+            elastic_search.update_node(node, saved_fields={'description'})
+            assert not update_file.called
+            elastic_search.update_node(node, saved_fields={'is_public'})
+            assert update_file.called
+
+
+class TestSearchMigrationCheckpoint:
+
+    def test_resumes_after_failure(self, tmpdir):
+        path = str(tmpdir.join('checkpoint.json'))
+        migrated = []
+
+        def migrate_id_range(index, sql, page_start, page_end, es_args, format_kwargs):
+            if page_start == 20 and not migrated.count(20):
+                migrated.append(page_start)
+                raise TransportError
+            migrated.append(page_start)
+            return page_start, page_end, 2
+
+        with mock.patch('website.search_migration.migrate.migrate_id_range', migrate_id_range):
+            with pytest.raises(TransportError):
+                sql_migrate('test', 'sql', 35, 10, name='nodes', checkpoint=Checkpoint(path))
+            assert migrated == [0, 10, 20]
+
+            checkpoint = Checkpoint(path)
+            assert checkpoint.is_completed('nodes', (10, 20))
+            assert not checkpoint.is_completed('nodes', (20, 30))
+            assert sql_migrate('test', 'sql', 35, 10, name='nodes', checkpoint=checkpoint) == 6
+        assert migrated == [0, 10, 20, 20, 30, 40]
@@ -13,21 +13,26 @@ from osf_tests.factories import (AuthUserFactory, ProjectFactory, RegistrationFa
 from website import settings
 
 
-def get_all_sitemap_urls():
-    # Create temporary directory for the sitemaps to be generated
+NAMESPACE = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
 
-    generate_sitemap.main()
 
-    # Parse the generated XML sitemap file
-    with open(os.path.join(settings.STATIC_FOLDER, 'sitemaps/sitemap_0.xml')) as f:
-        tree = xml.etree.ElementTree.parse(f)
+def get_all_sitemap_urls(**kwargs):
+    # Create temporary directory for the sitemaps to be generated
 
-    shutil.rmtree(settings.STATIC_FOLDER)
+    generate_sitemap.main(**kwargs)
 
-    # Get all the urls in the sitemap
+    # Parse every sitemap file listed in the index
     # Note: namespace was defined in the XML file, therefore necessary to include in tag
-    namespace = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
-    urls = [element.text for element in tree.iter(namespace + 'loc')]
+    sitemap_dir = os.path.join(settings.STATIC_FOLDER, 'sitemaps')
+    with open(os.path.join(sitemap_dir, 'sitemap_index.xml')) as f:
+        index = xml.etree.ElementTree.parse(f)
+    urls = []
+    for element in index.iter(NAMESPACE + 'loc'):
+        with open(os.path.join(sitemap_dir, element.text.split('/')[-1])) as f:
+            tree = xml.etree.ElementTree.parse(f)
+        urls.extend(element.text for element in tree.iter(NAMESPACE + 'loc'))
+
+    shutil.rmtree(settings.STATIC_FOLDER)
 
     return urls
 
@@ -175,3 +180,19 @@ class TestGenerateSitemap:
             urls = get_all_sitemap_urls()
 
         assert urlparse.urljoin(settings.DOMAIN, project_deleted.url) not in urls
+
+    def test_incremental_only_rewrites_changed_shards(self, all_included_links, create_tmp_directory, project_private):
+
+        with mock.patch('website.settings.STATIC_FOLDER', create_tmp_directory):
+            generate_sitemap.main()
+
+            with mock.patch.object(generate_sitemap.Sitemap, 'write_shard', autospec=True, return_value=1) as write_shard:
+                generate_sitemap.main(incremental=True)
+            assert [call[0][1] for call in write_shard.call_args_list] == ['static']
+
+            project_private.is_public = True
+            project_private.save()
+            urls = get_all_sitemap_urls(incremental=True)
+
+        assert urlparse.urljoin(settings.DOMAIN, project_private.url) in urls
+        assert set(all_included_links) < set(urls)
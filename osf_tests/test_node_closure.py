@@ -0,0 +1,75 @@
+import pytest
+
+from osf.models import AbstractNode, NodeClosure, NodeRelation
+from osf_tests.factories import (
+    AuthUserFactory,
+    NodeFactory,
+    ProjectFactory,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def closure_pairs():
+    return set(NodeClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+
+class TestNodeClosure:
+
+    @pytest.fixture()
+    def user(self):
+        return AuthUserFactory()
+
+    @pytest.fixture()
+    def project(self, user):
+        return ProjectFactory(creator=user)
+
+    @pytest.fixture()
+    def child(self, project):
+        return NodeFactory(parent=project, creator=project.creator)
+
+    @pytest.fixture()
+    def grandchild(self, child):
+        return NodeFactory(parent=child, creator=child.creator)
+
+    def test_component_creation_adds_closure_rows(self, project, child, grandchild):
+        assert closure_pairs() == {
+            (project.id, child.id, 1),
+            (project.id, grandchild.id, 2),
+            (child.id, grandchild.id, 1),
+        }
+
+    def test_node_links_are_not_part_of_closure(self, project, user):
+        linked = ProjectFactory(creator=user)
+        NodeRelation.objects.create(parent=project, child=linked, is_node_link=True)
+        assert not NodeClosure.objects.filter(descendant=linked).exists()
+
+    def test_removing_relation_detaches_subtree(self, project, child, grandchild):
+        NodeRelation.objects.get(parent=project, child=child).delete()
+        assert closure_pairs() == {(child.id, grandchild.id, 1)}
+
+    def test_rebuild_matches_signal_maintained_rows(self, project, child, grandchild):
+        expected = closure_pairs()
+        NodeClosure.objects.all().delete()
+        NodeClosure.rebuild()
+        assert closure_pairs() == expected
+
+    def test_parents_and_root(self, project, child, grandchild):
+        assert grandchild.parents == [child, project]
+        assert grandchild.get_root() == project
+        assert project.parents == []
+        assert project.get_root() == project
+
+    def test_get_children_of_non_root(self, child, grandchild):
+        great_grandchild = NodeFactory(parent=grandchild, creator=grandchild.creator)
+        children = AbstractNode.objects.get_children(child)
+        assert set(children) == {grandchild, great_grandchild}
+
+    def test_admin_parent_grants_implicit_read(self, project, child, grandchild):
+        admin = AuthUserFactory()
+        project.add_contributor(admin, permissions=['read', 'write', 'admin'], save=True)
+        grandchild.contributor_set.exclude(user=grandchild.creator).delete()
+
+        assert grandchild.is_admin_parent(admin)
+        assert grandchild in AbstractNode.objects.can_view(user=admin)
+        assert not grandchild.is_admin_parent(AuthUserFactory())
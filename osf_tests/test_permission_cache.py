@@ -0,0 +1,60 @@
+import mock
+import pytest
+
+from framework.auth import Auth
+from osf.utils.permission_cache import get_permission_cache
+from osf.utils.requests import DummyRequest
+from osf_tests.factories import (
+    AuthUserFactory,
+    NodeFactory,
+    ProjectFactory,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture()
+def request_context():
+    with mock.patch('osf.utils.permission_cache.get_current_request', return_value=DummyRequest()):
+        yield
+
+
+class TestPermissionCache:
+
+    @pytest.fixture()
+    def user(self):
+        return AuthUserFactory()
+
+    @pytest.fixture()
+    def project(self, user):
+        return ProjectFactory(creator=user)
+
+    @pytest.fixture()
+    def component(self, project):
+        return NodeFactory(parent=project, creator=project.creator)
+
+    def test_no_cache_outside_of_request(self):
+        assert get_permission_cache() is None
+
+    def test_repeated_checks_use_one_query(self, request_context, user, project, component, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            for _ in range(5):
+                assert project.has_permission(user, 'admin')
+                assert component.has_permission(user, 'write')
+                assert project.get_permissions(user) == ['read', 'write', 'admin']
+        assert get_permission_cache().hits > 0
+
+    def test_admin_parent(self, request_context, user, project, component):
+        grandchild = NodeFactory(parent=component)
+        assert grandchild.is_admin_parent(user)
+        assert grandchild.has_permission(user, 'read')
+        assert not grandchild.has_permission(user, 'write')
+        assert not grandchild.is_admin_parent(AuthUserFactory())
+
+    def test_contributor_changes_invalidate(self, request_context, user, project):
+        other = AuthUserFactory()
+        assert not project.has_permission(other, 'read')
+        project.add_contributor(other, permissions=['read'], save=True)
+        assert project.has_permission(other, 'read')
+        project.remove_contributor(other, auth=Auth(user), log=False)
+        assert not project.has_permission(other, 'read')
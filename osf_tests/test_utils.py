@@ -1,6 +1,7 @@
 import pytest
 
 from osf.models import Node
+from osf.utils.hyperloglog import HyperLogLog
 from osf.utils.migrations import disable_auto_now_fields
 from osf_tests.factories import NodeFactory
 
@@ -61,3 +62,32 @@ class TestDisableAutoNowContextManager:
 
         assert node.created == old_created
         assert Node._meta.get_field('created').auto_now is False
+
+
+class TestHyperLogLog:
+
+    def test_counts_distinct_values(self):
+        hll = HyperLogLog()
+        assert hll.add('a')
+        assert not hll.add('a')
+        assert hll.cardinality() == 1
+        for i in range(200):
+            hll.add(str(i))
+        assert 190 <= hll.cardinality() <= 210
+
+    def test_estimate_is_bounded(self):
+        hll = HyperLogLog()
+        for i in range(20000):
+            hll.add(str(i))
+        assert len(hll.to_bytes()) == 1024
+        assert 18000 <= hll.cardinality() <= 22000
+
+    def test_round_trip_and_merge(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        for i in range(100):
+            first.add(str(i))
+            second.add(str(i + 50))
+        first = HyperLogLog.from_bytes(first.to_bytes())
+        first.update(second)
+        assert 140 <= first.cardinality() <= 160
+        assert HyperLogLog.from_bytes(None).cardinality() == 0
@@ -1,19 +1,38 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-"""Generate a sitemap for osf.io"""
+"""Generate a sitemap for osf.io
+
+Each sitemap file is a shard holding the urls of one object type within a fixed range
+of primary keys, e.g. ``sitemap_node_3.xml`` holds the public nodes with ids in
+[3 * SITEMAP_URL_MAX, 4 * SITEMAP_URL_MAX). Objects are streamed from server-side cursors
+and written to the shard as they are read, so memory use does not grow with the number
+of objects.
+
+Because shard membership does not change between runs, shards can be written by a pool
+of processes (``--processes``), and ``--incremental`` only rewrites shards that contain
+objects modified since the shard was last written. Shard generation times are kept in
+``sitemap_manifest.json`` next to the sitemaps.
+"""
+import argparse
 import boto3
-import datetime
 import gzip
+import json
+import multiprocessing
 import os
 import shutil
 import urlparse
-import xml
+from collections import OrderedDict
+from xml.sax.saxutils import escape
 
 import django
 django.setup()
 import logging
 import tempfile
 
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils import timezone
+
 from framework import sentry
 from framework.celery_tasks import app as celery_app
 from osf.models import OSFUser, AbstractNode, PreprintService, PreprintProvider
@@ -24,13 +43,27 @@ from website.app import init_app
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+SITEMAP_NAMESPACE = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+MANIFEST_FILE_NAME = 'sitemap_manifest.json'
+
+# Shard type -> (model whose ids define the shards, urls per object)
+SHARD_TYPES = OrderedDict([
+    ('static', (None, 1)),
+    ('user', (OSFUser, 1)),
+    ('node', (AbstractNode, 1)),
+    ('preprint', (PreprintService, 2)),
+])
+
 
 class Sitemap(object):
-    def __init__(self):
-        self.sitemap_count = 0
+    def __init__(self, processes=1, incremental=False, sitemap_dir=None):
+        self.processes = processes
+        self.incremental = incremental
         self.errors = 0
-        self.new_doc()
-        if not settings.SITEMAP_TO_S3:
+        self._s3 = None
+        if sitemap_dir:
+            self.sitemap_dir = sitemap_dir
+        elif not settings.SITEMAP_TO_S3:
             self.sitemap_dir = os.path.join(settings.STATIC_FOLDER, 'sitemaps')
             if not os.path.exists(self.sitemap_dir):
                 print('Creating sitemap directory at `{}`'.format(self.sitemap_dir))
@@ -40,172 +73,140 @@ class Sitemap(object):
             assert settings.SITEMAP_AWS_BUCKET, 'SITEMAP_AWS_BUCKET must be set for sitemap files to be sent to S3'
             assert settings.AWS_ACCESS_KEY_ID, 'AWS_ACCESS_KEY_ID must be set for sitemap files to be sent to S3'
             assert settings.AWS_SECRET_ACCESS_KEY, 'AWS_SECRET_ACCESS_KEY must be set for sitemap files to be sent to S3'
-            self.s3 = boto3.resource(
+
+    @property
+    def s3(self):
+        # Created lazily so that every worker process gets its own client
+        if self._s3 is None:
+            self._s3 = boto3.resource(
                 's3',
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
                 aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
                 region_name='us-east-1'
             )
+        return self._s3
 
     def cleanup(self):
         if settings.SITEMAP_TO_S3:
             shutil.rmtree(self.sitemap_dir)
 
-    def new_doc(self):
-        """Creates new sitemap document and resets the url_count."""
-        self.doc = xml.dom.minidom.Document()
-        self.urlset = self.doc.createElement('urlset')
-        self.urlset.setAttribute('xmlns', 'http://www.sitemaps.org/schemas/sitemap/0.9')
-        self.doc.appendChild(self.urlset)
-        self.url_count = 0
-
-    def add_tag(self, name, text):
-        """Adds a tag to the current url"""
-        tag = self.doc.createElement(name)
-        self.url.appendChild(tag)
-        tag_text = self.doc.createTextNode(text)
-        tag.appendChild(tag_text)
-
-    def add_url(self, config):
-        """Adds a url to the current urlset"""
-        if self.url_count >= settings.SITEMAP_URL_MAX:
-            self.write_doc()
-            self.new_doc()
-        self.url = self.doc.createElement('url')
-        self.urlset.appendChild(self.url)
-
-        for k, v in config.iteritems():
-            self.add_tag(k, v)
-        self.url_count += 1
-
-    def write_doc(self):
-        """Writes and gzips each sitemap xml file"""
-        file_name = 'sitemap_{}.xml'.format(str(self.sitemap_count))
+    def shard_width(self, shard_type):
+        """Number of primary keys per shard, so that no shard exceeds SITEMAP_URL_MAX urls"""
+        return settings.SITEMAP_URL_MAX // SHARD_TYPES[shard_type][1]
+
+    def shard_name(self, shard_type, index):
+        return 'sitemap_{}_{}.xml'.format(shard_type, index)
+
+    def get_shards(self):
+        """Returns a (shard_type, index) tuple for every shard that may contain urls"""
+        shards = [('static', 0)]
+        for shard_type, (model, _) in SHARD_TYPES.items():
+            if model is None:
+                continue
+            max_id = model.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+            shards.extend((shard_type, index) for index in range(max_id // self.shard_width(shard_type) + 1))
+        return shards
+
+    def shard_changed(self, shard_type, index, since):
+        """Whether any object in the shard was modified after ``since``"""
+        model = SHARD_TYPES[shard_type][0]
+        if model is None:
+            return True
+        start = index * self.shard_width(shard_type)
+        changed = Q(modified__gt=since)
+        if model is PreprintService:
+            # Preprint visibility is determined by its node
+            changed |= Q(node__modified__gt=since)
+        return model.objects.filter(changed, id__gte=start, id__lt=start + self.shard_width(shard_type)).exists()
+
+    def url_element(self, config):
+        tags = ''.join(
+            u'    <{0}>{1}</{0}>\n'.format(name, escape(value)) for name, value in config.items()
+        )
+        return u'  <url>\n{}  </url>\n'.format(tags).encode('utf-8')
+
+    def write_shard(self, shard_type, index):
+        """Streams the urls of a shard into an xml file and its gzipped copy.
+        Returns the number of urls written; empty shards are not kept.
+        """
+        file_name = self.shard_name(shard_type, index)
         file_path = os.path.join(self.sitemap_dir, file_name)
         zip_file_name = file_name + '.gz'
         zip_file_path = file_path + '.gz'
-        print('Writing and gzipping `{}`: url_count = {}'.format(file_path, str(self.url_count)))
-
-        xml_str = self.doc.toprettyxml(indent='  ', encoding='utf-8')
-        with open(file_path, 'wb') as f:
-            f.write(xml_str)
-
-        # Write zipped file
-        with open(file_path, 'rb') as f_in, gzip.open(zip_file_path, 'wb') as f_out:
-            shutil.copyfileobj(f_in, f_out)
+        start = index * self.shard_width(shard_type)
+        stop = start + self.shard_width(shard_type)
+
+        url_count = 0
+        with open(file_path, 'wb') as f, gzip.open(zip_file_path, 'wb') as f_zip:
+            header = '<?xml version="1.0" encoding="utf-8"?>\n<urlset xmlns="{}">\n'.format(SITEMAP_NAMESPACE)
+            f.write(header)
+            f_zip.write(header)
+            for config in getattr(self, '{}_urls'.format(shard_type))(start, stop):
+                element = self.url_element(config)
+                f.write(element)
+                f_zip.write(element)
+                url_count += 1
+            f.write('</urlset>\n')
+            f_zip.write('</urlset>\n')
+
+        if not url_count:
+            os.remove(file_path)
+            os.remove(zip_file_path)
+            return url_count
+
+        print('Wrote and gzipped `{}`: url_count = {}'.format(file_path, url_count))
         if settings.SITEMAP_TO_S3:
             self.ship_to_s3(file_name, file_path)
             self.ship_to_s3(zip_file_name, zip_file_path)
-        self.sitemap_count += 1
-
-    def ship_to_s3(self, name, path):
-        data = open(path, 'rb')
-        try:
-            self.s3.Bucket(settings.SITEMAP_AWS_BUCKET).put_object(Key='sitemaps/{}'.format(name), Body=data)
-        except Exception as e:
-            logger.info('Error sending data to s3 via boto3')
-            logger.exception(e)
-            sentry.log_message('ERROR: Sitemaps could not be uploaded to s3, see `generate_sitemap` logs')
-        data.close()
-
-    def write_sitemap_index(self):
-        """Writes the index file for all of the sitemap files"""
-        doc = xml.dom.minidom.Document()
-        sitemap_index = self.doc.createElement('sitemapindex')
-        sitemap_index.setAttribute('xmlns', 'http://www.sitemaps.org/schemas/sitemap/0.9')
-        doc.appendChild(sitemap_index)
-
-        for f in range(self.sitemap_count):
-            sitemap = doc.createElement('sitemap')
-            sitemap_index.appendChild(sitemap)
-
-            loc = doc.createElement('loc')
-            sitemap.appendChild(loc)
-            loc_text = self.doc.createTextNode(urlparse.urljoin(settings.DOMAIN, 'sitemaps/sitemap_{}.xml'.format(str(f))))
-            loc.appendChild(loc_text)
-
-            datemod = doc.createElement('lastmod')
-            sitemap.appendChild(datemod)
-            datemod_text = self.doc.createTextNode(datetime.datetime.now().strftime('%Y-%m-%d'))
-            datemod.appendChild(datemod_text)
-
-        print('Writing `sitemap_index.xml`')
-        file_name = 'sitemap_index.xml'
-        file_path = os.path.join(self.sitemap_dir, file_name)
-        xml_str = doc.toprettyxml(indent='  ', encoding='utf-8')
-        with open(file_path, 'wb') as f:
-            f.write(xml_str)
-        if settings.SITEMAP_TO_S3:
-            self.ship_to_s3(file_name, file_path)
-
-    def log_errors(self, obj, obj_id, error):
-        if not self.errors:
-            script_utils.add_file_logger(logger, __file__)
-        self.errors += 1
-        logger.info('Error on {}, {}:'.format(obj, obj_id))
-        logger.exception(error)
+        return url_count
 
-        if self.errors <= 10:
-            sentry.log_message('Sitemap Error: {}'.format(error))
-
-        if self.errors == 1000:
-            sentry.log_message('ERROR: generate_sitemap stopped execution after reaching 1000 errors. See logs for details.')
-            raise Exception('Too many errors generating sitemap.')
-
-    def generate(self):
-        print('Generating Sitemap')
-
-        # Progress bar
-        progress = script_utils.Progress(precision=0)
-
-        # Static urls
-        progress.start(len(settings.SITEMAP_STATIC_URLS), 'STAT: ')
+    def static_urls(self, start, stop):
         for config in settings.SITEMAP_STATIC_URLS:
+            config = config.copy()
             config['loc'] = urlparse.urljoin(settings.DOMAIN, config['loc'])
-            self.add_url(config)
-            progress.increment()
-        progress.stop()
-
-        # User urls
-        objs = OSFUser.objects.filter(is_active=True).exclude(date_confirmed__isnull=True).values_list('guids___id', flat=True)
-        progress.start(objs.count(), 'USER: ')
-        for obj in objs:
+            yield config
+
+    def user_urls(self, start, stop):
+        objs = (OSFUser.objects
+            .filter(id__gte=start, id__lt=stop, is_active=True)
+            .exclude(date_confirmed__isnull=True)
+            .order_by('id')
+            .values_list('guids___id', flat=True))
+        for obj in objs.iterator():
             try:
-                config = settings.SITEMAP_USER_CONFIG
+                config = settings.SITEMAP_USER_CONFIG.copy()
                 config['loc'] = urlparse.urljoin(settings.DOMAIN, '/{}/'.format(obj))
-                self.add_url(config)
+                yield config
             except Exception as e:
                 self.log_errors('USER', obj, e)
-            progress.increment()
-        progress.stop()
 
+    def node_urls(self, start, stop):
         # AbstractNode urls (Nodes and Registrations, no Collections)
         objs = (AbstractNode.objects
-            .filter(is_public=True, is_deleted=False, retraction_id__isnull=True)
+            .filter(id__gte=start, id__lt=stop, is_public=True, is_deleted=False, retraction_id__isnull=True)
             .exclude(type__in=['osf.collection', 'osf.quickfilesnode'])
+            .order_by('id')
             .values('guids___id', 'modified'))
-        progress.start(objs.count(), 'NODE: ')
-        for obj in objs:
+        for obj in objs.iterator():
             try:
-                config = settings.SITEMAP_NODE_CONFIG
+                config = settings.SITEMAP_NODE_CONFIG.copy()
                 config['loc'] = urlparse.urljoin(settings.DOMAIN, '/{}/'.format(obj['guids___id']))
                 config['lastmod'] = obj['modified'].strftime('%Y-%m-%d')
-                self.add_url(config)
+                yield config
             except Exception as e:
                 self.log_errors('NODE', obj['guids___id'], e)
-            progress.increment()
-        progress.stop()
 
-        # Preprint urls
+    def preprint_urls(self, start, stop):
         objs = (PreprintService.objects
+                    .filter(id__gte=start, id__lt=stop)
                     .filter(node__isnull=False, node__is_deleted=False, node__is_public=True, is_published=True)
-                    .select_related('node', 'provider', 'node__preprint_file'))
-        progress.start(objs.count() * 2, 'PREP: ')
+                    .select_related('node', 'provider', 'node__preprint_file')
+                    .order_by('id'))
         osf = PreprintProvider.objects.get(_id='osf')
-        for obj in objs:
+        for obj in objs.iterator():
             try:
                 preprint_date = obj.modified.strftime('%Y-%m-%d')
-                config = settings.SITEMAP_PREPRINT_CONFIG
+                config = settings.SITEMAP_PREPRINT_CONFIG.copy()
                 preprint_url = obj.url
                 provider = obj.provider
                 domain = provider.domain if (provider.domain_redirect_enabled and provider.domain) else settings.DOMAIN
@@ -213,11 +214,11 @@ class Sitemap(object):
                     preprint_url = '/preprints/{}/'.format(obj._id)
                 config['loc'] = urlparse.urljoin(domain, preprint_url)
                 config['lastmod'] = preprint_date
-                self.add_url(config)
+                yield config
 
                 # Preprint file urls
                 try:
-                    file_config = settings.SITEMAP_PREPRINT_FILE_CONFIG
+                    file_config = settings.SITEMAP_PREPRINT_FILE_CONFIG.copy()
                     file_config['loc'] = urlparse.urljoin(
                         obj.provider.domain or settings.DOMAIN,
                         os.path.join(
@@ -227,39 +228,160 @@ class Sitemap(object):
                         )
                     )
                     file_config['lastmod'] = preprint_date
-                    self.add_url(file_config)
+                    yield file_config
                 except Exception as e:
                     self.log_errors(obj.primary_file, obj.primary_file._id, e)
             except Exception as e:
                 self.log_errors(obj, obj._id, e)
-            progress.increment(2)
-        progress.stop()
 
-        # Final write
-        self.write_doc()
-        # Create index file
-        self.write_sitemap_index()
+    def ship_to_s3(self, name, path):
+        data = open(path, 'rb')
+        try:
+            self.s3.Bucket(settings.SITEMAP_AWS_BUCKET).put_object(Key='sitemaps/{}'.format(name), Body=data)
+        except Exception as e:
+            logger.info('Error sending data to s3 via boto3')
+            logger.exception(e)
+            sentry.log_message('ERROR: Sitemaps could not be uploaded to s3, see `generate_sitemap` logs')
+        data.close()
+
+    def read_manifest(self):
+        """Returns the shards written by previous runs, or {} if there is no usable manifest"""
+        try:
+            if settings.SITEMAP_TO_S3:
+                body = self.s3.Object(settings.SITEMAP_AWS_BUCKET, 'sitemaps/{}'.format(MANIFEST_FILE_NAME)).get()['Body'].read()
+            else:
+                with open(os.path.join(self.sitemap_dir, MANIFEST_FILE_NAME)) as f:
+                    body = f.read()
+            manifest = json.loads(body)
+        except Exception:
+            logger.info('No sitemap manifest found, generating all shards')
+            return {}
+        if manifest.get('url_max') != settings.SITEMAP_URL_MAX:
+            # Shard boundaries have changed
+            return {}
+        return manifest['shards']
+
+    def write_manifest(self, shards):
+        file_path = os.path.join(self.sitemap_dir, MANIFEST_FILE_NAME)
+        with open(file_path, 'wb') as f:
+            json.dump({'url_max': settings.SITEMAP_URL_MAX, 'shards': shards}, f, indent=2, sort_keys=True)
+        if settings.SITEMAP_TO_S3:
+            self.ship_to_s3(MANIFEST_FILE_NAME, file_path)
+
+    def write_sitemap_index(self, shards):
+        """Writes the index file for the given sitemap files"""
+        file_name = 'sitemap_index.xml'
+        file_path = os.path.join(self.sitemap_dir, file_name)
+        print('Writing `{}`'.format(file_name))
+        with open(file_path, 'wb') as f:
+            f.write('<?xml version="1.0" encoding="utf-8"?>\n<sitemapindex xmlns="{}">\n'.format(SITEMAP_NAMESPACE))
+            for name, shard in shards.items():
+                f.write(
+                    '  <sitemap>\n    <loc>{}</loc>\n    <lastmod>{}</lastmod>\n  </sitemap>\n'.format(
+                        escape(urlparse.urljoin(settings.DOMAIN, 'sitemaps/{}'.format(name))),
+                        shard['generated'][:10],
+                    )
+                )
+            f.write('</sitemapindex>\n')
+        if settings.SITEMAP_TO_S3:
+            self.ship_to_s3(file_name, file_path)
+
+    def log_errors(self, obj, obj_id, error):
+        if not self.errors:
+            script_utils.add_file_logger(logger, __file__)
+        self.errors += 1
+        logger.info('Error on {}, {}:'.format(obj, obj_id))
+        logger.exception(error)
+
+        if self.errors <= 10:
+            sentry.log_message('Sitemap Error: {}'.format(error))
+
+        if self.errors == 1000:
+            sentry.log_message('ERROR: generate_sitemap stopped execution after reaching 1000 errors. See logs for details.')
+            raise Exception('Too many errors generating sitemap.')
+
+    def write_shard_counting_errors(self, shard):
+        errors = self.errors
+        url_count = self.write_shard(*shard)
+        return url_count, self.errors - errors
+
+    def generate(self):
+        print('Generating Sitemap')
+        # Taken before reading any objects so that concurrent changes are picked up by the next run
+        generated = timezone.now().isoformat()
+        previous = self.read_manifest() if self.incremental else {}
+
+        all_shards = self.get_shards()
+        shards = {}
+        to_write = []
+        for shard_type, index in all_shards:
+            name = self.shard_name(shard_type, index)
+            if name in previous and not self.shard_changed(shard_type, index, previous[name]['generated']):
+                shards[name] = previous[name]
+            else:
+                to_write.append((shard_type, index))
+        print('Writing {} of {} shards'.format(len(to_write), len(all_shards)))
+
+        if self.processes > 1 and len(to_write) > 1:
+            # Forked workers must not share the parent's database connections
+            connections.close_all()
+            pool = multiprocessing.Pool(self.processes, initializer=_init_worker, initargs=(self.sitemap_dir, ))
+            try:
+                results = pool.map(_write_shard, to_write, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+            self.errors += sum(errors for _, errors in results)
+        else:
+            results = [self.write_shard_counting_errors(shard) for shard in to_write]
+        for (shard_type, index), (url_count, _) in zip(to_write, results):
+            shards[self.shard_name(shard_type, index)] = {'generated': generated, 'url_count': url_count}
+
+        # Empty shards are remembered in the manifest but not listed in the index
+        self.write_manifest(shards)
+        indexed = OrderedDict(
+            (self.shard_name(shard_type, index), shards[self.shard_name(shard_type, index)])
+            for shard_type, index in all_shards
+            if shards[self.shard_name(shard_type, index)]['url_count']
+        )
+        self.write_sitemap_index(indexed)
 
         # TODO: once the sitemap is validated add a ping to google with sitemap index file location
-        # TODO: server side cursor query wrapper might be useful as the index gets larger.
         # Sitemap indexable limit check
-        if self.sitemap_count > settings.SITEMAP_INDEX_MAX * .90:  # 10% of urls remaining
+        if len(indexed) > settings.SITEMAP_INDEX_MAX * .90:  # 10% of urls remaining
             sentry.log_message('WARNING: Max sitemaps nearly reached.')
-        print('Total url_count = {}'.format((self.sitemap_count - 1) * settings.SITEMAP_URL_MAX + self.url_count))
-        print('Total sitemap_count = {}'.format(str(self.sitemap_count)))
+        print('Total url_count = {}'.format(sum(shard['url_count'] for shard in indexed.values())))
+        print('Total sitemap_count = {}'.format(len(indexed)))
         if self.errors:
             sentry.log_message('WARNING: Generate sitemap encountered errors. See logs for details.')
             print('Total errors = {}'.format(str(self.errors)))
         else:
             print('No errors')
 
+
+_worker_sitemap = None
+
+
+def _init_worker(sitemap_dir):
+    global _worker_sitemap
+    _worker_sitemap = Sitemap(sitemap_dir=sitemap_dir)
+
+
+def _write_shard(shard):
+    return _worker_sitemap.write_shard_counting_errors(shard)
+
+
 @celery_app.task(name='scripts.generate_sitemap')
-def main():
+def main(processes=1, incremental=False):
     init_app(routes=False)  # Sets the storage backends on all models
-    sitemap = Sitemap()
+    sitemap = Sitemap(processes=processes, incremental=incremental)
     sitemap.generate()
     sitemap.cleanup()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a sitemap for osf.io')
+    parser.add_argument('--processes', type=int, default=1, help='Number of processes writing shards')
+    parser.add_argument('--incremental', action='store_true', help='Only rewrite shards with objects modified since the last run')
+    args = parser.parse_args()
     init_app(set_backends=True, routes=False)
-    main()
+    main(processes=args.processes, incremental=args.incremental)
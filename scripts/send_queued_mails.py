@@ -31,20 +31,24 @@ def main(dry_run=True):
 
     logger.info('Emails being sent at {0}'.format(timezone.now().isoformat()))
 
-    for mail in emails_to_be_sent:
-        if not dry_run:
-            with transaction.atomic():
-                try:
-                    sent_ = mail.send_mail()
-                    message = 'Email of type {0} sent to {1}'.format(mail.email_type, mail.to_addr) if sent_ else \
+    if dry_run:
+        for mail in emails_to_be_sent:
+            logger.info('Email of type {} will be sent to {}'.format(mail.email_type, mail.to_addr))
+        return
+
+    emails_to_be_sent = list(emails_to_be_sent)
+    for start in range(0, len(emails_to_be_sent), settings.MAIL_BATCH_SIZE):
+        batch = emails_to_be_sent[start:start + settings.MAIL_BATCH_SIZE]
+        with transaction.atomic():
+            try:
+                sent = QueuedMail.send_batch(batch)
+                for mail in batch:
+                    message = 'Email of type {0} sent to {1}'.format(mail.email_type, mail.to_addr) if mail in sent else \
                         'Email of type {0} failed to be sent to {1}'.format(mail.email_type, mail.to_addr)
                     logger.info(message)
-                except Exception as error:
-                    logger.error('Email of type {0} to be sent to {1} caused an ERROR'.format(mail.email_type, mail.to_addr))
-                    logger.exception(error)
-                    pass
-        else:
-            logger.info('Email of type {} will be sent to {}'.format(mail.email_type, mail.to_addr))
+            except Exception as error:
+                logger.error('Batch of {0} emails starting with {1} caused an ERROR'.format(len(batch), batch[0].to_addr))
+                logger.exception(error)
 
 
 def find_queued_mails_ready_to_be_sent():
@@ -29,13 +29,15 @@ class TestSendQueuedMails(OsfTestCase):
             fullname=user.fullname if user else self.user.fullname,
         )
 
-    @mock.patch('osf.models.queued_mail.send_mail')
+    @mock.patch('osf.models.queued_mail.send_mails')
     def test_queue_addon_mail(self, mock_send):
-        self.queue_mail()
+        mail = self.queue_mail()
         main(dry_run=False)
         assert_true(mock_send.called)
+        mail.reload()
+        assert_is_not_none(mail.sent_at)
 
-    @mock.patch('osf.models.queued_mail.send_mail')
+    @mock.patch('osf.models.queued_mail.send_mails')
     def test_no_two_emails_to_same_person(self, mock_send):
         user = UserFactory()
         user.osf_mailing_lists[settings.OSF_HELP_LIST] = True
@@ -44,6 +46,19 @@ class TestSendQueuedMails(OsfTestCase):
         self.queue_mail(user=user)
         main(dry_run=False)
         assert_equal(mock_send.call_count, 1)
+        assert_equal(len(mock_send.call_args[0][0]), 1)
+
+    @mock.patch('osf.models.queued_mail.send_mails')
+    def test_mails_are_sent_in_batches(self, mock_send):
+        users = [UserFactory() for _ in range(3)]
+        for user in users:
+            user.osf_mailing_lists[settings.OSF_HELP_LIST] = True
+            user.save()
+            self.queue_mail(user=user)
+        with mock.patch.object(settings, 'MAIL_BATCH_SIZE', 2):
+            main(dry_run=False)
+        assert_equal([len(call[0][0]) for call in mock_send.call_args_list], [2, 1])
+        assert_equal(QueuedMail.objects.filter(sent_at__isnull=False).count(), 3)
 
     def test_pop_and_verify_mails_for_each_user(self):
         user_with_email_sent = UserFactory()
@@ -169,8 +169,11 @@ def celery_beat(ctx, level='debug', schedule=None):
     ctx.run(bin_prefix(cmd), pty=True)
 
 @task
-def migrate_search(ctx, delete=True, remove=False, index=settings.ELASTIC_INDEX):
-    """Migrate the search-enabled models."""
+def migrate_search(ctx, delete=True, remove=False, index=settings.ELASTIC_INDEX, workers=1, checkpoint=None):
+    """Migrate the search-enabled models.
+
+    Use --workers to migrate in parallel and --checkpoint=<path> to be able to resume an interrupted migration.
+    """
     from website.app import init_app
     init_app(routes=False, set_backends=False)
     from website.search_migration.migrate import migrate
@@ -181,7 +184,7 @@ def migrate_search(ctx, delete=True, remove=False, index=settings.ELASTIC_INDEX)
     for logger in SILENT_LOGGERS:
         logging.getLogger(logger).setLevel(logging.ERROR)
 
-    migrate(delete, remove=remove, index=index)
+    migrate(delete, remove=remove, index=index, workers=int(workers), checkpoint_path=checkpoint)
 
 @task
 def rebuild_search(ctx):
@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+import asyncore
+import smtpd
+import threading
 import unittest
 import smtplib
 
@@ -6,7 +9,8 @@ import mock
 from nose.tools import *  # flake8: noqa (PEP8 asserts)
 import sendgrid
 
-from framework.email.tasks import send_email, _send_with_sendgrid
+from framework.email import tasks
+from framework.email.tasks import send_email, send_emails, _send_with_sendgrid, _send_with_smtp, SMTPConnectionPool
 from website import settings
 from tests.base import fake
 from osf_tests.factories import fake_email
@@ -77,5 +81,99 @@ class TestEmail(unittest.TestCase):
         assert_false(ret)
 
 
+class LocalSMTPServer(smtpd.SMTPServer):
+    """An SMTP server on a free local port that keeps the messages it receives."""
+
+    def __init__(self):
+        smtpd.SMTPServer.__init__(self, ('127.0.0.1', 0), None)
+        self.address = '127.0.0.1:{}'.format(self.socket.getsockname()[1])
+        self.messages = []
+        self.connections = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _serve(self):
+        while self._running:
+            asyncore.loop(timeout=0.01, count=1)
+
+    def handle_accept(self):
+        self.connections += 1
+        smtpd.SMTPServer.handle_accept(self)
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        self.messages.append((mailfrom, rcpttos, data))
+
+    def stop(self):
+        self._running = False
+        self._thread.join()
+        self.close()
+
+
+class TestSMTPConnectionPool(unittest.TestCase):
+
+    NUM_MESSAGES = 200
+
+    def setUp(self):
+        self.server = LocalSMTPServer()
+        self.patches = [
+            mock.patch.object(settings, 'MAIL_SERVER', self.server.address),
+            mock.patch.object(settings, 'USE_EMAIL', True),
+            mock.patch.object(settings, 'SENDGRID_API_KEY', None),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.server.stop()
+
+    def send(self, pool, count):
+        with mock.patch.object(tasks, 'smtp_pool', pool):
+            for i in range(count):
+                assert_true(_send_with_smtp('foo@bar.com', 'baz@quux.com', subject='Message {}'.format(i),
+                                            message='<h1>Greetings!</h1>', ttls=False, login=False))
+        pool.clear()
+
+    def test_pooled_connections_are_reused(self):
+        self.send(SMTPConnectionPool(max_size=0, max_age=300), self.NUM_MESSAGES)
+        assert_equal(self.server.connections, self.NUM_MESSAGES)
+
+        self.send(SMTPConnectionPool(max_size=4, max_age=300), self.NUM_MESSAGES)
+        assert_equal(self.server.connections, self.NUM_MESSAGES + 1)
+        assert_equal(len(self.server.messages), 2 * self.NUM_MESSAGES)
+
+    def test_expired_connections_are_replaced(self):
+        pool = SMTPConnectionPool(max_size=4, max_age=0)
+        self.send(pool, 3)
+        assert_equal(self.server.connections, 3)
+
+    def test_reconnects_when_connection_dropped(self):
+        pool = SMTPConnectionPool(max_size=4, max_age=300)
+        with mock.patch.object(tasks, 'smtp_pool', pool):
+            _send_with_smtp('foo@bar.com', 'baz@quux.com', subject='First', message='Hi', ttls=False, login=False)
+            for connections in pool._idle.values():
+                for _, conn in connections:
+                    conn.close()
+            assert_true(_send_with_smtp('foo@bar.com', 'baz@quux.com', subject='Second', message='Hi', ttls=False, login=False))
+        pool.clear()
+        assert_equal(self.server.connections, 2)
+        assert_equal(len(self.server.messages), 2)
+
+    def test_send_emails(self):
+        messages = [
+            dict(from_addr='foo@bar.com', to_addr='user{}@quux.com'.format(i), subject='Digest',
+                 message='<h1>Greetings!</h1>', ttls=False, login=False, categories=['digest'])
+            for i in range(10)
+        ]
+        with mock.patch.object(tasks, 'smtp_pool', SMTPConnectionPool(max_size=4, max_age=300)) as pool:
+            assert_equal(send_emails(messages), 10)
+            pool.clear()
+        assert_equal(self.server.connections, 1)
+        assert_equal(sorted(rcpttos[0] for _, rcpttos, _ in self.server.messages), sorted(m['to_addr'] for m in messages))
+
+
 if __name__ == '__main__':
     unittest.main()
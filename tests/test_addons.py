@@ -160,6 +160,42 @@ class TestAddonAuth(OsfTestCase):
         assert_equal(res.status_code, 403)
 
 
+class TestAddonAuthOsfStorage(TestAddonAuth):
+
+    def configure_addon(self):
+        self.node_addon = self.node.get_addon('osfstorage')
+        self.file = create_test_file(target=self.node, user=self.user)
+
+    def get_payload_data(self, res):
+        return jwt.decode(jwe.decrypt(res.json['payload'].encode('utf-8'), self.JWE_KEY), settings.WATERBUTLER_JWT_SECRET, algorithm=settings.WATERBUTLER_JWT_ALGORITHM)['data']
+
+    def test_auth_download_uses_version_region(self):
+        region = factories.RegionFactory(waterbutler_credentials={'storage': {'token': 'region'}})
+        version = self.file.versions.first()
+        version.region = region
+        version.save()
+
+        res = self.app.get(self.build_url(path='/{}'.format(self.file._id), version=version.identifier), auth=self.user.auth)
+        data = self.get_payload_data(res)
+        assert_equal(data['credentials'], {'storage': {'token': 'region'}})
+        assert_equal(data['settings']['nid'], self.node._id)
+        assert_equal(data['settings']['rootId'], self.node_addon.root_node._id)
+
+        # Latest version
+        res = self.app.get(self.build_url(path='/{}'.format(self.file._id)), auth=self.user.auth)
+        assert_equal(self.get_payload_data(res)['credentials'], {'storage': {'token': 'region'}})
+
+    def test_auth_folder_uses_node_region(self):
+        res = self.app.get(self.build_url(path='/{}/'.format(self.node_addon.root_node._id)), auth=self.user.auth)
+        data = self.get_payload_data(res)
+        assert_equal(data['credentials'], self.node_addon.serialize_waterbutler_credentials())
+        assert_equal(data['settings'], self.node_addon.serialize_waterbutler_settings())
+
+    def test_auth_missing_version(self):
+        res = self.app.get(self.build_url(path='/{}'.format(self.file._id), version='42'), auth=self.user.auth, expect_errors=True)
+        assert_equal(res.status_code, 400)
+
+
 class TestAddonLogs(OsfTestCase):
 
     def setUp(self):
@@ -418,6 +454,13 @@ class TestCheckAuth(OsfTestCase):
             views.check_access(self.node, Auth(), 'download', None)
         assert_equal(exc_info.exception.code, 401)
 
+    @mock.patch('addons.base.views.RegistrationSchema.get_prereg_schema_id')
+    def test_denial_skips_prereg_rule(self, mock_get_prereg_schema_id):
+        for auth in (Auth(), Auth(user=AuthUserFactory())):
+            with assert_raises(HTTPError):
+                views.check_access(self.node, auth, 'download', None)
+        assert_false(mock_get_prereg_schema_id.called)
+
     def test_has_permission_on_parent_node_upload_pass_if_registration(self):
         component_admin = AuthUserFactory()
         ProjectFactory(creator=component_admin, parent=self.node)
@@ -483,6 +526,15 @@ class TestCheckPreregAuth(OsfTestCase):
             Auth(user=self.prereg_challenge_admin_user), 'download', None)
         assert_true(res)
 
+    def test_prereg_schema_id_is_memoized(self):
+        views.check_access(self.draft_registration.branched_from,
+            Auth(user=self.prereg_challenge_admin_user), 'download', None)
+        with mock.patch('osf.models.metaschema.RegistrationSchema.objects') as mock_objects:
+            res = views.check_access(self.draft_registration.branched_from,
+                Auth(user=self.prereg_challenge_admin_user), 'download', None)
+        assert_true(res)
+        assert_false(mock_objects.filter.called)
+
     def test_has_permission_download_on_component_prereg_challenge_admin(self):
         try:
             res = views.check_access(self.draft_registration.branched_from._nodes.first(),
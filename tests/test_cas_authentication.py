@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import furl
+import json
 import responses
 import mock
 from nose.tools import *  # flake8: noqa (PEP8 asserts)
@@ -119,6 +120,7 @@ class TestCASClient(OsfTestCase):
         OsfTestCase.setUp(self)
         self.base_url = 'http://accounts.test.test'
         self.client = cas.CasClient(self.base_url)
+        cas.profile_cache.clear()
 
     @responses.activate
     def test_service_validate(self):
@@ -170,6 +172,63 @@ class TestCASClient(OsfTestCase):
         with assert_raises(cas.CasHTTPError):
             self.client.profile('invalid-access-token')
 
+    def add_profile_response(self, user, status=200):
+        url = furl.furl(self.base_url)
+        url.path.segments.extend(('oauth2', 'profile',))
+        responses.add(
+            responses.Response(
+                responses.GET,
+                url.url,
+                body=json.dumps({'id': user._id, 'scope': ['osf.full_read']}),
+                status=status,
+            )
+        )
+
+    @responses.activate
+    def test_profile_is_cached(self):
+        user = UserFactory()
+        self.add_profile_response(user)
+
+        first = self.client.profile('access-token')
+        first.attributes['accessTokenScope'].add('osf.full_write')
+        second = self.client.profile('access-token')
+
+        assert_equal(len(responses.calls), 1)
+        assert_equal(second.user, user._id)
+        assert_equal(second.attributes['accessTokenScope'], {'osf.full_read'})
+        assert_equal(cas.get_profile_cache_stats()['hit_rate'], 0.5)
+
+        self.client.profile('other-access-token')
+        assert_equal(len(responses.calls), 2)
+
+    @responses.activate
+    def test_profile_cache_disabled(self):
+        user = UserFactory()
+        self.add_profile_response(user)
+        with mock.patch('framework.auth.cas.settings.CAS_PROFILE_CACHE_TIMEOUT', 0):
+            self.client.profile('access-token')
+            self.client.profile('access-token')
+        assert_equal(len(responses.calls), 2)
+
+    @responses.activate
+    def test_revoking_token_drops_cached_profile(self):
+        user = UserFactory()
+        self.add_profile_response(user)
+        responses.add(
+            responses.Response(
+                responses.POST,
+                self.client.get_auth_token_revocation_url(),
+                status=204
+            )
+        )
+        self.client.profile('access-token')
+        self.client.profile('other-access-token')
+
+        self.client.revoke_tokens({'token': 'access-token'})
+        assert_equal(cas.get_profile_cache_stats()['size'], 1)
+        self.client.revoke_application_tokens('fake_id', 'fake_secret')
+        assert_equal(cas.get_profile_cache_stats()['size'], 0)
+
     @responses.activate
     def test_application_token_revocation_succeeds(self):
         url = self.client.get_auth_token_revocation_url()
@@ -2,11 +2,13 @@
 import os
 import json
 
+import mock
 from django.utils import timezone
 from nose.tools import *  # flake8: noqa
 
-from api.citations.utils import render_citation
-from osf_tests.factories import UserFactory, PreprintFactory
+from api.citations import utils as citation_utils
+from api.citations.utils import render_citation, render_citations
+from osf_tests.factories import UserFactory, PreprintFactory, ProjectFactory
 from tests.base import OsfTestCase
 from osf.models import OSFUser
 
@@ -174,3 +176,38 @@ class TestCiteprocpyMLA(OsfTestCase):
                 self.formated_date)
         )
 
+
+
+class TestRenderCitations(OsfTestCase):
+
+    def setUp(self):
+        super(TestRenderCitations, self).setUp()
+        self.user = UserFactory(fullname='John Tordoff')
+        self.preprint = PreprintFactory(creator=self.user)
+        self.projects = [ProjectFactory(creator=self.user, title='Project {}'.format(i)) for i in range(3)]
+
+    def test_matches_single_renders(self):
+        nodes = [self.preprint] + self.projects
+        for style in ('apa', 'modern-language-association', 'chicago-author-date'):
+            expected = [render_citation(node, style) for node in nodes]
+            citation_utils.citation_cache.clear()
+            assert_equal(render_citations(nodes, style), expected)
+
+    def test_style_parsed_once(self):
+        with mock.patch('api.citations.utils.CitationStylesStyle', wraps=citation_utils.CitationStylesStyle) as parse:
+            render_citations(self.projects, 'apa')
+            render_citation(self.preprint, 'apa')
+        assert_equal(parse.call_count, 1)
+
+    def test_cached_until_contributor_changes(self):
+        node = self.projects[0]
+        citation = render_citation(node, 'apa')
+        with mock.patch('api.citations.utils.CiteProcJSON') as source:
+            assert_equal(render_citation(node, 'apa'), citation)
+        assert_false(source.called)
+
+        self.user.fullname = 'Carson Wentz'
+        self.user.family_name = 'Wentz'
+        self.user.given_name = 'Carson'
+        self.user.save()
+        assert_in('Wentz', render_citation(node, 'apa'))
@@ -1774,8 +1774,8 @@ class TestSendDigest(OsfTestCase):
         digest_ids = [d._id, d2._id, d3._id]
         remove_notifications(email_notification_ids=digest_ids)
 
-    @mock.patch('website.mails.send_mail')
-    def test_send_users_email_called_with_correct_args(self, mock_send_mail):
+    @mock.patch('website.mails.send_mails')
+    def test_send_users_email_called_with_correct_args(self, mock_send_mails):
         send_type = 'email_transactional'
         d = factories.NotificationDigestFactory(
             send_type=send_type,
@@ -1787,13 +1787,14 @@ class TestSendDigest(OsfTestCase):
         d.save()
         user_groups = list(get_users_emails(send_type))
         send_users_email(send_type)
-        assert_true(mock_send_mail.called)
-        assert_equals(mock_send_mail.call_count, len(user_groups))
+        assert_true(mock_send_mails.called)
+        messages = mock_send_mails.call_args[0][0]
+        assert_equals(len(messages), len(user_groups))
 
         last_user_index = len(user_groups) - 1
         user = OSFUser.load(user_groups[last_user_index]['user_id'])
 
-        args, kwargs = mock_send_mail.call_args
+        kwargs = messages[-1]
 
         assert_equal(kwargs['to_addr'], user.username)
         assert_equal(kwargs['mimetype'], 'html')
@@ -1803,7 +1804,7 @@ class TestSendDigest(OsfTestCase):
         message = group_by_node(user_groups[last_user_index]['info'])
         assert_equal(kwargs['message'], message)
 
-    @mock.patch('website.mails.send_mail')
+    @mock.patch('website.mails.send_mails')
     def test_send_users_email_ignores_disabled_users(self, mock_send_mail):
         send_type = 'email_transactional'
         d = factories.NotificationDigestFactory(
@@ -1825,6 +1826,24 @@ class TestSendDigest(OsfTestCase):
         send_users_email(send_type)
         assert_false(mock_send_mail.called)
 
+    @mock.patch('website.mails.send_mails')
+    def test_send_users_email_sends_in_batches(self, mock_send_mails):
+        send_type = 'email_transactional'
+        digests = [
+            factories.NotificationDigestFactory(
+                send_type=send_type,
+                event='comment_replies',
+                timestamp=timezone.now(),
+                message='Hello',
+                node_lineage=[factories.ProjectFactory()._id]
+            )
+            for _ in range(3)
+        ]
+        with mock.patch.object(settings, 'MAIL_BATCH_SIZE', 2):
+            send_users_email(send_type)
+        assert_equal([len(call[0][0]) for call in mock_send_mails.call_args_list], [2, 1])
+        assert_false(NotificationDigest.objects.filter(_id__in=[d._id for d in digests]).exists())
+
     def test_remove_sent_digest_notifications(self):
         d = factories.NotificationDigestFactory(
             event='comment_replies',
@@ -1837,6 +1856,79 @@ class TestSendDigest(OsfTestCase):
         with assert_raises(NotificationDigest.DoesNotExist):
             NotificationDigest.objects.get(_id=digest_id)
 
+class TestRenderNotificationEmails(OsfTestCase):
+
+    def setUp(self):
+        super(TestRenderNotificationEmails, self).setUp()
+        self.sender = factories.UserFactory()
+        self.project = factories.ProjectFactory(creator=self.sender)
+        self.recipients = [factories.UserFactory(timezone='Europe/Berlin', locale='de') for _ in range(3)]
+        self.recipients[2].timezone = 'America/New_York'
+        self.recipients[2].locale = 'en_US'
+        self.recipients[2].save()
+        self.recipient_ids = [recipient._id for recipient in self.recipients]
+
+    def test_mail_subject_template_is_compiled_once(self):
+        mail = mails.Mail('test', subject='Compiled once for ${name}')
+        with mock.patch('website.mails.mails.Template', wraps=mails.mails.Template) as mock_template:
+            assert_equal(mail.subject(name='Freddie'), mail.subject(name='Freddie'))
+            assert_in('Brian', mail.subject(name='Brian'))
+        assert_equal(mock_template.call_count, 1)
+
+    @mock.patch('website.mails.render_message', return_value='Rendered')
+    def test_store_emails_renders_once_per_timezone_and_locale(self, mock_render):
+        emails.store_emails(self.recipient_ids, 'email_digest', 'comments', self.sender, self.project, timezone.now(), message='Hello')
+
+        assert_equal(mock_render.call_count, 2)
+        digests = NotificationDigest.objects.filter(user__in=self.recipients)
+        assert_equal(digests.count(), 3)
+        assert_true(all(digest.message == 'Rendered' for digest in digests))
+
+    @mock.patch('website.mails.render_message', return_value='Rendered')
+    def test_store_emails_renders_per_recipient_when_template_uses_recipient(self, mock_render):
+        emails.store_emails(self.recipient_ids, 'email_digest', 'reviews', self.sender, self.project, timezone.now(),
+                            template='reviews_update_comment')
+
+        assert_equal(mock_render.call_count, 3)
+        assert_equal(
+            set(call[1]['recipient'] for call in mock_render.call_args_list),
+            set(self.recipients)
+        )
+
+    @mock.patch('website.mails.send_mails')
+    @mock.patch.object(settings, 'NOTIFICATION_DIGEST_DEFER_RENDERING', True)
+    def test_store_emails_deferred_rendering(self, mock_send_mails):
+        timestamp = timezone.now()
+        with mock.patch('website.mails.render_message') as mock_render:
+            emails.store_emails(self.recipient_ids[:1], 'email_digest', 'comments', self.sender, self.project, timestamp,
+                                message='Hello', target_user=None, exclude=['abc12'])
+        assert_false(mock_render.called)
+        digest = NotificationDigest.objects.get(user=self.recipients[0])
+        assert_equal(digest.message, '')
+        assert_equal(digest.template, 'comments.html.mako')
+
+        with mock.patch('website.mails.render_message', return_value='Rendered later') as mock_render:
+            send_users_email('email_digest')
+        kwargs = mock_render.call_args[1]
+        assert_equal(kwargs['user'], self.sender)
+        assert_equal(kwargs['recipient'], self.recipients[0])
+        assert_equal(kwargs['message'], 'Hello')
+        assert_equal(kwargs['exclude'], ['abc12'])
+        assert_equal(kwargs['localized_timestamp'], emails.localize_timestamp(timestamp, self.recipients[0]))
+        messages = mock_send_mails.call_args[0][0]
+        assert_equal(messages[0]['message']['children'][self.project._id]['messages'], ['Rendered later'])
+        assert_false(NotificationDigest.objects.filter(_id=digest._id).exists())
+
+    @mock.patch('website.mails.render_message', return_value='Rendered')
+    @mock.patch.object(settings, 'NOTIFICATION_DIGEST_DEFER_RENDERING', True)
+    def test_store_emails_renders_context_that_cannot_be_stored(self, mock_render):
+        emails.store_emails(self.recipient_ids[:1], 'email_digest', 'comments', self.sender, self.project, timezone.now(),
+                            message=object())
+        digest = NotificationDigest.objects.get(user=self.recipients[0])
+        assert_equal(digest.message, 'Rendered')
+        assert_is_none(digest.context)
+
+
 class TestNotificationsReviews(OsfTestCase):
     def setUp(self):
         super(TestNotificationsReviews, self).setUp()
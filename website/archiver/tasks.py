@@ -205,6 +205,12 @@ def archive_addon(addon_short_name, job_pk):
     src_provider = src.get_addon(addon_short_name)
     folder_name = src_provider.archive_folder_name
     rename = '{}{}'.format(folder_name, rename_suffix)
+    if utils.can_archive_without_copy(addon_short_name, src, dst):
+        logger.info('Archiving addon: {0} on node: {1} without copying files'.format(addon_short_name, src._id))
+        utils.archive_osfstorage_without_copy(src, dst, rename)
+        job.update_target(addon_short_name, ARCHIVER_SUCCESS)
+        project_signals.archive_callback.send(dst)
+        return
     url = waterbutler_api_url_for(src._id, addon_short_name, _internal=True, base_url=src.osfstorage_region.waterbutler_url, **params)
     data = make_waterbutler_payload(dst._id, rename)
     make_copy_request.delay(job_pk=job_pk, url=url, data=data)
@@ -289,13 +295,11 @@ def archive_success(dst_pk, job_pk):
 
     :param str dst_pk: primary key of registration Node
 
-    note:: At first glance this task makes redundant calls to utils.get_file_map (which
-    returns a generator yielding  (<sha256>, <file_metadata>) pairs) on the dst Node. Two
-    notes about utils.get_file_map: 1) this function memoizes previous results to reduce
-    overhead and 2) this function returns a generator that lazily fetches the file metadata
-    of child Nodes (it is possible for a selected file to belong to a child Node) using a
-    non-recursive DFS. Combined this allows for a relatively effient implementation with
-    seemingly redundant calls.
+    note:: Selected files are looked up in an index built by utils.get_file_index from
+    utils.get_file_map (which yields (<sha256>, <file_metadata>, <node _id>) for the dst Node
+    and its child Nodes, as a selected file may belong to a child Node). The index is built
+    once, when the first schema with files is migrated, and shared by every schema, so each
+    selected file costs a dict lookup.
     """
     create_app_context()
     dst = AbstractNode.load(dst_pk)
@@ -304,9 +308,15 @@ def archive_success(dst_pk, job_pk):
     # questions. These files are references to files on the unregistered Node, and
     # consequently we must migrate those file paths after archiver has run. Using
     # sha256 hashes is a convenient way to identify files post-archival.
-    for schema in dst.registered_schema.all():
-        if schema.has_files:
-            utils.migrate_file_metadata(dst, schema)
+    file_index = None
+    try:
+        for schema in dst.registered_schema.all():
+            if schema.has_files:
+                if file_index is None:
+                    file_index = utils.get_file_index(dst)
+                utils.migrate_file_metadata(dst, schema, file_index=file_index)
+    finally:
+        utils.file_map_cache.clear()
     job = ArchiveJob.load(job_pk)
     if not job.sent:
         job.sent = True
@@ -1,4 +1,5 @@
 import functools
+from collections import deque
 
 from framework.auth import Auth
 
@@ -14,6 +15,7 @@ from website import (
     mails,
     settings
 )
+from osf.utils.caching import LRUCache
 from osf.utils.sanitize import unescape_entities
 
 
@@ -146,6 +148,50 @@ def link_archive_provider(node, user):
         addon.on_add()
     node.save()
 
+def can_archive_without_copy(addon_short_name, src, dst):
+    """Whether the files of an addon can be archived with archive_osfstorage_without_copy.
+    Only osfstorage can be archived into osfstorage this way, and only when every version
+    of the source's files is stored in the registration's region.
+
+    :param addon_short_name: AddonConfig.short_name of the addon to be archived
+    :param src: Node being registered
+    :param dst: registration Node
+    """
+    from osf.models import FileVersion
+    if not settings.ARCHIVE_OSFSTORAGE_WITHOUT_COPY:
+        return False
+    if addon_short_name != 'osfstorage' or settings.ARCHIVE_PROVIDER != 'osfstorage':
+        return False
+    region = dst.osfstorage_region
+    if src.osfstorage_region != region:
+        return False
+    # Versions without a region are stored in the node's region
+    return not FileVersion.objects.filter(
+        basefilenode__in=src.files.all(),
+        region__isnull=False,
+    ).exclude(region=region).exists()
+
+def archive_osfstorage_without_copy(src, dst, folder_name):
+    """Archive the osfstorage files of src into a folder of dst without copying any data.
+    The copied files link the same FileVersions as the originals, as forks and the WaterButler
+    copy hook already do. Blobs are addressed by content and new uploads add new versions, so
+    the registration stays intact when the source's files are updated or deleted. Note that
+    OsfStorageFileNode.move_under rewrites the region of a file's latest version in place when
+    the file is moved to a node in another region, and the registration sees that change too.
+
+    :param src: Node being registered
+    :param dst: registration Node
+    :param folder_name: name of the archive folder, as for the WaterButler copy
+    :return: the archive folder
+    """
+    from website.files import utils as files_utils
+    return files_utils.copy_files(
+        src.get_addon('osfstorage').get_root(),
+        dst,
+        parent=dst.get_addon('osfstorage').get_root(),
+        name=folder_name.replace('/', '-'),
+    )
+
 def aggregate_file_tree_metadata(addon_short_name, fileobj_metadata, user):
     """Recursively traverse the addon's file tree and collect metadata in AggregateStatResult
 
@@ -184,25 +230,30 @@ def _do_get_file_map(file_tree):
     """Reduces a tree of folders and files into a list of (<sha256>, <file_metadata>) pairs
     """
     file_map = []
-    stack = [file_tree]
-    while len(stack):
-        tree_node = stack.pop(0)
+    queue = deque([file_tree])
+    while queue:
+        tree_node = queue.popleft()
         if tree_node['kind'] == 'file':
             file_map.append((tree_node['extra']['hashes']['sha256'], tree_node))
         else:
-            stack = stack + tree_node['children']
+            queue.extend(tree_node['children'])
     return file_map
 
+# node _id -> file map of the node's osfstorage, see _do_get_file_map. Cleared when an archive
+# job finishes, so a worker only holds the file trees of the job it is running.
+file_map_cache = LRUCache(settings.ARCHIVER_FILE_MAP_CACHE_MAX_ENTRIES)
+
 def _memoize_get_file_map(func):
-    cache = {}
 
     @functools.wraps(func)
     def wrapper(node):
-        if node._id not in cache:
+        file_map = file_map_cache.get(node._id)
+        if file_map is None:
             osf_storage = node.get_addon('osfstorage')
             file_tree = osf_storage._get_file_tree(user=node.creator)
-            cache[node._id] = _do_get_file_map(file_tree)
-        return func(node, cache[node._id])
+            file_map = _do_get_file_map(file_tree)
+            file_map_cache.set(node._id, file_map)
+        return func(node, file_map)
     return wrapper
 
 @_memoize_get_file_map
@@ -218,8 +269,21 @@ def get_file_map(node, file_map):
         for key, value, node_id in get_file_map(child):
             yield (key, value, node_id)
 
-def find_registration_file(value, node):
+def get_file_index(node):
+    """Index the files of node and its components by (<sha256>, <registered_from _id>, <name>),
+    built with a single pass over get_file_map. The first file found wins, as when scanning the
+    file map in order.
+    """
     from osf.models import AbstractNode
+    registered_from_ids = {}
+    index = {}
+    for sha256, value, node_id in get_file_map(node):
+        if node_id not in registered_from_ids:
+            registered_from_ids[node_id] = AbstractNode.load(node_id).registered_from._id
+        index.setdefault((sha256, registered_from_ids[node_id], value['name']), (value, node_id))
+    return index
+
+def find_registration_file(value, node, file_index=None):
     orig_sha256 = value['sha256']
     orig_name = unescape_entities(
         value['selectedFileName'],
@@ -229,17 +293,16 @@ def find_registration_file(value, node):
         }
     )
     orig_node = value['nodeId']
-    file_map = get_file_map(node)
-    for sha256, value, node_id in file_map:
-        registered_from_id = AbstractNode.load(node_id).registered_from._id
-        if sha256 == orig_sha256 and registered_from_id == orig_node and orig_name == value['name']:
-            return value, node_id
-    return None, None
-
-def find_registration_files(values, node):
+    if file_index is None:
+        file_index = get_file_index(node)
+    return file_index.get((orig_sha256, orig_node, orig_name), (None, None))
+
+def find_registration_files(values, node, file_index=None):
+    if file_index is None:
+        file_index = get_file_index(node)
     ret = []
     for i in range(len(values.get('extra', []))):
-        ret.append(find_registration_file(values['extra'][i], node) + (i,))
+        ret.append(find_registration_file(values['extra'][i], node, file_index=file_index) + (i,))
     return ret
 
 def get_title_for_question(schema, path):
@@ -294,12 +357,14 @@ def deep_get(obj, path):
         item = item[key]
     return item
 
-def migrate_file_metadata(dst, schema):
+def migrate_file_metadata(dst, schema, file_index=None):
     metadata = dst.registered_meta[schema._id]
     missing_files = []
     selected_files = find_selected_files(schema, metadata)
+    if selected_files and file_index is None:
+        file_index = get_file_index(dst)
     for path, selected in selected_files.items():
-        for registration_file, node_id, index in find_registration_files(selected, dst):
+        for registration_file, node_id, index in find_registration_files(selected, dst, file_index=file_index):
             if not registration_file:
                 missing_files.append({
                     'file_name': selected['extra'][index]['selectedFileName'],
@@ -0,0 +1,27 @@
+import logging
+
+from django.apps import apps
+
+from framework.celery_tasks import app as celery_app
+from website.files import utils
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(bind=True)
+def copy_children_async(self, src_id, target_node_id, parent_id):
+    """Copy the files under the folder ``src_id`` into the folder ``parent_id`` of the node
+    ``target_node_id``, see utils.copy_children. Progress is reported in the task's state.
+    """
+    BaseFileNode = apps.get_model('osf.BaseFileNode')
+    AbstractNode = apps.get_model('osf.AbstractNode')
+    src = BaseFileNode.objects.get(id=src_id)
+    parent = BaseFileNode.objects.get(id=parent_id)
+    target_node = AbstractNode.load(target_node_id)
+
+    def progress(copied, total):
+        logger.info('Copied {} / {} files and folders to {}'.format(copied, total, target_node_id))
+        if self.request.id:
+            self.update_state(state='PROGRESS', meta={'copied': copied, 'total': total})
+
+    utils.copy_children(src, target_node, parent, progress=progress)
@@ -1,35 +1,179 @@
+from collections import defaultdict
 
-def copy_files(src, target_node, parent=None, name=None):
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+# Rows per INSERT when copying; keeps statements under the Postgres parameter limit
+COPY_BATCH_SIZE = 1000
+
+
+def copy_files(src, target_node, parent=None, name=None, recursive=True, progress=None):
     """Copy the files from src to the target node
     :param Folder src: The source to copy children from
     :param Node target_node: The node to copy files to
     :param Folder parent: The parent of to attach the clone of src to, if applicable
+    :param bool recursive: Whether to copy the contents of src, see copy_children
+    :param progress: Called with the number of nodes copied so far and the total after each level
     """
     assert not parent or not parent.is_file, 'Parent must be a folder'
+    return _copy_tree(src, target_node, parent, name=name, include_src=True, recursive=recursive, progress=progress)
+
+
+def copy_children(src, target_node, parent, progress=None):
+    """Copy everything under the folder src into the folder parent, see copy_files"""
+    assert not src.is_file and not parent.is_file, 'Can only copy between folders'
+    _copy_tree(src, target_node, parent, include_src=False, progress=progress)
+
+
+def get_subtree(src, include_src=True):
+    """Return the active nodes under src, and src itself if ``include_src``, grouped into
+    levels by their depth below src. Read with a single query.
+    """
+    from osf.models.files import BaseFileNode, TrashedFileNode
+
+    sql = """
+        WITH RECURSIVE subtree_cte(id, depth) AS (
+          SELECT T.id, 0
+          FROM osf_basefilenode AS T
+          WHERE T.id = %(src_id)s
+          UNION ALL
+          SELECT T.id, R.depth + 1
+          FROM subtree_cte AS R
+            JOIN osf_basefilenode AS T ON T.parent_id = R.id
+          WHERE T.type NOT IN %(trashed_types)s
+        )
+        SELECT T.*, subtree_cte.depth
+        FROM osf_basefilenode AS T
+          JOIN subtree_cte ON subtree_cte.id = T.id
+        WHERE subtree_cte.depth >= %(min_depth)s
+        ORDER BY subtree_cte.depth, T.id;
+    """
+    levels = defaultdict(list)
+    for node in BaseFileNode.objects.raw(sql, {
+        'src_id': src.id,
+        'trashed_types': tuple(TrashedFileNode._typedmodels_subtypes),
+        'min_depth': 0 if include_src else 1,
+    }):
+        levels[node.depth].append(node)
+    return [levels[depth] for depth in sorted(levels)]
+
+
+def _copy_tree(src, target_node, parent, name=None, include_src=True, recursive=True, progress=None):
+    """Copy the subtree of src with one INSERT per level and one for all the version links,
+    instead of saving every node. Returns the copy of src if ``include_src``.
+    """
+    from osf.models.files import BaseFileNode
+
+    levels = get_subtree(src, include_src=include_src) if recursive else [[src]]
+    total = sum(len(level) for level in levels)
+    content_type_id = ContentType.objects.get_for_model(target_node).id
+    # id of each source folder -> its copy
+    copies = {src.id: parent} if not include_src else {}
+    copied_files = []
+    copied = 0
+
+    with transaction.atomic():
+        for level in levels:
+            clones = []
+            for node in level:
+                clone = unsaved_copy(node)
+                clone.target_content_type_id = content_type_id
+                clone.target_object_id = target_node.id
+                clone.copied_from_id = node.id
+                new_parent = copies.get(node.parent_id) if node.id != src.id else parent
+                clone.parent = new_parent
+                if node.id == src.id:
+                    clone.name = name or clone.name
+                if hasattr(clone, '_compute_materialized_path'):
+                    clone._materialized_path = _materialized_path(new_parent, clone)
+                clones.append(clone)
+            # Postgres sets the ids of the created rows, so the next level can point at them
+            BaseFileNode.objects.bulk_create(clones, batch_size=COPY_BATCH_SIZE)
+            for node, clone in zip(level, clones):
+                if hasattr(clone, '_remember_saved_state'):
+                    clone._remember_saved_state()
+                if clone.is_file:
+                    copied_files.append((node.id, clone))
+                else:
+                    copies[node.id] = clone
+            copied += len(clones)
+            if progress:
+                progress(copied, total)
+
+        _copy_versions(copied_files, target_node)
+
+    copied_file_nodes = [clone for _, clone in copied_files]
+    if copied_file_nodes and getattr(target_node, 'is_public', False):
+        from website.search import search
+        search.update_files(copied_file_nodes)
+
+    if include_src:
+        return copies.get(src.id) or copied_files[0][1]
+
+
+def _materialized_path(parent, node):
+    prefix = (parent._materialized_path or parent.materialized_path) if parent else ''
+    return prefix + node.name + ('' if node.is_file else '/')
+
+
+def unsaved_copy(instance):
+    """Like BaseModel.clone, an unsaved copy of instance with no relations and a new _id,
+    but built from the loaded instance instead of fetching it again.
+    """
+    from osf.models.base import generate_object_id
+
+    copy = instance.__class__(**{
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if not field.primary_key and not field.is_relation and field.attname != '_id'
+    })
+    if hasattr(copy, '_id'):
+        copy._id = generate_object_id()
+    return copy
+
+
+def _copy_versions(copied_files, target_node):
+    """Link each copied file to the versions of its source. When the latest version of a
+    file is stored in another region than the target's, a copy of that version in the
+    target's region is linked instead, as for a single copy.
+    """
+    from osf.models.files import BaseFileNode, FileVersion
+
+    if not copied_files:
+        return
+    through = BaseFileNode.versions.through
+    versions = defaultdict(list)
+    for basefilenode_id, fileversion_id, created, region_id in through.objects.filter(
+        basefilenode_id__in=[source_id for source_id, _ in copied_files]
+    ).values_list('basefilenode_id', 'fileversion_id', 'fileversion__created', 'fileversion__region_id'):
+        versions[basefilenode_id].append((created, fileversion_id, region_id))
+    if not versions:
+        return
 
-    cloned = src.clone()
-    cloned.parent = parent
-    cloned.target = target_node
-    cloned.name = name or cloned.name
-    cloned.copied_from = src
-
-    cloned.save()
-
-    if src.is_file and src.versions.exists():
-        fileversions = src.versions.select_related('region').order_by('-created')
-        most_recent_fileversion = fileversions.first()
-        if most_recent_fileversion.region and most_recent_fileversion.region != target_node.osfstorage_region:
-            # add all original version except the most recent
-            cloned.versions.add(*fileversions[1:])
-            # create a new most recent version and update the region before adding
-            new_fileversion = most_recent_fileversion.clone()
-            new_fileversion.region = target_node.osfstorage_region
-            new_fileversion.save()
-            cloned.versions.add(new_fileversion)
+    target_region = target_node.osfstorage_region
+    links = []
+    relocated = []
+    for source_id, clone in copied_files:
+        file_versions = sorted(versions.get(source_id, []), reverse=True)
+        if not file_versions:
+            continue
+        _, latest_id, latest_region_id = file_versions[0]
+        if latest_region_id and latest_region_id != target_region.id:
+            links.extend(through(basefilenode_id=clone.id, fileversion_id=version_id) for _, version_id, _ in file_versions[1:])
+            relocated.append((clone, latest_id))
         else:
-            cloned.versions.add(*src.versions.all())
-    if not src.is_file:
-        for child in src.children:
-            copy_files(child, target_node, parent=cloned)
+            links.extend(through(basefilenode_id=clone.id, fileversion_id=version_id) for _, version_id, _ in file_versions)
 
-    return cloned
+    if relocated:
+        originals = FileVersion.objects.in_bulk([version_id for _, version_id in relocated])
+        new_versions = []
+        for clone, version_id in relocated:
+            new_version = unsaved_copy(originals[version_id])
+            new_version.region = target_region
+            new_versions.append(new_version)
+        FileVersion.objects.bulk_create(new_versions, batch_size=COPY_BATCH_SIZE)
+        links.extend(
+            through(basefilenode_id=clone.id, fileversion_id=new_version.id)
+            for (clone, _), new_version in zip(relocated, new_versions)
+        )
+    through.objects.bulk_create(links, batch_size=COPY_BATCH_SIZE)
@@ -19,6 +19,7 @@ Usage: ::
 
 """
 import os
+import re
 import logging
 import waffle
 
@@ -26,6 +27,7 @@ from mako.lookup import TemplateLookup, Template
 
 from framework.email import tasks
 from osf.features import DISABLE_ENGAGEMENT_EMAILS
+from osf.utils.caching import LRUCache
 from website import settings
 
 logger = logging.getLogger(__name__)
@@ -38,6 +40,14 @@ _tpl_lookup = TemplateLookup(
 
 HTML_EXT = '.html.mako'
 
+# Subject string -> compiled mako Template
+subject_template_cache = LRUCache(settings.MAIL_SUBJECT_TEMPLATE_CACHE_MAX_ENTRIES)
+
+# Matches the templates a template inherits, includes or imports
+_TEMPLATE_FILE_RE = re.compile(r'<%(?:inherit|include|namespace)\s[^>]*file="([^"]+)"')
+# (template name, context key) -> whether the template refers to the key
+_template_uses_cache = {}
+
 DISABLED_MAILS = [
     'welcome',
     'welcome_osf4i'
@@ -67,7 +77,16 @@ class Mail(object):
         return render_message(tpl_name, **context)
 
     def subject(self, **context):
-        return Template(self._subject).render(**context)
+        return get_subject_template(self._subject).render(**context)
+
+
+def get_subject_template(subject):
+    """Compile a subject string into a mako Template once per process."""
+    template = subject_template_cache.get(subject)
+    if template is None:
+        template = Template(subject)
+        subject_template_cache.set(subject, template)
+    return template
 
 
 def render_message(tpl_name, **context):
@@ -76,31 +95,30 @@ def render_message(tpl_name, **context):
     return tpl.render(**context)
 
 
-def send_mail(
-        to_addr, mail, mimetype='html', from_addr=None, mailer=None, celery=True,
-        username=None, password=None, callback=None, attachment_name=None,
-        attachment_content=None, **context):
-    """Send an email from the OSF.
-    Example: ::
-
-        from website import mails
-
-        mails.send_email('foo@bar.com', mails.TEST, name="Foo")
-
-    :param str to_addr: The recipient's email address
-    :param Mail mail: The mail object
-    :param str mimetype: Either 'plain' or 'html'
-    :param function callback: celery task to execute after send_mail completes
-    :param **context: Context vars for the message template
-
-    .. note:
-         Uses celery if available
+def template_uses(tpl_name, key):
+    """Whether an email template, or a template it inherits or includes, refers to the
+    context variable ``key``. Checked on the template source, so a key that is only
+    mentioned in text also counts as used.
+    """
+    cache_key = (tpl_name, key)
+    if cache_key not in _template_uses_cache:
+        source = _tpl_lookup.get_template(tpl_name).source
+        _template_uses_cache[cache_key] = key in source or any(
+            template_uses(name, key) for name in _TEMPLATE_FILE_RE.findall(source)
+        )
+    return _template_uses_cache[cache_key]
+
+
+def _build_message(
+        to_addr, mail, mimetype='html', from_addr=None, username=None, password=None,
+        attachment_name=None, attachment_content=None, **context):
+    """Render an email into the keyword arguments of ``tasks.send_email``, or None if the
+    email should not be sent.
     """
     if waffle.switch_is_active(DISABLE_ENGAGEMENT_EMAILS) and mail.engagement:
-        return False
+        return None
 
     from_addr = from_addr or settings.FROM_EMAIL
-    mailer = mailer or tasks.send_email
     subject = mail.subject(**context)
     message = mail.html(**context)
     # Don't use ttls and login in DEBUG_MODE
@@ -108,7 +126,7 @@ def send_mail(
     logger.debug('Sending email...')
     logger.debug(u'To: {to_addr}\nFrom: {from_addr}\nSubject: {subject}\nMessage: {message}'.format(**locals()))
 
-    kwargs = dict(
+    return dict(
         from_addr=from_addr,
         to_addr=to_addr,
         subject=subject,
@@ -123,6 +141,35 @@ def send_mail(
         attachment_content=attachment_content,
     )
 
+
+def send_mail(
+        to_addr, mail, mimetype='html', from_addr=None, mailer=None, celery=True,
+        username=None, password=None, callback=None, attachment_name=None,
+        attachment_content=None, **context):
+    """Send an email from the OSF.
+    Example: ::
+
+        from website import mails
+
+        mails.send_email('foo@bar.com', mails.TEST, name="Foo")
+
+    :param str to_addr: The recipient's email address
+    :param Mail mail: The mail object
+    :param str mimetype: Either 'plain' or 'html'
+    :param function callback: celery task to execute after send_mail completes
+    :param **context: Context vars for the message template
+
+    .. note:
+         Uses celery if available
+    """
+    kwargs = _build_message(
+        to_addr, mail, mimetype=mimetype, from_addr=from_addr, username=username, password=password,
+        attachment_name=attachment_name, attachment_content=attachment_content, **context
+    )
+    if kwargs is None:
+        return False
+    mailer = mailer or tasks.send_email
+
     logger.debug('Preparing to send...')
     if settings.USE_EMAIL:
         if settings.USE_CELERY and celery:
@@ -137,6 +184,40 @@ def send_mail(
             return ret
 
 
+def send_mails(messages, mailer=None, celery=True):
+    """Send many emails from the OSF, in batches of ``settings.MAIL_BATCH_SIZE`` that are each
+    sent with one ``tasks.send_emails`` call. Example: ::
+
+        mails.send_mails([
+            {'to_addr': user.username, 'mail': mails.DIGEST, 'name': user.fullname, 'message': message}
+            for user, message in digests
+        ])
+
+    :param messages: iterable of dicts of the arguments of ``send_mail``
+    :return: list of the results of ``tasks.send_emails``, one per batch
+    """
+    mailer = mailer or tasks.send_emails
+    results = []
+    batch = []
+    for message in messages:
+        kwargs = _build_message(**message)
+        if kwargs is not None:
+            batch.append(kwargs)
+        if len(batch) >= settings.MAIL_BATCH_SIZE:
+            results.append(_send_batch(mailer, batch, celery))
+            batch = []
+    if batch:
+        results.append(_send_batch(mailer, batch, celery))
+    return results
+
+
+def _send_batch(mailer, batch, celery):
+    if settings.USE_EMAIL:
+        if settings.USE_CELERY and celery:
+            return mailer.apply_async(kwargs={'messages': batch})
+        return mailer(messages=batch)
+
+
 def get_english_article(word):
     """
     Decide whether to use 'a' or 'an' for a given English word.
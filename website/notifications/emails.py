@@ -1,12 +1,19 @@
+import datetime
+
 from babel import dates, core, Locale
+from django.apps import apps
+from django.db import models
 
 from osf.models import AbstractNode, OSFUser, NotificationDigest, NotificationSubscription
 
-from website import mails
+from website import mails, settings
 from website.notifications import constants
 from website.notifications import utils
 from website.util import web_url_for
 
+# Marks a model instance in a stored context, see serialize_context
+MODEL_REFERENCE_KEY = '__model__'
+
 
 def notify(event, user, node, timestamp, **context):
     """Retrieve appropriate ***subscription*** and passe user list
@@ -75,7 +82,12 @@ def notify_global_event(event, sender_user, node, timestamp, recipients, templat
 def store_emails(recipient_ids, notification_type, event, user, node, timestamp, abstract_provider=None, template=None, **context):
     """Store notification emails
 
-    Emails are sent via celery beat as digests
+    Emails are sent via celery beat as digests. The message is rendered once for every
+    recipient-specific part of the context, so recipients who share a timezone and locale
+    share a message unless the template refers to the recipient. With
+    ``settings.NOTIFICATION_DIGEST_DEFER_RENDERING``, the context is stored instead and the
+    message rendered when the digest is sent, see render_digest_message.
+
     :param recipient_ids: List of user ids to send mail to.
     :param notification_type: from constants.Notification_types
     :param event: event that triggered notification
@@ -94,26 +106,82 @@ def store_emails(recipient_ids, notification_type, event, user, node, timestamp,
     # user whose action triggered email sending
     context['user'] = user
     node_lineage_ids = get_node_lineage(node) if node else []
-
-    for recipient_id in recipient_ids:
-        if recipient_id == user._id:
-            continue
-        recipient = OSFUser.load(recipient_id)
-        if recipient.is_disabled:
-            continue
-        context['localized_timestamp'] = localize_timestamp(timestamp, recipient)
-        context['recipient'] = recipient
-        message = mails.render_message(template, **context)
-        digest = NotificationDigest(
+    stored_context = serialize_context(context) if settings.NOTIFICATION_DIGEST_DEFER_RENDERING else None
+    uses_recipient = mails.template_uses(template, 'recipient')
+
+    recipients = OSFUser.objects.filter(
+        guids___id__in=[recipient_id for recipient_id in recipient_ids if recipient_id != user._id],
+        date_disabled__isnull=True,
+    )
+    messages = {}
+    digests = []
+    for recipient in recipients:
+        message = ''
+        if stored_context is None:
+            key = recipient.id if uses_recipient else (recipient.timezone, recipient.locale)
+            if key not in messages:
+                messages[key] = mails.render_message(template, **dict(
+                    context,
+                    localized_timestamp=localize_timestamp(timestamp, recipient),
+                    recipient=recipient,
+                ))
+            message = messages[key]
+        digests.append(NotificationDigest(
             timestamp=timestamp,
             send_type=notification_type,
             event=event,
             user=recipient,
             message=message,
             node_lineage=node_lineage_ids,
-            provider=abstract_provider
-        )
-        digest.save()
+            provider=abstract_provider,
+            template=template if stored_context is not None else None,
+            context=stored_context,
+        ))
+    NotificationDigest.objects.bulk_create(digests)
+
+
+def render_digest_message(digest, recipient):
+    """Render the message of a NotificationDigest stored with a template and context."""
+    return mails.render_message(digest.template, **dict(
+        load_context(digest.context),
+        localized_timestamp=localize_timestamp(digest.timestamp, recipient),
+        recipient=recipient,
+    ))
+
+
+def serialize_context(context):
+    """Convert a template context to JSON, storing model instances as references.
+    Returns None if the context holds a value that cannot be stored.
+    """
+    def encode(value):
+        if isinstance(value, models.Model):
+            return {MODEL_REFERENCE_KEY: value._meta.label_lower, 'pk': value.pk}
+        if isinstance(value, dict):
+            return {key: encode(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [encode(item) for item in value]
+        if value is None or isinstance(value, (basestring, bool, int, long, float, datetime.datetime)):
+            return value
+        raise TypeError('Cannot store {!r}'.format(value))
+
+    try:
+        return encode(context)
+    except TypeError:
+        return None
+
+
+def load_context(stored_context):
+    """Reverse serialize_context, loading the model instances it refers to."""
+    def decode(value):
+        if isinstance(value, dict):
+            if MODEL_REFERENCE_KEY in value:
+                return apps.get_model(value[MODEL_REFERENCE_KEY]).objects.get(pk=value['pk'])
+            return {key: decode(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [decode(item) for item in value]
+        return value
+
+    return decode(stored_context)
 
 
 def compile_subscriptions(node, event_type, event=None, level=0):
@@ -10,6 +10,7 @@ from framework.sentry import log_exception
 from osf.models import OSFUser, AbstractNode, AbstractProvider
 from osf.models import NotificationDigest
 from website import mails, settings
+from website.notifications import emails
 from website.notifications.utils import NotificationsDict
 
 
@@ -28,6 +29,7 @@ def _send_global_and_node_emails(send_type):
     """
     Called by `send_users_email`. Send all global and node-related notification emails.
     """
+    batch = DigestBatch()
     grouped_emails = get_users_emails(send_type)
     for group in grouped_emails:
         user = OSFUser.load(group['user_id'])
@@ -36,14 +38,17 @@ def _send_global_and_node_emails(send_type):
             continue
         info = group['info']
         notification_ids = [message['_id'] for message in info]
+        if not user.is_disabled:
+            info = render_deferred_messages(user, info)
         sorted_messages = group_by_node(info)
         if sorted_messages:
-            if not user.is_disabled:
+            message = None
+            if not user.is_disabled and info:
                 # If there's only one node in digest we can show it's preferences link in the template.
                 notification_nodes = sorted_messages['children'].keys()
                 node = AbstractNode.load(notification_nodes[0]) if len(
                     notification_nodes) == 1 else None
-                mails.send_mail(
+                message = dict(
                     to_addr=user.username,
                     mimetype='html',
                     can_change_node_preferences=bool(node),
@@ -52,21 +57,26 @@ def _send_global_and_node_emails(send_type):
                     name=user.fullname,
                     message=sorted_messages,
                 )
-            remove_notifications(email_notification_ids=notification_ids)
+            batch.add(message, notification_ids)
+    batch.flush()
 
 
 def _send_reviews_moderator_emails(send_type):
     """
     Called by `send_users_email`. Send all reviews triggered emails.
     """
+    batch = DigestBatch()
     grouped_emails = get_moderators_emails(send_type)
     for group in grouped_emails:
         user = OSFUser.load(group['user_id'])
         info = group['info']
         notification_ids = [message['_id'] for message in info]
+        message = None
         if not user.is_disabled:
+            info = render_deferred_messages(user, info)
+        if not user.is_disabled and info:
             provider = AbstractProvider.objects.get(id=group['provider_id'])
-            mails.send_mail(
+            message = dict(
                 to_addr=user.username,
                 mimetype='html',
                 mail=mails.DIGEST_REVIEWS_MODERATORS,
@@ -78,7 +88,33 @@ def _send_reviews_moderator_emails(send_type):
                 is_reviews_moderator_notification=True,
                 is_admin=provider.get_group('admin').user_set.filter(id=user.id).exists()
             )
-        remove_notifications(email_notification_ids=notification_ids)
+        batch.add(message, notification_ids)
+    batch.flush()
+
+
+class DigestBatch(object):
+    """Collects digest emails and sends them with mails.send_mails once ``settings.MAIL_BATCH_SIZE``
+    have been added, removing their notifications once they are sent.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.notification_ids = []
+
+    def add(self, message, notification_ids):
+        """Add an email, or only notifications to remove if ``message`` is None."""
+        if message is not None:
+            self.messages.append(message)
+        self.notification_ids.extend(notification_ids)
+        if len(self.messages) >= settings.MAIL_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.messages:
+            mails.send_mails(self.messages)
+        remove_notifications(email_notification_ids=self.notification_ids)
+        self.messages = []
+        self.notification_ids = []
 
 
 def get_moderators_emails(send_type):
@@ -167,6 +203,30 @@ def get_users_emails(send_type):
         return itertools.chain.from_iterable(cursor.fetchall())
 
 
+def render_deferred_messages(user, notifications):
+    """Render the messages of notifications stored with a template and context instead of a
+    message, see emails.store_emails. Notifications that cannot be rendered are left out.
+
+    :param user: the recipient
+    :param notifications: List of stored email notifications
+    :return: the notifications, with their messages rendered
+    """
+    deferred_ids = [notification['_id'] for notification in notifications if not notification['message']]
+    if not deferred_ids:
+        return notifications
+    rendered = {}
+    for digest in NotificationDigest.objects.filter(_id__in=deferred_ids, template__isnull=False):
+        try:
+            rendered[digest._id] = emails.render_digest_message(digest, user)
+        except Exception:
+            log_exception()
+    return [
+        dict(notification, message=rendered[notification['_id']]) if notification['_id'] in rendered else notification
+        for notification in notifications
+        if notification['message'] or notification['_id'] in rendered
+    ]
+
+
 def group_by_node(notifications, limit=15):
     """Take list of notifications and group by node.
 
@@ -8,7 +8,9 @@ import functools
 import logging
 import math
 import re
+import time
 import unicodedata
+from collections import Counter
 from framework import sentry
 
 import six
@@ -16,7 +18,9 @@ import six
 from django.apps import apps
 from django.core.paginator import Paginator
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from django.db.models import Q
+from django.utils import timezone
 from elasticsearch import (ConnectionError, Elasticsearch, NotFoundError,
                            RequestError, TransportError, helpers)
 from framework.celery_tasks import app as celery_app
@@ -318,11 +322,11 @@ def get_doctype_from_node(node):
         return node.category
 
 @celery_app.task(bind=True, max_retries=5, default_retry_delay=60)
-def update_node_async(self, node_id, index=None, bulk=False):
+def update_node_async(self, node_id, index=None, bulk=False, saved_fields=None):
     AbstractNode = apps.get_model('osf.AbstractNode')
     node = AbstractNode.load(node_id)
     try:
-        update_node(node=node, index=index, bulk=bulk, async=True)
+        update_node(node=node, index=index, bulk=bulk, async=True, saved_fields=saved_fields)
     except Exception as exc:
         self.retry(exc=exc)
 
@@ -384,15 +388,28 @@ def serialize_node(node, category):
 
     return elastic_document
 
-@requires_search
-def update_node(node, index=None, bulk=False, async=False):
+def should_update_files(node, saved_fields):
+    """Whether the documents of the node's files need reindexing after ``saved_fields`` changed.
+    ``None`` means the changes are unknown.
+    """
+    return saved_fields is None or bool(node.FILE_SEARCH_UPDATE_FIELDS.intersection(saved_fields))
+
+def get_node_files(node):
     from addons.osfstorage.models import OsfStorageFile
-    index = index or INDEX
-    for file_ in paginated(OsfStorageFile, Q(target_content_type=ContentType.objects.get_for_model(type(node)), target_object_id=node.id)):
-        update_file(file_, index=index)
+    return paginated(OsfStorageFile, Q(target_content_type=ContentType.objects.get_for_model(type(node)), target_object_id=node.id))
 
+def is_node_indexable(node):
     is_qa_node = bool(set(settings.DO_NOT_INDEX_LIST['tags']).intersection(node.tags.all().values_list('name', flat=True))) or any(substring in node.title for substring in settings.DO_NOT_INDEX_LIST['titles'])
-    if node.is_deleted or not node.is_public or node.archiving or (node.is_spammy and settings.SPAM_FLAGGED_REMOVE_FROM_SEARCH) or node.is_quickfiles or is_qa_node:
+    return not (node.is_deleted or not node.is_public or node.archiving or (node.is_spammy and settings.SPAM_FLAGGED_REMOVE_FROM_SEARCH) or node.is_quickfiles or is_qa_node)
+
+@requires_search
+def update_node(node, index=None, bulk=False, async=False, saved_fields=None):
+    index = index or INDEX
+    if should_update_files(node, saved_fields):
+        for file_ in get_node_files(node):
+            update_file(file_, index=index)
+
+    if not is_node_indexable(node):
         delete_doc(node._id, node, index=index)
     else:
         category = get_doctype_from_node(node)
@@ -492,28 +509,7 @@ def update_contributors_async(self, user_id):
     for page_num in p.page_range:
         bulk_update_contributors(p.page(page_num).object_list)
 
-@requires_search
-def update_user(user, index=None):
-
-    index = index or INDEX
-    if not user.is_active:
-        try:
-            client().delete(index=index, doc_type='user', id=user._id, refresh=True, ignore=[404])
-            # update files in their quickfiles node if the user has been marked as spam
-            if 'spam_confirmed' in user.system_tags:
-                quickfiles = QuickFilesNode.objects.get_for_user(user)
-                for quickfile_id in quickfiles.files.values_list('_id', flat=True):
-                    client().delete(
-                        index=index,
-                        doc_type='file',
-                        id=quickfile_id,
-                        refresh=True,
-                        ignore=[404]
-                    )
-        except NotFoundError:
-            pass
-        return
-
+def serialize_user(user):
     names = dict(
         fullname=user.fullname,
         given_name=user.given_name,
@@ -531,7 +527,7 @@ def update_user(user, index=None):
                 pass  # This is fine, will only happen in 2.x if val is already unicode
             normalized_names[key] = unicodedata.normalize('NFKD', val).encode('ascii', 'ignore')
 
-    user_doc = {
+    return {
         'id': user._id,
         'user': user.fullname,
         'normalized_user': normalized_names['fullname'],
@@ -548,28 +544,43 @@ def update_user(user, index=None):
         'boost': 2,  # TODO(fabianvf): Probably should make this a constant or something
     }
 
-    client().index(index=index, doc_type='user', body=user_doc, id=user._id, refresh=True)
-
 @requires_search
-def update_file(file_, index=None, delete=False):
+def update_user(user, index=None):
+
     index = index or INDEX
-    target = file_.target
+    if not user.is_active:
+        try:
+            client().delete(index=index, doc_type='user', id=user._id, refresh=True, ignore=[404])
+            # update files in their quickfiles node if the user has been marked as spam
+            if 'spam_confirmed' in user.system_tags:
+                quickfiles = QuickFilesNode.objects.get_for_user(user)
+                for quickfile_id in quickfiles.files.values_list('_id', flat=True):
+                    client().delete(
+                        index=index,
+                        doc_type='file',
+                        id=quickfile_id,
+                        refresh=True,
+                        ignore=[404]
+                    )
+        except NotFoundError:
+            pass
+        return
 
+    user_doc = serialize_user(user)
+    client().index(index=index, doc_type='user', body=user_doc, id=user._id, refresh=True)
+
+def is_file_indexable(file_):
+    target = file_.target
     # TODO: Can remove 'not file_.name' if we remove all base file nodes with name=None
     file_node_is_qa = bool(
         set(settings.DO_NOT_INDEX_LIST['tags']).intersection(file_.tags.all().values_list('name', flat=True))
     ) or bool(
         set(settings.DO_NOT_INDEX_LIST['tags']).intersection(target.tags.all().values_list('name', flat=True))
     ) or any(substring in target.title for substring in settings.DO_NOT_INDEX_LIST['titles'])
-    if not file_.name or not target.is_public or delete or target.is_deleted or target.archiving or file_node_is_qa:
-        client().delete(
-            index=index,
-            doc_type='file',
-            id=file_._id,
-            refresh=True,
-            ignore=[404]
-        )
-        return
+    return not (not file_.name or not target.is_public or file_.is_deleted or target.is_deleted or target.archiving or file_node_is_qa)
+
+def serialize_file(file_):
+    target = file_.target
 
     # We build URLs manually here so that this function can be
     # run outside of a Flask request context (e.g. in a celery task)
@@ -587,7 +598,7 @@ def update_file(file_, index=None, delete=False):
     file_guid = file_.get_guid(create=False)
     if file_guid:
         guid_url = '/{file_guid}/'.format(file_guid=file_guid._id)
-    file_doc = {
+    return {
         'id': file_._id,
         'deep_url': file_deep_url,
         'guid_url': guid_url,
@@ -602,14 +613,159 @@ def update_file(file_, index=None, delete=False):
         'extra_search_terms': clean_splitters(file_.name),
     }
 
+@requires_search
+def update_file(file_, index=None, delete=False):
+    index = index or INDEX
+
+    if delete or not is_file_indexable(file_):
+        client().delete(
+            index=index,
+            doc_type='file',
+            id=file_._id,
+            refresh=True,
+            ignore=[404]
+        )
+        return
+
     client().index(
         index=index,
         doc_type='file',
-        body=file_doc,
+        body=serialize_file(file_),
         id=file_._id,
         refresh=True
     )
 
+def _index_action(doc_type, doc_id, doc, index=None):
+    return {'_op_type': 'index', '_index': index or INDEX, '_type': doc_type, '_id': doc_id, '_source': doc}
+
+def _delete_action(doc_type, doc_id, index=None):
+    return {'_op_type': 'delete', '_index': index or INDEX, '_type': doc_type, '_id': doc_id}
+
+def get_file_actions(file_, index=None):
+    if not is_file_indexable(file_):
+        return [_delete_action('file', file_._id, index=index)]
+    return [_index_action('file', file_._id, serialize_file(file_), index=index)]
+
+def update_files(files, index=None):
+    """Like update_file for many files, with a single bulk request and refresh"""
+    actions = [action for file_ in files for action in get_file_actions(file_, index=index)]
+    if not actions:
+        return
+    _, errors = helpers.bulk(client(), actions, refresh=True, raise_on_error=False)
+    errors = [error for error in errors if error.values()[0].get('status') != 404]
+    if errors:
+        raise exceptions.BulkUpdateError(errors)
+
+def get_queued_node_actions(node_id, include_files):
+    node = AbstractNode.load(node_id)
+    if node is None:
+        return []
+    actions = []
+    if include_files:
+        for file_ in get_node_files(node):
+            actions.extend(get_file_actions(file_))
+    if not is_node_indexable(node):
+        actions.append(_delete_action(get_delete_doctype(node), node._id))
+    else:
+        category = get_doctype_from_node(node)
+        actions.append(_index_action(category, node._id, serialize_node(node, category)))
+    return actions
+
+def get_queued_user_actions(user_id, include_files):
+    user = OSFUser.load(user_id)
+    if user is None:
+        return [_delete_action('user', user_id)]
+    if not user.is_active:
+        actions = [_delete_action('user', user._id)]
+        if 'spam_confirmed' in user.system_tags:
+            quickfiles = QuickFilesNode.objects.get_for_user(user)
+            actions.extend(_delete_action('file', quickfile_id) for quickfile_id in quickfiles.files.values_list('_id', flat=True))
+        return actions
+    return [_index_action('user', user._id, serialize_user(user))]
+
+def get_queued_file_actions(file_id, include_files):
+    file_ = BaseFileNode.load(file_id)
+    if file_ is None:
+        return [_delete_action('file', file_id)]
+    return get_file_actions(file_)
+
+QUEUED_ACTION_GETTERS = {
+    'node': get_queued_node_actions,
+    'user': get_queued_user_actions,
+    'file': get_queued_file_actions,
+}
+
+@requires_search
+def bulk_index(actions):
+    """Send ``actions`` to elasticsearch without waiting for a refresh; documents become
+    searchable at the next scheduled refresh. Missing documents are ignored when deleting.
+    """
+    _, errors = helpers.bulk(client(), actions, raise_on_error=False)
+    errors = [error for error in errors if error.values()[0].get('status') != 404]
+    if errors:
+        logger.error('Failed to index {} documents: {}'.format(len(errors), errors[:10]))
+    return errors
+
+@celery_app.task(ignore_results=True)
+def drain_index_queue(batch_size=None, max_seconds=None):
+    """Index the documents queued in SearchIndexQueue, ``batch_size`` at a time, until the
+    queue is empty or ``max_seconds`` have passed. Workers may run concurrently.
+    Returns per-type counts and throughput, and the largest time a document waited in the queue.
+    """
+    SearchIndexQueue = apps.get_model('osf.SearchIndexQueue')
+    batch_size = batch_size or settings.SEARCH_INDEX_QUEUE_BATCH_SIZE
+    max_seconds = max_seconds or settings.SEARCH_INDEX_QUEUE_MAX_LAG
+    counts = Counter()
+    seconds = Counter()
+    max_lag = 0
+    start = time.time()
+    while time.time() - start < max_seconds:
+        # Serialize inside a short transaction and send once it is committed, so that the
+        # queue rows are not locked while waiting on elasticsearch
+        with transaction.atomic():
+            entries = SearchIndexQueue.pop(batch_size)
+            if not entries:
+                break
+            max_lag = max(max_lag, (timezone.now() - entries[0][3]).total_seconds())
+            actions = []
+            for doc_type, target_id, include_files, created in entries:
+                serialize_start = time.time()
+                try:
+                    with transaction.atomic():
+                        actions.extend(QUEUED_ACTION_GETTERS[doc_type](target_id, include_files))
+                except Exception:
+                    # Drop the document rather than retrying it forever ahead of the rest of the queue
+                    logger.exception('Failed to serialize queued {} {} for indexing'.format(doc_type, target_id))
+                    continue
+                counts[doc_type] += 1
+                seconds[doc_type] += time.time() - serialize_start
+        if actions:
+            bulk_start = time.time()
+            try:
+                bulk_index(actions)
+            except Exception:
+                # Queue the batch again to be indexed once elasticsearch is back
+                for doc_type, target_id, include_files, created in entries:
+                    SearchIndexQueue.enqueue(doc_type, [target_id], include_files=include_files)
+                raise
+            bulk_seconds = time.time() - bulk_start
+            # Spread the request time over the types in the batch by their share of it
+            batch_counts = Counter(entry[0] for entry in entries)
+            for doc_type, count in batch_counts.items():
+                seconds[doc_type] += bulk_seconds * count / len(entries)
+
+    metrics = {}
+    for doc_type, count in counts.items():
+        metrics[doc_type] = {
+            'count': count,
+            'seconds': seconds[doc_type],
+            'per_second': count / seconds[doc_type] if seconds[doc_type] else None,
+        }
+        logger.info('Indexed {} queued {} documents in {:.2f}s'.format(count, doc_type, seconds[doc_type]))
+    if max_lag > settings.SEARCH_INDEX_QUEUE_MAX_LAG:
+        logger.warning('Search index queue is {:.0f}s behind, more than SEARCH_INDEX_QUEUE_MAX_LAG'.format(max_lag))
+    return {'types': metrics, 'max_lag': max_lag}
+
 @requires_search
 def update_institution(institution, index=None):
     index = index or INDEX
@@ -748,15 +904,16 @@ def create_index(index=None):
 @requires_search
 def delete_doc(elastic_document_id, node, index=None, category=None):
     index = index or INDEX
-    if not category:
-        if node.is_registration:
-            category = 'registration'
-        elif node.is_preprint:
-            category = 'preprint'
-        else:
-            category = node.project_or_component
+    category = category or get_delete_doctype(node)
     client().delete(index=index, doc_type=category, id=elastic_document_id, refresh=True, ignore=[404])
 
+def get_delete_doctype(node):
+    if node.is_registration:
+        return 'registration'
+    elif node.is_preprint:
+        return 'preprint'
+    return node.project_or_component
+
 
 @requires_search
 def search_contributor(query, page=0, size=10, exclude=None, current_user=None):
@@ -24,19 +24,31 @@ def search(query, index=None, doc_type=None, raw=None):
     index = index or settings.ELASTIC_INDEX
     return search_engine.search(query, index=index, doc_type=doc_type, raw=raw)
 
+def queue_for_indexing(index):
+    """Whether updates to ``index`` go through the SearchIndexQueue rather than being sent one at a time"""
+    return settings.USE_CELERY and settings.SEARCH_INDEX_QUEUE_ENABLED and index in (None, settings.ELASTIC_INDEX)
+
+def enqueue_search_update(doc_type, target_id, include_files=False):
+    # Inserted in the current transaction; search_engine.drain_index_queue picks it up after commit
+    from osf.models import SearchIndexQueue
+    SearchIndexQueue.enqueue(doc_type, [target_id], include_files=include_files)
+
 @requires_search
 def update_node(node, index=None, bulk=False, async=True, saved_fields=None):
     kwargs = {
         'index': index,
-        'bulk': bulk
+        'bulk': bulk,
+        'saved_fields': saved_fields,
     }
     if async:
         node_id = node._id
+        if queue_for_indexing(index) and not bulk:
+            enqueue_search_update('node', node_id, include_files=search_engine.should_update_files(node, saved_fields))
         # We need the transaction to be committed before trying to run celery tasks.
         # For example, when updating a Node's privacy, is_public must be True in the
         # database in order for method that updates the Node's elastic search document
         # to run correctly.
-        if settings.USE_CELERY:
+        elif settings.USE_CELERY:
             enqueue_task(search_engine.update_node_async.s(node_id=node_id, **kwargs))
         else:
             search_engine.update_node_async(node_id=node_id, **kwargs)
@@ -72,7 +84,9 @@ def update_user(user, index=None, async=True):
     index = index or settings.ELASTIC_INDEX
     if async:
         user_id = user.id
-        if settings.USE_CELERY:
+        if queue_for_indexing(index):
+            enqueue_search_update('user', user._id)
+        elif settings.USE_CELERY:
             enqueue_task(search_engine.update_user_async.s(user_id, index=index))
         else:
             search_engine.update_user_async(user_id, index=index)
@@ -81,9 +95,21 @@ def update_user(user, index=None, async=True):
 
 @requires_search
 def update_file(file_, index=None, delete=False):
+    if queue_for_indexing(index):
+        # Deleted files have been moved to the trash by the time the queue is drained
+        return enqueue_search_update('file', file_._id)
     index = index or settings.ELASTIC_INDEX
     search_engine.update_file(file_, index=index, delete=delete)
 
+@requires_search
+def update_files(files, index=None):
+    """Like update_file for many files, with one queue insert or one bulk request"""
+    if queue_for_indexing(index):
+        from osf.models import SearchIndexQueue
+        return SearchIndexQueue.enqueue('file', [file_._id for file_ in files])
+    index = index or settings.ELASTIC_INDEX
+    search_engine.update_files(files, index=index)
+
 @requires_search
 def update_institution(institution, index=None):
     index = index or settings.ELASTIC_INDEX
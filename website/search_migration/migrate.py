@@ -1,15 +1,20 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """Migration script for Search-enabled Models."""
-from __future__ import absolute_import
-from math import ceil
+from __future__ import absolute_import, division
 
+import json
 import logging
+import os
+import time
+from multiprocessing import Pool
 
+from django import db
 from django.db import connection
 from elasticsearch import helpers
 
 import website.search.search as search
+from website.search import elastic_search
 from website.search.elastic_search import client
 from website.search_migration import (
     JSON_UPDATE_NODES_SQL, JSON_DELETE_NODES_SQL,
@@ -25,49 +30,135 @@ from website.search.search import update_institution, bulk_update_collected_meta
 
 logger = logging.getLogger(__name__)
 
-def sql_migrate(index, sql, max_id, increment, es_args=None, **kwargs):
+class Checkpoint(object):
+    """The index being built and the id ranges already migrated to it, saved to ``path``
+    after every range so that an interrupted migration can be resumed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {'index': None, 'completed': {}}
+        if os.path.exists(path):
+            with open(path) as fp:
+                self.data = json.load(fp)
+            logger.info('Resuming migration from {}'.format(path))
+
+    @property
+    def index(self):
+        return self.data['index']
+
+    @index.setter
+    def index(self, value):
+        self.data['index'] = value
+        self.save()
+
+    def is_completed(self, name, id_range):
+        return list(id_range) in self.data['completed'].get(name, [])
+
+    def complete(self, name, id_range):
+        self.data['completed'].setdefault(name, []).append(list(id_range))
+        self.save()
+
+    def save(self):
+        # Write and rename so that a crash never leaves a partial file behind
+        tmp_path = '{}.tmp'.format(self.path)
+        with open(tmp_path, 'w') as fp:
+            json.dump(self.data, fp)
+        os.rename(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def get_id_ranges(max_id, increment):
+    # An extra page is included to cover the edge case where:
+    #       max_id == (total_pages * increment) - 1
+    # and two additional objects are created during runtime.
+    return [(page_start, page_start + increment) for page_start in range(0, max_id + increment + 1, increment)]
+
+def migrate_id_range(index, sql, page_start, page_end, es_args, format_kwargs):
+    """Serialize the objects with ids in (page_start, page_end] with `sql` and send them to elastic.
+
+    :return tuple: page_start, page_end and the number of migrated objects
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(
+            index=index,
+            page_start=page_start,
+            page_end=page_end,
+            **format_kwargs))
+        ser_objs = cursor.fetchone()[0]
+    if ser_objs:
+        for _ in helpers.parallel_bulk(
+            client(),
+            ser_objs,
+            thread_count=settings.SEARCH_MIGRATION_BULK_THREADS,
+            chunk_size=settings.SEARCH_MIGRATION_CHUNK_SIZE,
+            **es_args
+        ):
+            pass
+    return page_start, page_end, len(ser_objs or [])
+
+def _migrate_id_range(args):
+    return migrate_id_range(*args)
+
+def _init_worker():
+    # Forked workers must open their own elasticsearch connections; database
+    # connections are closed before forking and reopened on first use.
+    elastic_search.CLIENT = None
+
+def sql_migrate(index, sql, max_id, increment, es_args=None, name=None, workers=1, checkpoint=None, **kwargs):
     """ Run provided SQL and send output to elastic.
 
     :param str index: Elastic index to update (formatted into `sql`)
     :param str sql: SQL to format and run. See __init__.py in this module
     :param int max_id: Last known object id. Indicates when to stop paging
     :param int increment: Page size
-    :param  dict es_args:  Dict or None, to pass to `helpers.bulk`
+    :param  dict es_args:  Dict or None, to pass to `helpers.parallel_bulk`
+    :param str name: Name of the migration, for logging and checkpointing
+    :param int workers: Number of processes migrating pages in parallel
+    :param Checkpoint checkpoint: Pages already migrated are skipped, and completed pages recorded
     :kwargs: Additional format arguments for `sql` arg
 
     :return int: Number of migrated objects
     """
     if es_args is None:
         es_args = {}
-    total_pages = int(ceil(max_id / float(increment)))
+    name = name or 'objects'
+    id_ranges = [
+        id_range for id_range in get_id_ranges(max_id, increment)
+        if not (checkpoint and checkpoint.is_completed(name, id_range))
+    ]
+    args = [(index, sql, page_start, page_end, es_args, kwargs) for page_start, page_end in id_ranges]
     total_objs = 0
-    page_start = 0
-    page_end = 0
-    page = 0
-    while page_end <= (max_id + increment):
-        page += 1
-        page_end += increment
-        if page <= total_pages:
-            logger.info('Updating page {} / {}'.format(page_end / increment, total_pages))
-        else:
-            # An extra page is included to cover the edge case where:
-            #       max_id == (total_pages * increment) - 1
-            # and two additional objects are created during runtime.
-            logger.info('Cleaning up...')
-        with connection.cursor() as cursor:
-            cursor.execute(sql.format(
-                index=index,
-                page_start=page_start,
-                page_end=page_end,
-                **kwargs))
-            ser_objs = cursor.fetchone()[0]
-            if ser_objs:
-                total_objs += len(ser_objs)
-                helpers.bulk(client(), ser_objs, **es_args)
-        page_start = page_end
+    start = time.time()
+
+    pool = None
+    if workers > 1:
+        db.connections.close_all()
+        pool = Pool(workers, initializer=_init_worker)
+        results = pool.imap_unordered(_migrate_id_range, args)
+    else:
+        results = (_migrate_id_range(each) for each in args)
+    try:
+        for page, (page_start, page_end, count) in enumerate(results, 1):
+            logger.info('Updated {} page {} / {}'.format(name, page, len(id_ranges)))
+            total_objs += count
+            if checkpoint:
+                checkpoint.complete(name, (page_start, page_end))
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+    elapsed = time.time() - start
+    logger.info('{} {} in {:.0f}s ({:.1f} docs/s)'.format(
+        total_objs, name, elapsed, total_objs / elapsed if elapsed else 0
+    ))
     return total_objs
 
-def migrate_nodes(index, delete, increment=10000):
+def migrate_nodes(index, delete, increment=10000, **migrate_kwargs):
     logger.info('Migrating nodes to index: {}'.format(index))
     max_nid = AbstractNode.objects.last().id
     total_nodes = sql_migrate(
@@ -75,7 +166,9 @@ def migrate_nodes(index, delete, increment=10000):
         JSON_UPDATE_NODES_SQL,
         max_nid,
         increment,
-        spam_flagged_removed_from_search=settings.SPAM_FLAGGED_REMOVE_FROM_SEARCH)
+        name='nodes',
+        spam_flagged_removed_from_search=settings.SPAM_FLAGGED_REMOVE_FROM_SEARCH,
+        **migrate_kwargs)
     logger.info('{} nodes migrated'.format(total_nodes))
     if delete:
         logger.info('Preparing to delete old node documents')
@@ -86,10 +179,12 @@ def migrate_nodes(index, delete, increment=10000):
             max_nid,
             increment,
             es_args={'raise_on_error': False},  # ignore 404s
-            spam_flagged_removed_from_search=settings.SPAM_FLAGGED_REMOVE_FROM_SEARCH)
+            name='deleted nodes',
+            spam_flagged_removed_from_search=settings.SPAM_FLAGGED_REMOVE_FROM_SEARCH,
+            **migrate_kwargs)
         logger.info('{} nodes marked deleted'.format(total_nodes))
 
-def migrate_files(index, delete, increment=10000):
+def migrate_files(index, delete, increment=10000, **migrate_kwargs):
     logger.info('Migrating files to index: {}'.format(index))
     max_fid = BaseFileNode.objects.last().id
     total_files = sql_migrate(
@@ -97,7 +192,9 @@ def migrate_files(index, delete, increment=10000):
         JSON_UPDATE_FILES_SQL,
         max_fid,
         increment,
-        spam_flagged_removed_from_search=settings.SPAM_FLAGGED_REMOVE_FROM_SEARCH)
+        name='files',
+        spam_flagged_removed_from_search=settings.SPAM_FLAGGED_REMOVE_FROM_SEARCH,
+        **migrate_kwargs)
     logger.info('{} files migrated'.format(total_files))
     if delete:
         logger.info('Preparing to delete old file documents')
@@ -108,17 +205,21 @@ def migrate_files(index, delete, increment=10000):
             max_fid,
             increment,
             es_args={'raise_on_error': False},  # ignore 404s
-            spam_flagged_removed_from_search=settings.SPAM_FLAGGED_REMOVE_FROM_SEARCH)
+            name='deleted files',
+            spam_flagged_removed_from_search=settings.SPAM_FLAGGED_REMOVE_FROM_SEARCH,
+            **migrate_kwargs)
         logger.info('{} files marked deleted'.format(total_files))
 
-def migrate_users(index, delete, increment=10000):
+def migrate_users(index, delete, increment=10000, **migrate_kwargs):
     logger.info('Migrating users to index: {}'.format(index))
     max_uid = OSFUser.objects.last().id
     total_users = sql_migrate(
         index,
         JSON_UPDATE_USERS_SQL,
         max_uid,
-        increment)
+        increment,
+        name='users',
+        **migrate_kwargs)
     logger.info('{} users migrated'.format(total_users))
     if delete:
         logger.info('Preparing to delete old user documents')
@@ -128,7 +229,9 @@ def migrate_users(index, delete, increment=10000):
             JSON_DELETE_USERS_SQL,
             max_uid,
             increment,
-            es_args={'raise_on_error': False})  # ignore 404s
+            es_args={'raise_on_error': False},  # ignore 404s
+            name='deleted users',
+            **migrate_kwargs)
         logger.info('{} users marked deleted'.format(total_users))
 
 def migrate_collected_metadata(index, delete):
@@ -160,13 +263,16 @@ def migrate_institutions(index):
     for inst in Institution.objects.filter(is_deleted=False):
         update_institution(inst, index)
 
-def migrate(delete, remove=False, index=None, app=None):
+def migrate(delete, remove=False, index=None, app=None, workers=1, checkpoint_path=None):
     """Reindexes relevant documents in ES
 
     :param bool delete: Delete documents that should not be indexed
     :param bool remove: Removes old index after migrating
     :param str index: index alias to version and migrate
     :param App app: Flask app for context
+    :param int workers: Number of processes migrating nodes, files and users in parallel
+    :param str checkpoint_path: File recording progress. If it exists, the migration it
+        records is resumed instead of starting a new index version
     """
     index = index or settings.ELASTIC_INDEX
     app = app or init_app('website.settings', set_backends=True, routes=True)
@@ -178,13 +284,19 @@ def migrate(delete, remove=False, index=None, app=None):
     ctx = app.test_request_context()
     ctx.push()
 
-    new_index = set_up_index(index)
+    checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+    if checkpoint and checkpoint.index and es_client().indices.exists(index=checkpoint.index):
+        new_index = checkpoint.index
+    else:
+        new_index = set_up_index(index)
+        if checkpoint:
+            checkpoint.index = new_index
 
     if settings.ENABLE_INSTITUTIONS:
         migrate_institutions(new_index)
-    migrate_nodes(new_index, delete=delete)
-    migrate_files(new_index, delete=delete)
-    migrate_users(new_index, delete=delete)
+    migrate_nodes(new_index, delete=delete, workers=workers, checkpoint=checkpoint)
+    migrate_files(new_index, delete=delete, workers=workers, checkpoint=checkpoint)
+    migrate_users(new_index, delete=delete, workers=workers, checkpoint=checkpoint)
     migrate_collected_metadata(new_index, delete=delete)
 
     set_up_alias(index, new_index)
@@ -192,6 +304,9 @@ def migrate(delete, remove=False, index=None, app=None):
     if remove:
         remove_old_index(new_index)
 
+    if checkpoint:
+        checkpoint.remove()
+
     ctx.pop()
 
 def set_up_index(idx):
@@ -41,6 +41,11 @@ EXPIRATION_TIME_DICT = {
 }
 
 CITATION_STYLES_PATH = os.path.join(BASE_PATH, 'static', 'vendor', 'bower_components', 'styles')
+# Parsed citation styles and rendered citations are cached per process
+CITATION_STYLE_CACHE_MAX_ENTRIES = 100
+CITATION_CACHE_MAX_ENTRIES = 10000
+# Bounds staleness from changes not reflected in the cache key, e.g. DOIs and provider names
+CITATION_CACHE_TIMEOUT = 60 * 10
 
 # Minimum seconds between forgot password email attempts
 SEND_EMAIL_THROTTLE = 30
@@ -115,6 +120,15 @@ ELASTIC_KWARGS = {
     # 'client_cert': None,
     # 'client_key': None
 }
+# When celery is used, node, user and file updates are queued and indexed in batches
+# by website.search.elastic_search.drain_index_queue instead of one request per document
+SEARCH_INDEX_QUEUE_ENABLED = True
+SEARCH_INDEX_QUEUE_BATCH_SIZE = 500
+# Seconds. The queue is drained this often and a warning is logged when a document waited longer
+SEARCH_INDEX_QUEUE_MAX_LAG = 30
+# website.search_migration: documents per bulk request, and bulk requests in flight per worker
+SEARCH_MIGRATION_CHUNK_SIZE = 1000
+SEARCH_MIGRATION_BULK_THREADS = 2
 
 # Sessions
 COOKIE_NAME = 'osf'
@@ -156,6 +170,16 @@ FAKE_EMAIL_DOMAIN = 'cos.io'
 MAIL_SERVER = 'smtp.sendgrid.net'
 MAIL_USERNAME = 'osf-smtp'
 MAIL_PASSWORD = ''  # Set this in local.py
+# Idle SMTP connections kept open per server and user, and how long (in seconds) to reuse them
+MAIL_SMTP_POOL_SIZE = 4
+MAIL_SMTP_CONNECTION_MAX_AGE = 300
+# Number of emails sent per task by mails.send_mails
+MAIL_BATCH_SIZE = 100
+# Number of compiled email subject templates kept per process
+MAIL_SUBJECT_TEMPLATE_CACHE_MAX_ENTRIES = 500
+# Store the event data of notifications and render their messages when digests are sent,
+# instead of storing the rendered message for every recipient when the event happens
+NOTIFICATION_DIGEST_DEFER_RENDERING = False
 
 # OR, if using Sendgrid's API
 # WARNING: If `SENDGRID_WHITELIST_MODE` is True,
@@ -384,16 +408,26 @@ SHARE_URL = None
 SHARE_API_TOKEN = None  # Required to send project updates to SHARE
 
 CAS_SERVER_URL = 'http://localhost:8080'
+# Seconds to cache the profiles of validated OAuth2 access tokens per process; 0 disables the cache.
+# A token revoked through another process stays usable here for at most this long.
+CAS_PROFILE_CACHE_TIMEOUT = 60
+CAS_PROFILE_CACHE_MAX_ENTRIES = 10000
 MFR_SERVER_URL = 'http://localhost:7778'
 
 ###### ARCHIVER ###########
 ARCHIVE_PROVIDER = 'osfstorage'
+# Archive osfstorage into osfstorage by linking the registration's files to the existing
+# file versions instead of asking WaterButler to copy every file
+ARCHIVE_OSFSTORAGE_WITHOUT_COPY = True
 
 MAX_ARCHIVE_SIZE = 5 * 1024 ** 3  # == math.pow(1024, 3) == 1 GB
 MAX_FILE_SIZE = MAX_ARCHIVE_SIZE  # TODO limit file size?
 
 ARCHIVE_TIMEOUT_TIMEDELTA = timedelta(1)  # 24 hours
 
+# Number of nodes whose osfstorage file maps are kept while an archive job finishes
+ARCHIVER_FILE_MAP_CACHE_MAX_ENTRIES = 100
+
 ENABLE_ARCHIVER = True
 
 JWT_SECRET = 'changeme'
@@ -442,6 +476,7 @@ class CeleryConfig:
 
     med_pri_modules = {
         'framework.email.tasks',
+        'website.files.tasks',
         'scripts.send_queued_mails',
         'scripts.triggered_mails',
         'website.mailchimp_utils',
@@ -490,11 +525,13 @@ class CeleryConfig:
 
     # Modules to import when celery launches
     imports = (
+        'framework.analytics.tasks',
         'framework.celery_tasks',
         'framework.email.tasks',
         'website.mailchimp_utils',
         'website.notifications.tasks',
         'website.archiver.tasks',
+        'website.files.tasks',
         'website.search.search',
         'website.project.tasks',
         'scripts.populate_new_and_noteworthy_projects',
@@ -533,6 +570,14 @@ class CeleryConfig:
         #  Setting up a scheduler, essentially replaces an independent cron job
         # Note: these times must be in UTC
         beat_schedule = {
+            'drain_search_index_queue': {
+                'task': 'website.search.elastic_search.drain_index_queue',
+                'schedule': timedelta(seconds=SEARCH_INDEX_QUEUE_MAX_LAG),
+            },
+            'flush_page_counters': {
+                'task': 'framework.analytics.tasks.flush_page_counters',
+                'schedule': crontab(minute='*'),  # Every minute
+            },
             '5-minute-emails': {
                 'task': 'website.notifications.tasks.send_users_email',
                 'schedule': crontab(minute='*/5'),